@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Concorrenza adattiva del Backlink Checker (AIMD)
+Invece di scegliere --workers a tentativi, il limite di richieste in volo
+viene regolato sui risultati osservati: a ogni finestra di risultati si
+confrontano la latenza p95 e la quota di segnali di congestione (timeout,
+errori di connessione, 429/503) con i valori delle finestre sane.
+
+- finestra sana: il limite cresce (raddoppia finché non c'è stata la prima
+  congestione, poi +1 a finestra)
+- congestione o p95 molto più alto del riferimento: il limite viene
+  moltiplicato per BACKOFF
+
+Il limite non supera mai il massimo indicato (es. --workers) e non scende
+sotto 1. Ogni decisione viene comunicata a on_decision per i log.
+"""
+
+import math
+
+# Status e codici HTTP che indicano un sito (o la nostra rete) sotto carico
+CONGESTION_STATUSES = ('TIMEOUT', 'CONNECTION_ERROR')
+CONGESTION_STATUS_CODES = (429, 503)
+
+INITIAL_LIMIT = 4
+MIN_SAMPLE = 20           # Risultati minimi per finestra
+BACKOFF = 0.7             # Riduzione moltiplicativa in caso di congestione
+ERROR_TOLERANCE = 0.05    # Quota di segnali di congestione tollerata per finestra
+LATENCY_TOLERANCE = 2.0   # p95 oltre LATENCY_TOLERANCE volte il riferimento = congestione...
+LATENCY_SLACK = 0.5       # ...e oltre riferimento + LATENCY_SLACK secondi (rumore sulle latenze basse)
+
+
+def is_congestion(result):
+    return (result.get('status') in CONGESTION_STATUSES
+            or result.get('status_code') in CONGESTION_STATUS_CODES)
+
+
+def _p95(values):
+    values = sorted(values)
+    return values[max(math.ceil(0.95 * len(values)) - 1, 0)]
+
+
+class AdaptiveLimit:
+    def __init__(self, max_limit, min_limit=1, initial=INITIAL_LIMIT, on_decision=None):
+        """
+        max_limit: tetto alle richieste in volo (es. --workers)
+        on_decision: funzione messaggio -> None chiamata a ogni variazione del limite
+        Si usa come callable: AdaptiveLimit() restituisce il limite corrente.
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = max(self.min_limit, min(initial, self.max_limit))
+        self.on_decision = on_decision
+        self.slow_start = True
+        self.baseline_p95 = None    # p95 più basso tra le finestre sane
+        self.decisions = 0
+        self._latencies = []
+        self._congested = 0
+        self._observed = 0
+
+    def __call__(self):
+        return self.limit
+
+    def observe(self, result):
+        """Registra il risultato di una richiesta di rete (non quelli da cache o duplicati)"""
+        self._observed += 1
+        if is_congestion(result):
+            self._congested += 1
+        elif result.get('status_code') and result['status_code'] < 500 and result.get('response_time') is not None:
+            # Le latenze degli errori 5xx includono le pause dei retry: non dicono nulla sul carico
+            self._latencies.append(result['response_time'])
+
+        if self._observed >= max(MIN_SAMPLE, self.limit):
+            self._decide()
+
+    def _decide(self):
+        congestion_rate = self._congested / self._observed
+        p95 = _p95(self._latencies) if self._latencies else None
+        self._latencies = []
+        self._congested = 0
+        self._observed = 0
+
+        slow = (p95 is not None and self.baseline_p95 is not None
+                and p95 > max(self.baseline_p95 * LATENCY_TOLERANCE, self.baseline_p95 + LATENCY_SLACK))
+        latency = f'p95 {p95:.2f}s' if p95 is not None else 'p95 n/d'
+        old_limit = self.limit
+
+        if congestion_rate > ERROR_TOLERANCE or slow:
+            self.slow_start = False
+            self.limit = max(self.min_limit, int(self.limit * BACKOFF))
+            reason = (f'congestione {congestion_rate:.0%}' if congestion_rate > ERROR_TOLERANCE
+                      else f'latenza in aumento (riferimento {self.baseline_p95:.2f}s)')
+            message = f'📉 Concorrenza adattiva: {old_limit} → {self.limit} ({reason}, {latency})'
+        else:
+            if p95 is not None:
+                self.baseline_p95 = p95 if self.baseline_p95 is None else min(self.baseline_p95, p95)
+            step = self.limit if self.slow_start else 1
+            self.limit = min(self.max_limit, self.limit + step)
+            message = (f'📈 Concorrenza adattiva: {old_limit} → {self.limit} '
+                       f'(congestione {congestion_rate:.0%}, {latency})')
+
+        if self.limit != old_limit:
+            self.decisions += 1
+            if self.on_decision is not None:
+                self.on_decision(message)
@@ -1,24 +1,35 @@
 from flask import Flask, render_template, request, jsonify, send_file
 from flask_socketio import SocketIO, emit
 import os
+import sys
+import atexit
+import subprocess
 import threading
-import time
-from datetime import datetime
-from backlink_checker import BacklinkChecker
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from backlink_checker import ENGINES, read_csv_columns, count_rows
+from job_queue import JobQueue, DEFAULT_QUEUE, FINISHED_STATUSES, MAX_JOB_LOGS
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'backlink_checker_secret_key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Variabili globali per il controllo dell'analisi
-analysis_running = False
-analysis_thread = None
-checker = None
-stop_analysis = False
-analysis_logs = []
-analysis_progress = {}
+# Richieste in volo condivise da tutte le analisi (job) in corso, divise in parti eque
+WORKER_BUDGET = int(os.environ.get('WORKER_BUDGET', 20 if os.environ.get('RAILWAY_ENVIRONMENT') else 50))
+
+# Le analisi girano in processi worker separati che leggono la coda SQLite:
+# la web app accoda i job e legge progresso e log. WEB_WORKERS worker vengono
+# avviati all'avvio dell'app o alla prima richiesta, mai all'import del modulo
+# (0 se i worker sono lanciati a parte con `python -m backlink_checker worker`)
+JOB_QUEUE_DB = os.environ.get('JOB_QUEUE_DB', DEFAULT_QUEUE)
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 1 if os.environ.get('RAILWAY_ENVIRONMENT') else 2))
+
+# Log conservati per ogni job: i client leggono solo quelli nuovi (?after=seq),
+# così il costo del polling non cresce con la durata dell'analisi
+JOB_LOG_LIMIT = int(os.environ.get('JOB_LOG_LIMIT', MAX_JOB_LOGS))
+
+# Ogni quanto i log e il progresso scritti dai worker vengono inoltrati ai client SocketIO
+RELAY_INTERVAL = 0.5
+
+job_queue = JobQueue(JOB_QUEUE_DB, max_logs=JOB_LOG_LIMIT)
 
 @app.route('/')
 def index():
@@ -44,10 +55,9 @@ def upload_file():
     filepath = os.path.join(upload_folder, file.filename)
     file.save(filepath)
     
-    # Analizza il CSV per trovare le colonne
+    # Analizza il CSV per trovare le colonne (solo intestazione, le righe vengono contate a blocchi)
     try:
-        df = pd.read_csv(filepath)
-        columns = list(df.columns)
+        columns = read_csv_columns(filepath)
         
         # Trova automaticamente la colonna backlink
         backlink_column = None
@@ -64,7 +74,7 @@ def upload_file():
             'filepath': filepath,
             'columns': columns,
             'suggested_column': backlink_column,
-            'total_rows': len(df)
+            'total_rows': count_rows(filepath)
         })
     
     except Exception as e:
@@ -72,41 +82,117 @@ def upload_file():
 
 @app.route('/start_analysis', methods=['POST'])
 def start_analysis():
-    global analysis_running, analysis_thread, checker, stop_analysis
-    
-    if analysis_running:
-        return jsonify({'error': 'Analisi già in corso'}), 400
-    
     data = request.json
     filepath = data.get('filepath')
     max_workers = data.get('max_workers', 10)
     timeout = data.get('timeout', 10)
     backlink_column = data.get('backlink_column')
+    engine = data.get('engine', 'threads')
+    max_per_host = data.get('max_per_host', 4)
+    host_interval = data.get('host_interval', 0.0)
+    resume_report = data.get('resume_report') or None
+    verify_links = bool(data.get('verify_links', False))
+    adaptive = bool(data.get('adaptive', False))
+    two_phase = bool(data.get('two_phase', False))
+    
+    if engine not in ENGINES:
+        return jsonify({'error': f'Motore non valido: {engine}'}), 400
+    
+    if resume_report and not os.path.exists(resume_report):
+        return jsonify({'error': 'Report da riprendere non trovato'}), 400
     
     # Limita risorse su Railway
     if os.environ.get('RAILWAY_ENVIRONMENT'):
-        max_workers = min(max_workers, 3)  # Massimo 3 worker su Railway
+        if engine == 'async':
+            max_workers = min(max_workers, 50)  # Un solo thread: bastano poche risorse anche con più richieste in volo
+        # Le richieste in volo partono basse e crescono finché latenza ed errori restano stabili
+        adaptive = True
         timeout = max(timeout, 15)  # Timeout più generoso per Railway per evitare falsi negativi
+        # Il timeout generoso vale solo per il ricontrollo: i siti sani rispondono nella prima fase
+        two_phase = True
     
     if not filepath or not os.path.exists(filepath):
         return jsonify({'error': 'File non trovato'}), 400
     
-    analysis_running = True
-    stop_analysis = False
-    
-    # Avvia l'analisi in un thread separato
-    analysis_thread = threading.Thread(
-        target=run_backlink_analysis,
-        args=(filepath, max_workers, timeout, backlink_column)
-    )
-    analysis_thread.start()
+    # Ogni analisi è un job accodato: il primo worker libero lo esegue
+    job = job_queue.enqueue({
+        'filepath': filepath,
+        'max_workers': max_workers,
+        'timeout': timeout,
+        'backlink_column': backlink_column,
+        'engine': engine,
+        'max_per_host': max_per_host,
+        'host_interval': host_interval,
+        'resume_report': resume_report,
+        'verify_links': verify_links,
+        'adaptive': adaptive,
+        'two_phase': two_phase
+    }, max_workers)
     
-    return jsonify({'success': True, 'message': 'Analisi avviata'})
+    return jsonify({'success': True, 'message': 'Analisi in coda', 'job_id': job['job_id'], 'status': job['status']})
+
+def get_job_or_404(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return None, (jsonify({'error': 'Job non trovato'}), 404)
+    return job, None
+
+def logs_response(job):
+    """Log del job successivi a ?after=seq (tutti quelli conservati senza after) e ultimo seq"""
+    after = request.args.get('after', 0, type=int)
+    logs = job_queue.logs(job['job_id'], after=after) if job else []
+    return jsonify({'logs': logs, 'last_seq': logs[-1]['seq'] if logs else after})
+
+def public_job(job):
+    """Dati del job esposti dalle API (senza i parametri interni)"""
+    return {key: job[key] for key in (
+        'job_id', 'status', 'filename', 'progress', 'report_filename', 'statistics',
+        'created_at', 'started_at', 'finished_at'
+    )}
+
+@app.route('/jobs')
+def list_jobs():
+    """Elenco dei job (in coda, in corso e terminati di recente)"""
+    return jsonify({'jobs': [public_job(job) for job in job_queue.list()], 'worker_budget': WORKER_BUDGET})
+
+@app.route('/jobs/<job_id>/progress')
+def job_progress(job_id):
+    job, error = get_job_or_404(job_id)
+    if error:
+        return error
+    workers = job_queue.shares(WORKER_BUDGET).get(job_id, 0)
+    return jsonify(dict(public_job(job), running=job['running'], workers=workers))
+
+@app.route('/jobs/<job_id>/logs')
+def job_logs(job_id):
+    job, error = get_job_or_404(job_id)
+    if error:
+        return error
+    return logs_response(job)
+
+@app.route('/jobs/<job_id>/stop', methods=['POST'])
+def job_stop(job_id):
+    job = job_queue.request_stop(job_id)
+    if job is None:
+        return jsonify({'error': 'Job non trovato'}), 404
+    return jsonify({'success': True, 'message': 'Richiesta di stop inviata', 'status': job['status']})
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    job, error = get_job_or_404(job_id)
+    if error:
+        return error
+    if not job['report_filename'] or not os.path.exists(job['report_filename']):
+        return jsonify({'error': 'Report non ancora disponibile'}), 404
+    return send_file(os.path.abspath(job['report_filename']), as_attachment=True)
 
 @app.route('/stop_analysis', methods=['POST'])
 def stop_analysis_route():
-    global stop_analysis
-    stop_analysis = True
+    """Compatibilità: ferma il job indicato (job_id) o l'ultimo avviato"""
+    job_id = (request.get_json(silent=True) or {}).get('job_id')
+    job = job_queue.get(job_id) if job_id else job_queue.latest()
+    if job is not None:
+        job_queue.request_stop(job['job_id'])
     return jsonify({'success': True, 'message': 'Richiesta di stop inviata'})
 
 @app.route('/download_report/<filename>')
@@ -116,266 +202,104 @@ def download_report(filename):
     except Exception as e:
         return jsonify({'error': f'Errore nel download: {str(e)}'}), 400
 
+def requested_job():
+    """Job indicato con ?job_id=..., altrimenti l'ultimo avviato (endpoint storici)"""
+    job_id = request.args.get('job_id')
+    return job_queue.get(job_id) if job_id else job_queue.latest()
+
 @app.route('/get_logs')
 def get_logs():
-    """Endpoint per ottenere i log dell'analisi (per Railway)"""
-    global analysis_logs
-    return jsonify({'logs': analysis_logs})
+    """Endpoint per ottenere i log dell'analisi (per Railway): solo quelli dopo ?after=seq"""
+    return logs_response(requested_job())
 
 @app.route('/get_progress')
 def get_progress():
-    """Endpoint per ottenere il progresso dell'analisi (per Railway)"""
-    global analysis_progress, analysis_running
+    """Endpoint per ottenere il progresso dell'analisi (per Railway), con i conteggi per status"""
+    job = requested_job()
     return jsonify({
-        'progress': analysis_progress,
-        'running': analysis_running
+        'job_id': job['job_id'] if job else None,
+        'status': job['status'] if job else None,
+        'progress': job['progress'] if job else {},
+        'running': bool(job and job['running'])
     })
 
 @app.route('/clear_logs', methods=['POST'])
 def clear_logs():
     """Endpoint per pulire i log (per Railway)"""
-    global analysis_logs
-    analysis_logs = []
+    job = requested_job()
+    if job is not None:
+        job_queue.clear_logs(job['job_id'])
     return jsonify({'success': True})
 
-def emit_log(message, log_type='info'):
-    """Funzione universale per logging che funziona sia con SocketIO che senza"""
-    global analysis_logs
-    
-    log_entry = {
-        'message': message,
-        'type': log_type,
-        'timestamp': datetime.now().isoformat()
-    }
-    
-    # Aggiungi ai log per Railway
-    analysis_logs.append(log_entry)
-    
-    # Se SocketIO è disponibile (ambiente locale), usa anche quello
-    if not os.environ.get('RAILWAY_ENVIRONMENT'):
+def relay_job_events():
+    """Inoltra ai client SocketIO log, progresso e completamento scritti dai worker nella coda"""
+    last_log_id = job_queue.last_log_id()
+    progress_sent = {}
+    finished = {job['job_id'] for job in job_queue.list() if job['status'] in FINISHED_STATUSES}
+    while True:
+        socketio.sleep(RELAY_INTERVAL)
         try:
-            socketio.emit('log', log_entry)
-        except:
-            pass  # Ignora errori SocketIO su Railway
+            for entry in job_queue.logs_since(last_log_id):
+                last_log_id = entry.pop('id')
+                socketio.emit('log', entry)
+            for job in job_queue.list():
+                job_id = job['job_id']
+                if job_id in finished:
+                    continue
+                if job['progress'] and job['progress'] != progress_sent.get(job_id):
+                    progress_sent[job_id] = job['progress']
+                    socketio.emit('progress', dict(job['progress'], job_id=job_id))
+                if job['status'] in FINISHED_STATUSES:
+                    finished.add(job_id)
+                    progress_sent.pop(job_id, None)
+                    # Anche i job fermati o in errore chiudono l'analisi sulla pagina
+                    socketio.emit('analysis_complete', {
+                        'job_id': job_id,
+                        'status': job['status'],
+                        'report_filename': job['report_filename'],
+                        'statistics': job['statistics']
+                    })
+        except Exception as e:
+            print(f"[DEBUG] Errore nell'inoltro degli eventi dei job: {str(e)}")
 
-def emit_progress(completed, total, percentage, current_url, status):
-    """Funzione universale per aggiornamenti di progresso"""
-    global analysis_progress
-    
-    progress_data = {
-        'completed': completed,
-        'total': total,
-        'percentage': round(percentage, 1),
-        'current_url': current_url,
-        'status': status
-    }
-    
-    # Aggiorna progresso per Railway
-    analysis_progress = progress_data
-    
-    # Se SocketIO è disponibile (ambiente locale), usa anche quello
-    if not os.environ.get('RAILWAY_ENVIRONMENT'):
-        try:
-            socketio.emit('progress', progress_data)
-        except:
-            pass  # Ignora errori SocketIO su Railway
+def start_workers(count):
+    """Avvia i processi worker (come `python -m backlink_checker worker`); terminano con l'app"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backlink_checker.py')
+    workers = []
+    for _ in range(count):
+        workers.append(subprocess.Popen([
+            sys.executable, script, 'worker',
+            '--queue', JOB_QUEUE_DB, '--budget', str(WORKER_BUDGET), '--max-logs', str(JOB_LOG_LIMIT),
+            '--parent-pid', str(os.getpid())
+        ], cwd=os.getcwd()))
+    atexit.register(lambda: [worker.terminate() for worker in workers])
+    return workers
 
-def emit_analysis_complete(report_filename, total_analyzed, statistics):
-    """Funzione universale per completamento analisi"""
-    complete_data = {
-        'report_filename': report_filename,
-        'total_analyzed': total_analyzed,
-        'statistics': statistics
-    }
-    
-    # Se SocketIO è disponibile (ambiente locale), usa anche quello
-    if not os.environ.get('RAILWAY_ENVIRONMENT'):
-        try:
-            socketio.emit('analysis_complete', complete_data)
-        except:
-            pass  # Ignora errori SocketIO su Railway
+background_lock = threading.Lock()
+background_started = False
+worker_processes = []  # Worker avviati da start_background
 
-def run_backlink_analysis(filepath, max_workers, timeout, backlink_column):
-    global analysis_running, checker, stop_analysis, analysis_progress
-    
-    try:
-        print(f"[DEBUG] Starting analysis with filepath: {filepath}")
-        print(f"[DEBUG] max_workers: {max_workers}, timeout: {timeout}, column: {backlink_column}")
-        
-        emit_log('🚀 Avvio analisi backlink...', 'info')
-        emit_log(f'📁 File: {os.path.basename(filepath)}', 'info')
-        emit_log(f'🚀 Thread paralleli: {max_workers}', 'info')
-        emit_log(f'⏱️ Timeout: {timeout}s', 'info')
-        
-        # Leggi il CSV
-        print(f"[DEBUG] Reading CSV file: {filepath}")
-        df = pd.read_csv(filepath)
-        print(f"[DEBUG] CSV loaded, shape: {df.shape}")
-        print(f"[DEBUG] Available columns: {list(df.columns)}")
-        
-        if not backlink_column or backlink_column not in df.columns:
-            print(f"[DEBUG] Invalid backlink column: {backlink_column}")
-            emit_log('❌ Colonna backlink non valida', 'error')
+def start_background():
+    """
+    Avvia i worker e l'inoltro degli eventi ai client SocketIO, una volta per
+    processo: all'avvio con `python app.py` o alla prima richiesta (gunicorn)
+    """
+    global background_started
+    with background_lock:
+        if background_started:
             return
-        
-        emit_log(f'✅ Colonna backlink: {backlink_column}', 'success')
-        
-        # Filtra backlink validi
-        df[backlink_column] = df[backlink_column].astype(str).str.strip()
-        df_with_backlinks = df[
-            (df[backlink_column].notna()) & 
-            (df[backlink_column] != '') & 
-            (df[backlink_column] != 'nan') &
-            (df[backlink_column].str.startswith(('http', 'www.'), na=False))
-        ]
-        
-        total_links = len(df_with_backlinks)
-        emit_log(f'🔍 Trovati {total_links} backlink da controllare', 'info')
-        
-        if total_links == 0:
-            emit_log('❌ Nessun backlink valido trovato!', 'error')
-            return
-        
-        # Crea il checker
-        print(f"[DEBUG] Creating BacklinkChecker with {max_workers} workers")
-        try:
-            checker = BacklinkChecker(filepath, max_workers)
-            checker.timeout = timeout
-            print(f"[DEBUG] BacklinkChecker created successfully")
-        except Exception as e:
-            print(f"[DEBUG] Error creating BacklinkChecker: {str(e)}")
-            emit_log(f'❌ Errore nella creazione del checker: {str(e)}', 'error')
-            return
-        
-        # Prepara i dati per l'analisi
-        url_data = [(index, str(row[backlink_column]).strip()) 
-                   for index, row in df_with_backlinks.iterrows()]
-        
-        results = []
-        completed = 0
-        
-        # Analizza gli URL in parallelo con batch processing per Railway
-        print(f"Starting URL analysis, Railway environment: {bool(os.environ.get('RAILWAY_ENVIRONMENT'))}")
-        
-        if os.environ.get('RAILWAY_ENVIRONMENT'):
-            batch_size = 50  # Processa 50 URL alla volta su Railway
-            print(f"Using Railway batch processing with batch_size: {batch_size}")
-            
-            for i in range(0, len(url_data), batch_size):
-                if stop_analysis:
-                    print(f"[DEBUG] Analysis stopped by user at batch {i}")
-                    break
-                    
-                batch = url_data[i:i+batch_size]
-                print(f"Processing batch {i//batch_size + 1}, URLs: {len(batch)}")
-                
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    future_to_url = {
-                        executor.submit(checker.check_url_wrapper, data, timeout=timeout): data 
-                        for data in batch
-                    }
-                    
-                    for future in as_completed(future_to_url):
-                        if stop_analysis:
-                            print(f"[DEBUG] Analysis stopped during batch processing")
-                            break
-                        
-                        try:
-                            result = future.result()
-                            results.append(result)
-                            
-                            completed += 1
-                            progress = (completed / total_links) * 100
-                            
-                            if completed % 10 == 0:  # Log every 10th completion
-                                print(f"Completed {completed}/{total_links} URLs")
-                            emit_progress(completed, total_links, progress, result['url'], result['status'])
-                            
-                            if completed % 10 == 0 or completed == total_links:
-                                emit_log(f'📊 Progresso: {completed}/{total_links} ({progress:.1f}%)', 'info')
-                        
-                        except Exception as e:
-                            print(f"[DEBUG] Error processing URL: {str(e)}")
-                            emit_log(f'❌ Errore nell\'analisi: {str(e)}', 'error')
-                
-                # Pausa tra i batch per non sovraccaricare Railway
-                if i + batch_size < len(url_data):
-                    print(f"Sleeping 1 second between batches")
-                    time.sleep(1)
-                    
-        else:
-            # Ambiente locale: processa tutto insieme
-            print(f"Using local processing for {len(url_data)} URLs")
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_url = {
-                    executor.submit(checker.check_url_wrapper, data, timeout=timeout): data 
-                    for data in url_data
-                }
-                
-                for future in as_completed(future_to_url):
-                    if stop_analysis:
-                        print(f"[DEBUG] Analysis stopped by user")
-                        emit_log('⏹️ Analisi interrotta dall\'utente', 'warning')
-                        break
-                    
-                    try:
-                        result = future.result()
-                        results.append(result)
-                        
-                        completed += 1
-                        progress = (completed / total_links) * 100
-                        
-                        if completed % 10 == 0:  # Log every 10th completion
-                            print(f"Completed {completed}/{total_links} URLs")
-                        emit_progress(completed, total_links, progress, result['url'], result['status'])
-                        
-                        if completed % 10 == 0 or completed == total_links:
-                            emit_log(f'📊 Progresso: {completed}/{total_links} ({progress:.1f}%)', 'info')
-                    
-                    except Exception as e:
-                        emit_log(f'❌ Errore nell\'analisi: {str(e)}', 'error')
-        
-        if not stop_analysis and results:
-            # Genera il report
-            emit_log('📝 Generazione report...', 'info')
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            report_filename = f'backlink_report_{timestamp}.csv'
-            
-            # Crea DataFrame con i risultati
-            report_data = []
-            for result in results:
-                row = df_with_backlinks.loc[result['row_index']]
-                report_data.append({
-                    'URL': result['url'],
-                    'Status': result['status'],
-                    'Response_Time': result.get('response_time', ''),
-                    'Status_Code': result.get('status_code', ''),
-                    'Final_URL': result.get('final_url', ''),
-                    'Error': result.get('error', ''),
-                    'Nome_Azienda': row.get('Nome Azienda', ''),
-                    'Referente': row.get('Referente', ''),
-                    'Target_Backlink': row.get('Target backlink (URL)', '')
-                })
-            
-            report_df = pd.DataFrame(report_data)
-            report_df.to_csv(report_filename, index=False)
-            
-            # Statistiche finali
-            status_counts = report_df['Status'].value_counts().to_dict()
-            
-            emit_analysis_complete(report_filename, len(results), status_counts)
-            
-            emit_log(f'✅ Analisi completata! Report salvato: {report_filename}', 'success')
-        
-    except Exception as e:
-        emit_log(f'❌ Errore critico: {str(e)}', 'error')
-    
-    finally:
-        analysis_running = False
-        stop_analysis = False
+        background_started = True
+    worker_processes.extend(start_workers(WEB_WORKERS))
+    # SocketIO è usato solo in locale: su Railway la pagina legge log e progresso con il polling
+    if not os.environ.get('RAILWAY_ENVIRONMENT'):
+        socketio.start_background_task(relay_job_events)
+
+@app.before_request
+def ensure_background():
+    start_background()
 
 if __name__ == '__main__':
+    start_background()
     port = int(os.environ.get('PORT', 5000))
     # Usa SocketIO sia per Railway che per sviluppo locale
-    socketio.run(app, debug=False, host='0.0.0.0', port=port, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    socketio.run(app, debug=False, host='0.0.0.0', port=port, allow_unsafe_werkzeug=True)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motore asincrono del Backlink Checker
+Mantiene centinaia (o migliaia) di richieste in volo su un singolo thread
+con asyncio + aiohttp, restituendo gli stessi dizionari di risultato di
+BacklinkChecker.check_url
+"""
+
+import asyncio
+import contextvars
+import os
+import socket
+import time
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from backlink_checker import (
+    DEFAULT_HEADERS, RETRY_STATUS_CODES, THROTTLE_STATUS_CODES, URL_BUDGET_FACTOR, normalize_url,
+    classify_status, error_result, url_host, conditional_headers, revalidated_result, verification_host,
+    retry_after_seconds, dns_failure_result
+)
+from dns_cache import DNS_ERROR, TemporaryDnsError, DnsLookupTimeout
+from head_support import HeadSupport
+from redirect_rules import RedirectRules
+from host_scheduler import HostScheduler
+from link_verifier import LinkScanner, SCAN_CHUNK_SIZE, is_html, charset_of
+
+# Ogni quanto viene controllata la richiesta di stop mentre ci sono richieste in volo
+STOP_POLL_INTERVAL = 0.2
+# Scadenza (time.monotonic) dell'URL che il task corrente sta controllando: la rispetta anche
+# la risoluzione DNS fatta da aiohttp per le connessioni (redirect verso altri host inclusi)
+url_deadline_var = contextvars.ContextVar('url_deadline', default=None)
+
+
+def remaining_time(deadline):
+    """Secondi prima di deadline (time.monotonic), None se non c'è scadenza"""
+    return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+
+class CachedResolver(AbstractResolver):
+    """Resolver aiohttp che usa la DnsCache condivisa (le risoluzioni bloccanti girano in un thread)"""
+
+    def __init__(self, dns):
+        self.dns = dns
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        loop = asyncio.get_running_loop()
+        timeout = remaining_time(url_deadline_var.get())
+        try:
+            addresses, error = await loop.run_in_executor(None, self.dns.lookup, host, timeout)
+        except DnsLookupTimeout as e:
+            # Come un timeout di connessione di aiohttp: l'URL finisce in TIMEOUT
+            raise asyncio.TimeoutError(str(e)) from e
+        if error is not None:
+            raise OSError(f'DNS: {error}')
+        return [{
+            'hostname': host, 'host': address, 'port': port,
+            'family': address_family, 'proto': 0, 'flags': socket.AI_NUMERICHOST
+        } for address_family, address in addresses
+            if family in (socket.AF_UNSPEC, address_family)]
+
+    async def close(self):
+        pass
+
+
+class AsyncBacklinkChecker:
+    def __init__(self, max_concurrency=500, timeout=8, max_per_host=4, host_min_interval=0.0,
+                 verify_links=False):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.host_min_interval = host_min_interval
+        self.verify_links = verify_links
+        # Limite dinamico opzionale alle richieste in volo (vedi BacklinkChecker.concurrency_limit)
+        self.concurrency_limit = None
+        # Tempo massimo per URL e scadenza dell'analisi (vedi BacklinkChecker.url_budget e deadline)
+        self.url_budget = None
+        self.run_deadline = None
+        # Funzione (host, riga) -> risultato da consegnare senza richiesta, o None (vedi circuit breaker)
+        self.admit = None
+        # Cache DNS condivisa opzionale (vedi BacklinkChecker.dns)
+        self.dns = None
+        # Fase del controllo in due fasi (vedi BacklinkChecker.check_url: fast e get_only)
+        self.fast = False
+        self.get_only = False
+        # row_index -> scadenza dell'URL per i retry rimessi in coda (vedi BacklinkChecker.retry_deadlines)
+        self.retry_deadlines = {}
+        # Host che rifiutano HEAD (vedi BacklinkChecker.head_support)
+        self.head_support = HeadSupport()
+        # Redirect ricorrenti per host (vedi BacklinkChecker.redirect_rules)
+        self.redirect_rules = RedirectRules()
+        self.session = None
+        # url normalizzato -> risultato precedente da rivalidare (vedi BacklinkChecker.previous_results)
+        self.previous_results = {}
+
+        # Stessa strategia di retry della sessione requests
+        if os.environ.get('RAILWAY_ENVIRONMENT'):
+            self.retries = 5
+            self.backoff_factor = 0.5
+        else:
+            self.retries = 3
+            self.backoff_factor = 0.3
+
+    async def open(self):
+        """Crea la sessione aiohttp con connection pooling condiviso"""
+        if self.dns is not None:
+            # Le risposte sono già in cache: niente seconda cache nel connector
+            dns_options = {'resolver': CachedResolver(self.dns), 'use_dns_cache': False}
+        else:
+            dns_options = {'ttl_dns_cache': 300}
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            ssl=False,  # Come la versione sincrona: accetta certificati non validi
+            **dns_options
+        )
+        self.session = aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _request(self, method, url, timeout, headers=None, on_body=None, deadline=None, retries=None):
+        """
+        Esegue una richiesta seguendo i redirect, con retry e backoff esponenziale.
+        Il body non viene letto (per lo status bastano gli header), salvo che
+        on_body sia indicata: viene chiamata con la risposta finale ancora aperta.
+        Con deadline (time.monotonic) tentativi e pause non vanno oltre la scadenza;
+        retries (default self.retries) limita i nuovi tentativi.
+        """
+        if retries is None:
+            retries = self.retries
+        attempt = 0
+
+        while True:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError()
+            client_timeout = aiohttp.ClientTimeout(total=remaining, sock_connect=timeout, sock_read=timeout)
+            last_attempt = attempt >= retries
+            try:
+                async with self.session.request(method, url, timeout=client_timeout, headers=headers,
+                                                allow_redirects=True, max_redirects=30) as response:
+                    if response.status not in RETRY_STATUS_CODES or last_attempt:
+                        if on_body is not None:
+                            await on_body(response)
+                        return response
+                    retry_response = response
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last_attempt:
+                    raise
+                retry_response = None
+
+            attempt += 1
+            delay = self.backoff_factor * (2 ** (attempt - 1))
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= delay:
+                    # Il prossimo tentativo non starebbe nel tempo massimo per URL
+                    if retry_response is not None:
+                        return retry_response
+                    raise asyncio.TimeoutError()
+            await asyncio.sleep(delay)
+
+    async def _scan_links(self, response, verify_host):
+        """Come BacklinkChecker._scan_links, leggendo il body a blocchi da aiohttp"""
+        content_type = response.headers.get('Content-Type', '')
+        if response.status != 200 or not is_html(content_type):
+            return None
+        
+        scanner = LinkScanner(str(response.url), verify_host, charset_of(content_type))
+        async for chunk in response.content.iter_chunked(SCAN_CHUNK_SIZE):
+            if scanner.feed_bytes(chunk):
+                break
+        scanner.finish()
+        return scanner
+    
+    async def check_url(self, url, timeout=8, verify_host=None, fast=False, get_only=False, deadline=None):
+        """
+        Controlla un singolo URL e restituisce informazioni dettagliate.
+        Con verify_host legge anche la pagina e raccoglie i link verso quel dominio.
+        Tutti i tentativi stanno nel tempo massimo per URL e nella scadenza dell'analisi
+        (e in deadline, time.monotonic, se indicata).
+        fast e get_only come in BacklinkChecker.check_url (prima e seconda fase).
+        """
+        original_url = normalize_url(url)
+        if original_url is None:
+            return error_result(url, 'INVALID', 'URL vuoto o non valido')
+
+        start_time = time.time()
+
+        # Se c'è un risultato precedente con validatori, la richiesta diventa condizionale
+        previous = self.previous_results.get(original_url)
+        headers = conditional_headers(previous)
+
+        try:
+            # Su Railway usa timeout più generoso per evitare falsi negativi
+            # (nella prima fase i falsi negativi vengono ricontrollati nella seconda)
+            if 'RAILWAY_ENVIRONMENT' in os.environ and not fast:
+                actual_timeout = 15
+            else:
+                actual_timeout = timeout
+            retries = 0 if fast else self.retries
+            url_deadline = time.monotonic() + (self.url_budget or URL_BUDGET_FACTOR * actual_timeout)
+            deadline = url_deadline if deadline is None else min(deadline, url_deadline)
+            if self.run_deadline is not None:
+                deadline = min(deadline, self.run_deadline)
+            url_deadline_var.set(deadline)
+            # I redirect già noti per l'host non costano una richiesta
+            request_url, redirect_chain = self.redirect_rules.rewrite(original_url)
+            host = url_host(request_url)
+
+            if self.dns is not None:
+                # Host inesistente: nessuna richiesta HTTP (la risoluzione è già partita in anticipo)
+                loop = asyncio.get_running_loop()
+                try:
+                    _, dns_error = await loop.run_in_executor(None, self.dns.lookup, host,
+                                                              remaining_time(deadline))
+                except TemporaryDnsError as e:
+                    # Resolver lento o in errore: l'host può esistere, l'URL resta da ritentare
+                    return dns_failure_result(original_url, e, round(time.time() - start_time, 3))
+                if dns_error is not None:
+                    return error_result(original_url, DNS_ERROR, f'DNS: {dns_error}',
+                                        round(time.time() - start_time, 3))
+
+            scanner = None
+            if verify_host:
+                # Per verificare i link serve il contenuto: GET diretta, senza HEAD
+                async def scan(response):
+                    nonlocal scanner
+                    scanner = await self._scan_links(response, verify_host)
+
+                response = await self._request('GET', request_url, actual_timeout, headers, on_body=scan,
+                                               deadline=deadline, retries=retries)
+            elif get_only:
+                response = await self._request('GET', request_url, actual_timeout, headers, deadline=deadline,
+                                               retries=retries)
+            elif not self.head_support.use_head(host):
+                # Host che rifiuta HEAD: GET diretta, senza il HEAD destinato a fallire
+                response = await self._request('GET', request_url, actual_timeout, headers, deadline=deadline,
+                                               retries=retries)
+                self.head_support.skipped(1 + len(response.history))
+            else:
+                # Prima richiesta HEAD per velocità
+                try:
+                    response = await self._request('HEAD', request_url, actual_timeout, headers, deadline=deadline,
+                                                   retries=retries)
+
+                    # Se HEAD fallisce o restituisce errore, prova sempre GET
+                    # (tranne quando il sito chiede di rallentare)
+                    if response.status >= 400 and response.status not in THROTTLE_STATUS_CODES:
+                        head_status = response.status
+                        response = await self._request('GET', request_url, actual_timeout, headers, deadline=deadline,
+                                                       retries=retries)
+                        self.head_support.record(host, head_status, response.status)
+                    elif response.status < 400:
+                        self.head_support.record(host, response.status)
+
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if fast:
+                        raise  # Nella prima fase la GET la fa la seconda, con il timeout pieno
+                    # Se HEAD fallisce completamente, prova direttamente GET
+                    response = await self._request('GET', request_url, actual_timeout, headers, deadline=deadline,
+                                                   retries=retries)
+
+            response_time = round(time.time() - start_time, 3)
+
+            # 304 Not Modified: la pagina non è cambiata dall'ultimo controllo
+            if response.status == 304 and headers:
+                return revalidated_result(previous, response_time)
+
+            # Traccia la catena di redirect (dopo quelli dedotti dalle regole dell'host)
+            hops = [(str(resp.url), resp.status, resp.reason) for resp in response.history]
+            self.redirect_rules.observe(hops, None if 300 <= response.status < 400 else str(response.url))
+            redirect_chain += [{
+                'from_url': from_url,
+                'status_code': status_code,
+                'reason': reason
+            } for from_url, status_code, reason in hops]
+
+            has_redirects = len(redirect_chain) > 0
+
+            result = {
+                'url': original_url,
+                'status': classify_status(response.status, has_redirects),
+                'status_code': response.status,
+                'redirect_chain': redirect_chain,
+                'final_url': str(response.url),
+                'error': None if response.status == 200 else f'HTTP {response.status}: {response.reason}',
+                'response_time': response_time,
+                'redirect_count': len(redirect_chain),
+                'has_redirects': has_redirects,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'protocol': f'HTTP/{response.version.major}.{response.version.minor}',
+                'retry_after': retry_after_seconds(response.headers.get('Retry-After'))
+            }
+
+            if scanner is not None:
+                result.update({
+                    'verified_host': verify_host,
+                    'target_links': scanner.links,
+                    'target_link_count': scanner.link_count,
+                    'target_links_truncated': scanner.links_truncated
+                })
+
+            return result
+
+        # ServerTimeoutError è anche un ClientConnectionError: va intercettato prima
+        except asyncio.TimeoutError:
+            elapsed = round(time.time() - start_time, 3)
+            return error_result(original_url, 'TIMEOUT', f'Timeout dopo {elapsed}s', elapsed)
+
+        except aiohttp.ClientConnectionError:
+            return error_result(original_url, 'CONNECTION_ERROR',
+                                'Connessione fallita - Sito offline o irraggiungibile',
+                                round(time.time() - start_time, 3))
+
+        except Exception as e:
+            return error_result(original_url, 'ERROR', f'Errore: {str(e)[:100]}',
+                                round(time.time() - start_time, 3))
+
+    async def check_url_wrapper(self, url_data, timeout=8):
+        """Wrapper per il controllo URL che aggiunge il row_index"""
+        index, url = url_data[0], url_data[1]
+        verify_host = verification_host(url_data) if self.verify_links else None
+
+        try:
+            result = await self.check_url(url, timeout=timeout, verify_host=verify_host, fast=self.fast,
+                                          get_only=self.get_only, deadline=self.retry_deadlines.get(index))
+        except Exception as e:
+            result = error_result(url, 'ERROR', str(e), 0, final_url=url)
+
+        result['row_index'] = index
+        return result
+
+    async def check_many(self, url_data, on_result, should_stop=None):
+        """
+        Controlla tutte le coppie (row_index, url) con al massimo
+        max_concurrency richieste in volo, chiamando on_result per ogni risultato.
+        url_data può essere anche un HostScheduler già configurato.
+        """
+        if isinstance(url_data, HostScheduler):
+            scheduler = url_data
+        else:
+            scheduler = HostScheduler(url_data, key=lambda data: url_host(data[1]),
+                                      max_per_host=self.max_per_host,
+                                      min_interval=self.host_min_interval)
+
+        opened_here = self.session is None
+        if opened_here:
+            await self.open()
+
+        # Svegliato ogni volta che un host libera uno slot
+        slot_released = asyncio.Event()
+        active = 0
+
+        async def worker():
+            nonlocal active
+            while not scheduler.done:
+                if should_stop and should_stop():
+                    return
+                if self.run_deadline is not None and time.monotonic() >= self.run_deadline:
+                    # Durata massima dell'analisi scaduta: le righe restanti le segna il chiamante
+                    return
+
+                if self.concurrency_limit is not None and active >= max(1, self.concurrency_limit()):
+                    # Oltre il limite corrente: il limite può cambiare anche senza slot liberati
+                    await asyncio.sleep(0.05)
+                    continue
+
+                item = scheduler.pop_ready()
+                if item is None:
+                    # Tutti gli host in attesa sono saturi o nell'intervallo minimo
+                    slot_released.clear()
+                    try:
+                        await asyncio.wait_for(slot_released.wait(), timeout=scheduler.wait_time())
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                host, data = item
+                blocked = self.admit(host, data) if self.admit is not None else None
+                if blocked is not None:
+                    scheduler.release(host)
+                    on_result(blocked)
+                    continue
+
+                active += 1
+                try:
+                    result = await self.check_url_wrapper(data, timeout=self.timeout)
+                finally:
+                    active -= 1
+                    scheduler.release(host)
+                    slot_released.set()
+                on_result(result)
+
+        async def watch_stop(workers):
+            # Allo stop le richieste in volo vengono annullate (e le connessioni chiuse):
+            # i loro risultati incompleti non vengono consegnati
+            while not all(task.done() for task in workers):
+                if should_stop():
+                    for task in workers:
+                        task.cancel()
+                    return
+                await asyncio.sleep(STOP_POLL_INTERVAL)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.max_concurrency)]
+        watcher = asyncio.ensure_future(watch_stop(workers)) if should_stop else None
+        try:
+            outcomes = await asyncio.gather(*workers, return_exceptions=True)
+            for outcome in outcomes:
+                if isinstance(outcome, Exception):
+                    raise outcome
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if opened_here:
+                await self.close()
+
+    def run(self, url_data, on_result, should_stop=None):
+        """Esegue check_many in un nuovo event loop (punto d'ingresso sincrono)"""
+        asyncio.run(self.check_many(url_data, on_result, should_stop=should_stop))
@@ -6,147 +6,810 @@ Controlla tutti i link nella colonna 'Backlink' del file CSV
 Verifica status HTTP, redirect e funzionalità dei link
 """
 
-import csv
 import requests
 import time
 import pandas as pd
 from urllib.parse import urlparse
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 import sys
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import threading
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import urllib3
+import socket
+import weakref
+from urllib3.exceptions import NewConnectionError, NameResolutionError, ConnectTimeoutError
+from urllib3.util.timeout import Timeout
+
+from host_scheduler import HostScheduler
+from result_cache import ResultCache, HOUR
+from report_writer import ReportWriter, RunStats, read_report, remove_rows, truncate_partial_line
+from adaptive_limit import AdaptiveLimit, INITIAL_LIMIT
+from circuit_breaker import HostCircuitBreaker, HOST_DOWN, DEFAULT_THRESHOLD, DEFAULT_PROBE_AFTER
+from dns_cache import DnsCache, DNS_ERROR, TemporaryDnsError, DnsLookupTimeout
+from head_support import HeadSupport
+from redirect_rules import RedirectRules
+from link_verifier import (
+    LinkScanner, SCAN_CHUNK_SIZE, is_html, charset_of, link_host, match_target_links
+)
 
 # Disabilita i warning SSL per una migliore esperienza utente
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Headers ottimizzati (condivisi da tutti i motori di controllo)
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'it-IT,it;q=0.8,en-US;q=0.5,en;q=0.3',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Status HTTP per cui vale la pena ritentare la richiesta
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+# Risposte a HEAD che non passano alla GET: il sito chiede di rallentare (si ritenta più tardi)
+THROTTLE_STATUS_CODES = (429, 503)
+# Esiti senza risposta HTTP che vengono ritentati
+RETRY_ERROR_STATUSES = ('TIMEOUT', 'CONNECTION_ERROR')
+# Oltre questo Retry-After (secondi) l'URL non viene ritentato: vale l'ultimo esito
+MAX_RETRY_AFTER = 60
+# Secondi che devono restare all'URL (dopo il ritardo) per ritentarlo, o il timeout se più breve
+MIN_RETRY_WINDOW = 1.0
+
+ENGINES = ('threads', 'async')
+
+# Righe lette per blocco dal CSV e URL letti in anticipo dallo scheduler:
+# la memoria resta costante qualunque sia la dimensione del piano
+CSV_CHUNK_SIZE = 5000
+SCHEDULER_LOOKAHEAD = 10000
+# Risultati tenuti per le righe duplicate (gli URL usati più di recente): un duplicato
+# più lontano nel piano viene ricontrollato (o preso dalla cache) invece di restare in memoria
+DUPLICATE_RESULTS_LIMIT = 10000
+# Campi del risultato che servono solo al controllo e alla cache, non alle righe duplicate
+CHECK_ONLY_FIELDS = ('etag', 'last_modified', 'retry_after')
+# Intervallo massimo tra due controlli di stop e del limite di richieste in volo
+WINDOW_POLL_INTERVAL = 0.5
+# Dopo uno stop, secondi concessi alle richieste in corso (già interrotte) per terminare
+CANCEL_GRACE = 2.0
+# Tempo massimo per URL (retry e fallback HEAD -> GET inclusi), in multipli del timeout
+URL_BUDGET_FACTOR = 2
+# Status delle righe non controllate perché la durata massima dell'analisi è scaduta
+SKIPPED_DEADLINE = 'SKIPPED_DEADLINE'
+# Status dei risultati ottenuti senza richieste di rete: non dicono nulla su carico e host
+UNCHECKED_STATUSES = ('INVALID', SKIPPED_DEADLINE, HOST_DOWN, DNS_ERROR)
+# Controllo in due fasi: la prima con timeout breve e senza retry (tranne i THROTTLE_STATUS_CODES
+# con Retry-After), la seconda (solo GET, timeout pieno, concorrenza divisa per
+# SECOND_PASS_DIVISOR) ricontrolla questi status e i THROTTLE_STATUS_CODES
+FAST_TIMEOUT = 3
+SECOND_PASS_STATUSES = ('TIMEOUT', 'CONNECTION_ERROR', 'SERVER_ERROR')
+SECOND_PASS_DIVISOR = 4
+
+# Colonne del piano di pubblicazione copiate nel risultato di ogni riga (campo -> colonna CSV)
+METADATA_COLUMNS = {
+    'nome_azienda': 'Nome Azienda',
+    'sito_pubblicazione': 'Sito di pubblicazione',
+    'titolo': 'Titolo',
+    'data_pubblicazione': 'Data di pubblicazione',
+    'referente': 'Referente',
+    'target_backlink': 'Target backlink (URL)',
+    'anchor_text': 'Anchor text'
+}
+
+# Colonne del report dettagliato (CLI e GUI)
+DETAILED_REPORT_FIELDS = [
+    'row_index', 'url', 'status', 'status_code', 'final_url', 
+    'has_redirects', 'redirect_count', 'redirect_chain_details',
+    'response_time', 'error', 'check_timestamp',
+    'nome_azienda', 'sito_pubblicazione', 'titolo', 'data_pubblicazione',
+    'target_found', 'anchor_match', 'target_link_count', 'rel_nofollow', 'rel_sponsored',
+    'protocol', 'phase', 'attempts'
+]
+
+# Campi della verifica del contenuto (vuoti se la verifica non è stata fatta)
+VERIFICATION_FIELDS = ('target_found', 'anchor_match', 'target_link_count', 'rel_nofollow', 'rel_sponsored')
+
+# Body sotto questa soglia (Content-Length) viene letto per riusare la connessione keep-alive;
+# oltre conviene chiudere il socket piuttosto che scaricare tutta la pagina
+DRAIN_LIMIT = 16 * 1024
+
+
+def normalize_url(url):
+    """
+    Pulisce e normalizza un URL come fa check_url.
+    Restituisce None se l'URL è vuoto o non valido.
+    """
+    if not url or str(url).strip() == '' or str(url).lower() == 'nan':
+        return None
+
+    normalized = str(url).strip()
+    if not normalized.startswith(('http://', 'https://')):
+        normalized = 'https://' + normalized
+    return normalized
+
+
+def read_csv_columns(csv_file_path):
+    """Legge solo l'intestazione del CSV"""
+    return list(pd.read_csv(csv_file_path, encoding='utf-8', nrows=0).columns)
+
+
+def find_backlink_column(columns):
+    """Colonna 'Backlink' del piano (o una variante), None se manca"""
+    for col in columns:
+        if col.strip().lower() == 'backlink':
+            return col
+    
+    # Se non trova 'Backlink', cerca altre varianti
+    for col in columns:
+        if 'backlink' in col.lower() and 'target' not in col.lower() and 'n.' not in col.lower():
+            return col
+    return None
+
+
+def _valid_backlink_mask(urls):
+    """Righe con un backlink non vuoto che inizia con http o www."""
+    return (urls != '') & (urls != 'nan') & urls.str.startswith(('http', 'www.'))
+
+
+def _read_chunks(csv_file_path, usecols, chunksize):
+    return pd.read_csv(csv_file_path, encoding='utf-8', usecols=usecols, dtype=str,
+                       keep_default_na=False, chunksize=chunksize)
+
+
+def count_backlinks(csv_file_path, backlink_column, chunksize=CSV_CHUNK_SIZE):
+    """Conta i backlink validi leggendo a blocchi la sola colonna backlink"""
+    total = 0
+    for chunk in _read_chunks(csv_file_path, [backlink_column], chunksize):
+        total += int(_valid_backlink_mask(chunk[backlink_column].str.strip()).sum())
+    return total
+
+
+def count_rows(csv_file_path, chunksize=CSV_CHUNK_SIZE):
+    """Conta le righe del CSV senza caricarlo tutto in memoria"""
+    first_column = read_csv_columns(csv_file_path)[:1]
+    return sum(len(chunk) for chunk in _read_chunks(csv_file_path, first_column, chunksize))
+
+
+def iter_backlinks(csv_file_path, backlink_column, metadata_columns=METADATA_COLUMNS,
+                   chunksize=CSV_CHUNK_SIZE):
+    """
+    Legge il CSV a blocchi, solo con le colonne necessarie, e produce
+    (row_index, url, metadata) per ogni riga con un backlink valido.
+    Le colonne dei metadati vengono cercate ignorando maiuscole e spazi;
+    quelle assenti nel file producono valori vuoti.
+    """
+    by_name = {col.strip().lower(): col for col in read_csv_columns(csv_file_path)}
+    found = {field: by_name.get(name.strip().lower()) for field, name in metadata_columns.items()}
+    missing = [field for field, col in found.items() if col is None]
+    found = {field: col for field, col in found.items() if col is not None}
+    usecols = list(dict.fromkeys([backlink_column] + list(found.values())))
+    
+    for chunk in _read_chunks(csv_file_path, usecols, chunksize):
+        urls = chunk[backlink_column].str.strip()
+        mask = _valid_backlink_mask(urls)
+        valid = chunk[mask]
+        columns = [valid[col] for col in found.values()]
+        
+        for row_index, url, *values in zip(valid.index, urls[mask], *columns):
+            metadata = dict(zip(found.keys(), values))
+            for field in missing:
+                metadata[field] = ''
+            yield int(row_index), url, metadata
+
+
+def url_host(url):
+    """Restituisce l'host (minuscolo) di un URL, stringa vuota se non valido"""
+    normalized = normalize_url(url)
+    if normalized is None:
+        return ''
+    try:
+        return (urlparse(normalized).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+def url_endpoint(url):
+    """host:porta di un URL (porta di default dello schema se assente), stringa vuota se non valido"""
+    normalized = normalize_url(url)
+    if normalized is None:
+        return ''
+    try:
+        parts = urlparse(normalized)
+        host = (parts.hostname or '').lower()
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        return ''
+    return f'{host}:{port}' if host else ''
+
+
+def classify_status(status_code, has_redirects):
+    """Determina lo status più preciso a partire dal codice HTTP finale"""
+    if status_code == 200:
+        return 'ONLINE_WITH_REDIRECTS' if has_redirects else 'ONLINE'
+    elif 300 <= status_code < 400:
+        return 'REDIRECT_ERROR'
+    elif 400 <= status_code < 500:
+        return 'CLIENT_ERROR'
+    elif status_code >= 500:
+        return 'SERVER_ERROR'
+    return 'UNKNOWN_ERROR'
+
+
+def conditional_headers(previous):
+    """
+    Header If-None-Match / If-Modified-Since per rivalidare un risultato precedente.
+    Solo i link che erano online possono essere confermati da un 304.
+    """
+    if not previous or previous.get('status') not in ('ONLINE', 'ONLINE_WITH_REDIRECTS'):
+        return {}
+    
+    headers = {}
+    if previous.get('etag'):
+        headers['If-None-Match'] = previous['etag']
+    if previous.get('last_modified'):
+        headers['If-Modified-Since'] = previous['last_modified']
+    return headers
+
+
+def dns_failure_result(url, error, response_time):
+    """Risultato di una risoluzione DNS non definitiva: TIMEOUT o CONNECTION_ERROR, non DNS_ERROR"""
+    if isinstance(error, DnsLookupTimeout):
+        return error_result(url, 'TIMEOUT', f'Timeout DNS: {error}', response_time)
+    return error_result(url, 'CONNECTION_ERROR', f'DNS temporaneamente non disponibile: {error}', response_time)
+
+
+def needs_second_pass(result):
+    """Esito della prima fase da ricontrollare nella seconda: errori di rete, 5xx e 429"""
+    return result['status'] in SECOND_PASS_STATUSES or result.get('status_code') in THROTTLE_STATUS_CODES
+
+
+def duplicate_result(result):
+    """Copia compatta di un risultato per le righe duplicate (senza CHECK_ONLY_FIELDS)"""
+    return {name: value for name, value in result.items() if name not in CHECK_ONLY_FIELDS}
+
+
+def revalidated_result(previous, response_time):
+    """Risultato per un 304: pagina invariata, riusa il controllo precedente (verifiche incluse)"""
+    result = dict(previous)
+    result.pop('cached', None)
+    result.pop('checked_at', None)
+    result.update({
+        'response_time': response_time,
+        'error': None,
+        'revalidated': True
+    })
+    return result
+
+
+def verification_host(url_data):
+    """Dominio del target da verificare per una tupla (row_index, url, metadata), None se assente"""
+    if len(url_data) < 3:
+        return None
+    target = normalize_url(url_data[2].get('target_backlink', ''))
+    if target is None:
+        return None
+    return link_host(target) or None
+
+
+def verification_result(result, url_data):
+    """
+    Campi di verifica per la riga: confronta i link verso il target trovati nella
+    pagina con il target e l'anchor attesi dalla riga. Vuoto se la pagina non è
+    stata analizzata per questo target.
+    """
+    host = verification_host(url_data)
+    if not host or result.get('verified_host') != host:
+        return {}
+    metadata = url_data[2]
+    return match_target_links(result['target_links'], result['target_link_count'],
+                              metadata['target_backlink'], metadata.get('anchor_text', ''),
+                              truncated=result.get('target_links_truncated', False))
+
+
+def error_result(url, status, error, response_time=None, final_url=None):
+    """Costruisce il dizionario di risultato per un controllo fallito"""
+    return {
+        'url': url,
+        'status': status,
+        'status_code': None,
+        'redirect_chain': [],
+        'final_url': final_url,
+        'error': error,
+        'response_time': response_time,
+        'redirect_count': 0,
+        'has_redirects': False
+    }
+
+def _yes_no(value):
+    """Sì/No per i campi booleani del report, vuoto se assente"""
+    if value is None:
+        return ''
+    return 'Sì' if value else 'No'
+
+
+def _from_yes_no(value):
+    return None if value in ('', None) else value == 'Sì'
+
+
+def skipped_result(data, deadline):
+    """Risultato di una riga non controllata perché l'analisi ha superato la durata massima"""
+    url = data[1]
+    return error_result(normalize_url(url) or url, SKIPPED_DEADLINE,
+                        f'Non controllato: durata massima dell\'analisi ({deadline}s) raggiunta')
+
+
+def response_protocol(response):
+    """Protocollo usato per la risposta ('HTTP/1.1', 'HTTP/2'), None se non noto"""
+    protocol = getattr(response, 'protocol', None)
+    if protocol:
+        return protocol
+    version = getattr(getattr(response, 'raw', None), 'version', None)
+    return {10: 'HTTP/1.0', 11: 'HTTP/1.1', 20: 'HTTP/2'}.get(version)
+
+
+def retry_after_seconds(value):
+    """Secondi indicati da un header Retry-After (numero o data HTTP), None se assente o non valido"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None or retry_at.tzinfo is None:
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def attempt_entry(result, retry_in=None):
+    """Voce della cronologia dei tentativi di un URL (retry_in: secondi prima del tentativo successivo)"""
+    return {
+        'status': result['status'],
+        'status_code': result.get('status_code'),
+        'response_time': result.get('response_time'),
+        'error': result.get('error'),
+        'retry_in': retry_in
+    }
+
+
+def attempt_details(result):
+    """Cronologia dei tentativi in una riga di testo (vuota se l'URL è stato controllato una volta)"""
+    parts = []
+    for i, attempt in enumerate(result.get('attempts') or ()):
+        part = f"{i+1}. {attempt['status']}"
+        if attempt['status_code']:
+            part += f" ({attempt['status_code']})"
+        if attempt['response_time'] is not None:
+            part += f" {attempt['response_time']}s"
+        if attempt['retry_in'] is not None:
+            part += f", nuovo tentativo dopo {attempt['retry_in']:g}s"
+        parts.append(part)
+    return " | ".join(parts)
+
+
+def detailed_report_row(result):
+    """Riga del report dettagliato per un risultato"""
+    # Prepara dettagli redirect per CSV
+    redirect_details = ""
+    if result['redirect_chain']:
+        redirect_parts = []
+        for i, redirect in enumerate(result['redirect_chain']):
+            inferred = ', dedotto' if redirect.get('inferred') else ''
+            redirect_parts.append(f"{i+1}. {redirect['from_url']} ({redirect['status_code']}{inferred})")
+        redirect_details = " | ".join(redirect_parts)
+    
+    return {
+        'row_index': result['row_index'],
+        'url': result['url'],
+        'status': result['status'],
+        'status_code': result['status_code'],
+        'final_url': result['final_url'],
+        'has_redirects': 'Sì' if result['has_redirects'] else 'No',
+        'redirect_count': result['redirect_count'],
+        'redirect_chain_details': redirect_details,
+        'response_time': result['response_time'],
+        'error': result['error'] or '',
+        'check_timestamp': datetime.fromtimestamp(result.get('checked_at', time.time())).strftime("%Y-%m-%d %H:%M:%S"),
+        'nome_azienda': result.get('nome_azienda', ''),
+        'sito_pubblicazione': result.get('sito_pubblicazione', ''),
+        'titolo': result.get('titolo', ''),
+        'data_pubblicazione': result.get('data_pubblicazione', ''),
+        'target_found': _yes_no(result.get('target_found')),
+        'anchor_match': _yes_no(result.get('anchor_match')),
+        'target_link_count': result.get('target_link_count', ''),
+        'rel_nofollow': _yes_no(result.get('rel_nofollow')),
+        'rel_sponsored': _yes_no(result.get('rel_sponsored')),
+        'protocol': result.get('protocol') or '',
+        'phase': result.get('phase') or '',
+        'attempts': attempt_details(result)
+    }
+
+
+def result_from_report_row(row):
+    """Ricostruisce un risultato (per statistiche e ripresa) da una riga del report dettagliato"""
+    return {
+        'row_index': int(row['row_index']),
+        'url': row['url'],
+        'status': row['status'],
+        'status_code': int(row['status_code']) if row['status_code'] else None,
+        'final_url': row['final_url'],
+        'has_redirects': row['has_redirects'] == 'Sì',
+        'redirect_count': int(row['redirect_count'] or 0),
+        'response_time': float(row['response_time']) if row['response_time'] else None,
+        'error': row['error'],
+        'target_found': _from_yes_no(row.get('target_found')),
+        'anchor_match': _from_yes_no(row.get('anchor_match')),
+        'target_link_count': int(row['target_link_count']) if row.get('target_link_count') else None,
+        'rel_nofollow': _from_yes_no(row.get('rel_nofollow')),
+        'rel_sponsored': _from_yes_no(row.get('rel_sponsored')),
+        'protocol': row.get('protocol') or None,
+        'phase': int(row['phase']) if row.get('phase') else None
+    }
+
+
+class CancellableAdapter(HTTPAdapter):
+    """
+    HTTPAdapter che tiene traccia dei socket aperti: abort() li chiude tutti,
+    così le richieste in corso (anche in attesa degli header) falliscono subito,
+    e impedisce nuove connessioni.
+    Con set_deadline() le richieste del thread corrente non vanno oltre la
+    scadenza indicata; con dns (DnsCache) le connessioni usano gli indirizzi
+    già risolti.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        self.cancelled = threading.Event()
+        self.sockets = weakref.WeakSet()
+        self.sockets_lock = threading.Lock()
+        self.deadlines = threading.local()
+        self.dns = None
+        super().__init__(*args, **kwargs)
+    
+    def set_deadline(self, deadline):
+        """Scadenza (time.monotonic) delle richieste del thread corrente; None per toglierla"""
+        self.deadlines.value = deadline
+    
+    def remaining(self):
+        """Secondi prima della scadenza del thread corrente, None se non c'è scadenza"""
+        deadline = getattr(self.deadlines, 'value', None)
+        return None if deadline is None else deadline - time.monotonic()
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+        pool_classes = {}
+        for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items():
+            base = pool_class.ConnectionCls
+            
+            def _new_conn(connection, base=base):
+                if adapter.cancelled.is_set():
+                    raise NewConnectionError(connection, 'Controllo annullato')
+                if adapter.dns is None:
+                    sock = base._new_conn(connection)
+                else:
+                    sock = adapter.connect_resolved(connection, base)
+                with adapter.sockets_lock:
+                    adapter.sockets.add(sock)
+                return sock
+            
+            def _get_timeout(pool, timeout, pool_class=pool_class):
+                # Chiamato a ogni tentativo: connect e read non superano la scadenza
+                timeout = pool_class._get_timeout(pool, timeout)
+                remaining = adapter.remaining()
+                if remaining is None:
+                    return timeout
+                remaining = max(remaining, 0.001)
+                connect, read = timeout.connect_timeout, timeout.read_timeout
+                return Timeout(connect=min(connect, remaining) if isinstance(connect, (int, float)) else remaining,
+                               read=min(read, remaining) if isinstance(read, (int, float)) else remaining)
+            
+            connection_class = type(f'Cancellable{base.__name__}', (base,), {'_new_conn': _new_conn})
+            pool_classes[scheme] = type(f'Cancellable{pool_class.__name__}', (pool_class,),
+                                        {'ConnectionCls': connection_class, '_get_timeout': _get_timeout})
+        self.poolmanager.pool_classes_by_scheme = pool_classes
+    
+    def connect_resolved(self, connection, base):
+        """Apre la connessione provando in ordine gli indirizzi dell'host presi dalla cache DNS"""
+        host = connection._dns_host
+        try:
+            addresses, error = self.dns.lookup(host, timeout=self.remaining())
+        except DnsLookupTimeout as e:
+            raise ConnectTimeoutError(connection, str(e)) from e
+        except TemporaryDnsError as e:
+            raise NameResolutionError(connection.host, connection, e) from e
+        if error is not None or not addresses:
+            raise NameResolutionError(connection.host, connection, socket.gaierror(error))
+        last_error = None
+        try:
+            for _, address in addresses:
+                connection._dns_host = address
+                try:
+                    return base._new_conn(connection)
+                except NewConnectionError as e:
+                    last_error = e
+        finally:
+            connection._dns_host = host
+        raise last_error
+    
+    def abort(self):
+        self.cancelled.set()
+        with self.sockets_lock:
+            sockets = list(self.sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # Socket già chiuso
+
+
 class BacklinkChecker:
-    def __init__(self, csv_file_path, max_workers=10):
+    def __init__(self, csv_file_path, max_workers=10, engine='threads',
+                 max_per_host=4, host_min_interval=0.0, cache=None, resume_report=None,
+                 verify_links=False, adaptive=False, url_budget=None, deadline=None,
+                 host_failures=DEFAULT_THRESHOLD, host_probe_after=DEFAULT_PROBE_AFTER, dns_cache=True,
+                 http2=False, two_phase=False, fast_timeout=FAST_TIMEOUT):
         self.csv_file_path = csv_file_path
-        self.results = []
         self.max_workers = max_workers
+        self.engine = engine
+        # Cortesia verso i siti di pubblicazione: richieste in volo per host e pausa minima
+        self.max_per_host = max_per_host
+        self.host_min_interval = host_min_interval
+        # Richieste evitate grazie agli URL duplicati nel piano
+        self.requests_saved = 0
+        # Cache persistente opzionale (ResultCache): i risultati ancora validi non vengono ricontrollati
+        self.cache = cache
+        self.cache_hits = 0
+        # Risultati scaduti con ETag/Last-Modified: vengono rivalidati con richieste condizionali
+        self.previous_results = {}
+        self.revalidated = 0
+        # Verifica opzionale del contenuto: target e anchor presenti nell'articolo
+        self.verify_links = verify_links
+        # I risultati vengono scritti nel report appena arrivano: in memoria restano solo le statistiche
+        self.stats = RunStats()
+        self.report_writer = None
+        self.resume_report = resume_report
+        self.completed_rows = set()
+        # Limite dinamico opzionale alle richieste in volo (es. parte del budget condiviso della web app)
+        self.concurrency_limit = None
+        # Concorrenza adattiva opzionale: max_workers diventa il tetto, il limite si regola sui risultati
+        self.adaptive = AdaptiveLimit(max_workers, on_decision=print) if adaptive else None
+        # Circuit breaker per host: dopo host_failures errori consecutivi gli URL dell'host
+        # vengono segnati HOST_DOWN senza richieste (0 = disattivato)
+        self.breaker = (HostCircuitBreaker(host_failures, probe_after=host_probe_after, on_change=print)
+                        if host_failures else None)
         self.lock = threading.Lock()
         self.timeout = 8  # Timeout default
+        # Host che rifiutano HEAD (imparati durante il controllo e salvati nella cache):
+        # i loro URL vengono controllati direttamente con una GET
+        self.head_support = HeadSupport(
+            known=cache.head_support() if cache is not None else None,
+            on_change=cache.put_head_support if cache is not None else None
+        )
+        # Redirect ricorrenti per host (http -> https, www, slash finale) imparati durante il
+        # controllo: vengono applicati prima della richiesta e riportati come dedotti
+        self.redirect_rules = RedirectRules()
+        # Tempo massimo per URL con tutti i retry (None = URL_BUDGET_FACTOR volte il timeout)
+        self.url_budget = url_budget
+        # Retry differiti: un 429/5xx, timeout o errore di connessione rimette l'URL nello
+        # scheduler dopo il backoff (o il Retry-After) e il worker passa intanto ad altri URL
+        if os.environ.get('RAILWAY_ENVIRONMENT'):
+            self.retries = 5  # Più tentativi su Railway
+            self.backoff_factor = 0.5
+        else:
+            self.retries = 3
+            self.backoff_factor = 0.3
+        self.retry_deadlines = {}  # row_index -> scadenza dell'URL (dal primo tentativo) per i retry
+        self.retried_urls = 0
+        self.retry_recovered = 0
+        # Durata massima opzionale dell'analisi: poi le righe restanti diventano SKIPPED_DEADLINE
+        self.deadline = deadline
+        # Controllo in due fasi: tutti gli URL con fast_timeout e senza retry, poi solo quelli
+        # da ricontrollare (needs_second_pass) con il timeout pieno (ricontrollati e recuperati nella seconda)
+        self.two_phase = two_phase
+        self.fast_timeout = fast_timeout
+        self.second_pass_checked = 0
+        self.second_pass_recovered = 0
         
-        # Configura sessione con retry strategy e connection pooling
+        # Configura sessione con connection pooling
         self.session = requests.Session()
         # Disabilita verifica SSL per considerare accessibili anche link con certificati non validi
         self.session.verify = False
         
-        # Strategia di retry più robusta per Railway
-        if os.environ.get('RAILWAY_ENVIRONMENT'):
-            retry_strategy = Retry(
-                total=5,  # Più tentativi su Railway
-                backoff_factor=0.5,
-                status_forcelist=[429, 500, 502, 503, 504],
-                connect=3,  # Retry per errori di connessione
-                read=3,     # Retry per errori di lettura
-            )
-        else:
-            retry_strategy = Retry(
-                total=3,
-                backoff_factor=0.3,
-                status_forcelist=[429, 500, 502, 503, 504],
-            )
-        adapter = HTTPAdapter(
-            max_retries=retry_strategy,
+        # Le connessioni sono tracciate per poterle chiudere subito con cancel();
+        # nessun retry nell'adapter: li gestisce lo scheduler (vedi retry_delay)
+        self.adapter = CancellableAdapter(
+            max_retries=0,
             pool_connections=20,
             pool_maxsize=20
         )
+        # Cache DNS condivisa: ogni host viene risolto una volta sola, in anticipo
+        self.dns = DnsCache() if dns_cache else None
+        self.adapter.dns = self.dns
+        adapter = self.adapter
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
-        # Headers ottimizzati
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'it-IT,it;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        })
-        
-    def check_url(self, url, timeout=8):
+        self.session.headers.update(DEFAULT_HEADERS)
+        
+        # Trasporto delle richieste: la sessione requests (HTTP/1.1) o, con http2, httpx
+        # che multiplexa i controlli verso lo stesso host su una sola connessione
+        self.http2 = None
+        self.http = self.session
+        if http2:
+            from http2_session import Http2Session
+            # Gli header di connessione (Connection: keep-alive) non sono ammessi in HTTP/2
+            headers = {name: value for name, value in DEFAULT_HEADERS.items() if name != 'Connection'}
+            self.http2 = self.http = Http2Session(max_connections=max_workers, headers=headers,
+                                                  remaining=self.adapter.remaining, dns=self.dns)
+        
+    def _request_timeout(self, timeout):
+        """Timeout di una richiesta, ridotto a quanto resta del tempo massimo per URL"""
+        remaining = self.adapter.remaining()
+        return timeout if remaining is None else min(timeout, max(remaining, 0.001))
+    
+    def _head(self, url, timeout, headers=None):
+        return self.http.head(url, timeout=self._request_timeout(timeout), allow_redirects=True, headers=headers)
+    
+    def _get(self, url, timeout, headers=None):
+        """GET in streaming: vengono letti solo gli header, il body resta sul socket"""
+        return self.http.get(url, timeout=self._request_timeout(timeout), allow_redirects=True, stream=True,
+                             headers=headers)
+    
+    def _release_response(self, response):
         """
-        Controlla un singolo URL e restituisce informazioni dettagliate
+        Restituisce subito la connessione al pool senza scaricare la pagina.
+        I body piccoli vengono letti per mantenere viva la connessione keep-alive,
+        quelli grandi (o di lunghezza ignota) chiudono il socket.
         """
-
+        try:
+            content_length = int(response.headers.get('Content-Length', ''))
+        except ValueError:
+            content_length = None
         
-        if not url or str(url).strip() == '' or str(url).lower() == 'nan':
-
-            return {
-                'url': url,
-                'status': 'INVALID',
-                'status_code': None,
-                'redirect_chain': [],
-                'final_url': None,
-                'error': 'URL vuoto o non valido',
-                'response_time': None,
-                'redirect_count': 0,
-                'has_redirects': False
-            }
-            
+        try:
+            if content_length is not None and content_length <= DRAIN_LIMIT:
+                response.content
+        except Exception:
+            pass
+        finally:
+            response.close()
+    
+    def _scan_links(self, response, verify_host):
+        """
+        Legge il body in streaming cercando i link verso verify_host,
+        fermandosi alla fine dell'articolo. None se la pagina non è HTML.
+        """
+        content_type = response.headers.get('Content-Type', '')
+        if not is_html(content_type):
+            return None
+        
+        scanner = LinkScanner(response.url, verify_host, charset_of(content_type))
+        for chunk in response.iter_content(SCAN_CHUNK_SIZE):
+            if scanner.feed_bytes(chunk):
+                break
+            remaining = self.adapter.remaining()
+            if remaining is not None and remaining <= 0:
+                raise requests.exceptions.ReadTimeout('Tempo massimo per URL esaurito durante la lettura')
+        scanner.finish()
+        return scanner
+    
+    def url_deadline(self, timeout, deadline=None):
+        """
+        Scadenza (time.monotonic) di un URL che parte ora: url_budget secondi
+        (o URL_BUDGET_FACTOR volte il timeout), mai oltre la scadenza dell'analisi
+        """
+        budget = self.url_budget or URL_BUDGET_FACTOR * timeout
+        url_deadline = time.monotonic() + budget
+        return min(url_deadline, deadline) if deadline is not None else url_deadline
+    
+    def effective_timeout(self, timeout, fast=False):
+        """
+        Timeout delle richieste: su Railway più generoso per evitare falsi negativi
+        (non nella prima fase, i cui falsi negativi vengono ricontrollati nella seconda)
+        """
+        if 'RAILWAY_ENVIRONMENT' in os.environ and not fast:
+            return 15  # Timeout più generoso su Railway
+        return timeout
+    
+    def check_url(self, url, timeout=8, verify_host=None, deadline=None, fast=False, get_only=False):
+        """
+        Controlla un singolo URL (un tentativo, senza retry) e restituisce informazioni
+        dettagliate. Con verify_host legge anche la pagina e raccoglie i link verso quel dominio.
+        Il fallback HEAD -> GET sta nel tempo massimo per URL; deadline (time.monotonic,
+        opzionale) è la scadenza dell'analisi o, per i retry, quella dell'URL.
+        Con fast (prima fase) usa timeout così com'è e non fa GET dopo un HEAD fallito;
+        con get_only (seconda fase) fa direttamente una GET.
+        """
         # Pulisci e normalizza l'URL
-        original_url = str(url).strip()
-        if not original_url.startswith(('http://', 'https://')):
-            if original_url.startswith('www.'):
-                original_url = 'https://' + original_url
-            else:
-                original_url = 'https://' + original_url
+        original_url = normalize_url(url)
+        if original_url is None:
+            return error_result(url, 'INVALID', 'URL vuoto o non valido')
         
-
         start_time = time.time()
-        redirect_chain = []
+        
+        # Se c'è un risultato precedente con validatori, la richiesta diventa condizionale
+        previous = self.previous_results.get(original_url)
+        headers = conditional_headers(previous)
         
         try:
-            # Su Railway usa timeout più generoso per evitare falsi negativi
-            if 'RAILWAY_ENVIRONMENT' in os.environ:
-                actual_timeout = 15  # Timeout più generoso su Railway
-            else:
-                actual_timeout = timeout
+            actual_timeout = self.effective_timeout(timeout, fast)
+            self.adapter.set_deadline(self.url_deadline(actual_timeout, deadline))
+            # I redirect già noti per l'host non costano una richiesta
+            request_url, redirect_chain = self.redirect_rules.rewrite(original_url)
+            host = url_host(request_url)
             
-
+            if self.dns is not None:
+                # Host inesistente: nessuna richiesta HTTP (la risoluzione è già partita in anticipo)
+                try:
+                    _, dns_error = self.dns.lookup(host, timeout=self._request_timeout(actual_timeout))
+                except TemporaryDnsError as e:
+                    # Resolver lento o in errore: l'host può esistere, l'URL resta da ritentare
+                    return dns_failure_result(original_url, e, round(time.time() - start_time, 3))
+                if dns_error is not None:
+                    return error_result(original_url, DNS_ERROR, f'DNS: {dns_error}',
+                                        round(time.time() - start_time, 3))
             
-            # Prima richiesta HEAD per velocità
-            try:
-                response = self.session.head(original_url, timeout=actual_timeout, allow_redirects=True)
-                
-                # Se HEAD fallisce o restituisce errore, prova sempre GET
-                if response.status_code >= 400:
-                    response = self.session.get(original_url, timeout=actual_timeout, allow_redirects=True)
+            scanner = None
+            if verify_host or get_only:
+                # Per verificare i link serve il contenuto: GET diretta, senza HEAD
+                response = self._get(request_url, actual_timeout, headers=headers)
+                if verify_host and response.status_code == 200:
+                    scanner = self._scan_links(response, verify_host)
+            elif not self.head_support.use_head(host):
+                # Host che rifiuta HEAD: GET in streaming, senza il HEAD (e i suoi redirect) destinato a fallire
+                response = self._get(request_url, actual_timeout, headers=headers)
+                self.head_support.skipped(1 + len(response.history))
+            else:
+                # Prima richiesta HEAD per velocità
+                try:
+                    response = self._head(request_url, actual_timeout, headers=headers)
                     
-            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-                # Se HEAD fallisce completamente, prova direttamente GET
-                response = self.session.get(original_url, timeout=actual_timeout, allow_redirects=True)
+                    # Se HEAD fallisce o restituisce errore, prova sempre GET
+                    # (tranne quando il sito chiede di rallentare)
+                    if response.status_code >= 400 and response.status_code not in THROTTLE_STATUS_CODES:
+                        head_status = response.status_code
+                        self._check_budget()
+                        response = self._get(request_url, actual_timeout, headers=headers)
+                        self.head_support.record(host, head_status, response.status_code)
+                    elif response.status_code < 400:
+                        self.head_support.record(host, response.status_code)
+                        
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if fast:
+                        raise  # Nella prima fase la GET la fa la seconda, con il timeout pieno
+                    # Se HEAD fallisce completamente, prova direttamente GET
+                    self._check_budget()
+                    response = self._get(request_url, actual_timeout, headers=headers)
+            
+            # Per lo status bastano gli header: libera subito la connessione
+            self._release_response(response)
             
             response_time = round(time.time() - start_time, 3)
             
-            # Traccia la catena di redirect
-            if response.history:
-                for resp in response.history:
-                    redirect_chain.append({
-                        'from_url': resp.url,
-                        'status_code': resp.status_code,
-                        'reason': resp.reason
-                    })
+            # 304 Not Modified: la pagina non è cambiata dall'ultimo controllo
+            if response.status_code == 304 and headers:
+                return revalidated_result(previous, response_time)
+            
+            # Traccia la catena di redirect (dopo quelli dedotti dalle regole dell'host)
+            hops = [(resp.url, resp.status_code, resp.reason) for resp in response.history]
+            self.redirect_rules.observe(hops, None if 300 <= response.status_code < 400 else response.url)
+            for from_url, status_code, reason in hops:
+                redirect_chain.append({
+                    'from_url': from_url,
+                    'status_code': status_code,
+                    'reason': reason
+                })
             
             # Determina lo status più preciso
             has_redirects = len(redirect_chain) > 0
             redirect_count = len(redirect_chain)
             
-            if response.status_code == 200:
-                status = 'ONLINE_WITH_REDIRECTS' if has_redirects else 'ONLINE'
-            elif 300 <= response.status_code < 400:
-                status = 'REDIRECT_ERROR'
-            elif 400 <= response.status_code < 500:
-                status = 'CLIENT_ERROR'
-            elif response.status_code >= 500:
-                status = 'SERVER_ERROR'
-            else:
-                status = 'UNKNOWN_ERROR'
+            status = classify_status(response.status_code, has_redirects)
                     
             result = {
                 'url': original_url,
@@ -157,74 +820,509 @@ class BacklinkChecker:
                 'error': None if response.status_code == 200 else f'HTTP {response.status_code}: {response.reason}',
                 'response_time': response_time,
                 'redirect_count': redirect_count,
-                'has_redirects': has_redirects
+                'has_redirects': has_redirects,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'protocol': response_protocol(response),
+                'retry_after': retry_after_seconds(response.headers.get('Retry-After'))
             }
             
+            if scanner is not None:
+                result.update({
+                    'verified_host': verify_host,
+                    'target_links': scanner.links,
+                    'target_link_count': scanner.link_count,
+                    'target_links_truncated': scanner.links_truncated
+                })
+            
             return result
             
         except requests.exceptions.Timeout:
-            return {
-                'url': original_url,
-                'status': 'TIMEOUT',
-                'status_code': None,
-                'redirect_chain': [],
-                'final_url': None,
-                'error': f'Timeout dopo {timeout}s',
-                'response_time': timeout,
-                'redirect_count': 0,
-                'has_redirects': False
-            }
+            elapsed = round(time.time() - start_time, 3)
+            return error_result(original_url, 'TIMEOUT', f'Timeout dopo {elapsed}s', elapsed)
             
         except requests.exceptions.ConnectionError:
-            return {
-                'url': original_url,
-                'status': 'CONNECTION_ERROR',
-                'status_code': None,
-                'redirect_chain': [],
-                'final_url': None,
-                'error': 'Connessione fallita - Sito offline o irraggiungibile',
-                'response_time': round(time.time() - start_time, 3),
-                'redirect_count': 0,
-                'has_redirects': False
-            }
+            elapsed = round(time.time() - start_time, 3)
+            remaining = self.adapter.remaining()
+            if remaining is not None and remaining <= 0 and not self.cancelled:
+                # Connessione interrotta dal tempo massimo per URL
+                return error_result(original_url, 'TIMEOUT', f'Timeout dopo {elapsed}s (retry inclusi)', elapsed)
+            return error_result(original_url, 'CONNECTION_ERROR',
+                                'Connessione fallita - Sito offline o irraggiungibile', elapsed)
             
         # Gli errori SSL sono ora gestiti automaticamente (verifica disabilitata)
             
         except Exception as e:
-            return {
-                'url': original_url,
-                'status': 'ERROR',
-                'status_code': None,
-                'redirect_chain': [],
-                'final_url': None,
-                'error': f'Errore: {str(e)[:100]}',
-                'response_time': round(time.time() - start_time, 3),
-                'redirect_count': 0,
-                'has_redirects': False
-            }
+            return error_result(original_url, 'ERROR', f'Errore: {str(e)[:100]}',
+                                round(time.time() - start_time, 3))
+        
+        finally:
+            self.adapter.set_deadline(None)
+    
+    def _check_budget(self):
+        """Prima del fallback GET: se il tempo massimo per URL è finito il controllo è in timeout"""
+        remaining = self.adapter.remaining()
+        if remaining is not None and remaining <= 0:
+            raise requests.exceptions.Timeout('Tempo massimo per URL esaurito')
             
-    def check_url_wrapper(self, url_data, timeout=8):
+    def check_url_wrapper(self, url_data, timeout=8, deadline=None, fast=False, get_only=False):
         """Wrapper per il controllo URL con threading"""
-        index, url = url_data
+        index, url = url_data[0], url_data[1]
+        verify_host = verification_host(url_data) if self.verify_links else None
+        # Un retry non va oltre il tempo massimo dell'URL, contato dal primo tentativo
+        url_deadline = self.retry_deadlines.get(index)
+        if url_deadline is not None:
+            deadline = url_deadline if deadline is None else min(deadline, url_deadline)
         
         try:
-            result = self.check_url(url, timeout=timeout)
+            result = self.check_url(url, timeout=timeout, verify_host=verify_host, deadline=deadline,
+                                    fast=fast, get_only=get_only)
             result['row_index'] = index
             return result
             
         except Exception as e:
-            return {
-                'url': url,
-                'status': 'ERROR',
-                'status_code': None,
-                'redirect_chain': [],
-                'final_url': url,
-                'error': str(e),
-                'response_time': 0,
-                'redirect_count': 0,
-                'has_redirects': False,
-                'row_index': index
-            }
+            result = error_result(url, 'ERROR', str(e), 0, final_url=url)
+            result['row_index'] = index
+            return result
+    
+    def window_size(self):
+        """
+        Richieste in volo consentite ora: max_workers, ridotto da concurrency_limit
+        e dalla concorrenza adattiva se impostati
+        """
+        window = self.max_workers
+        if self.concurrency_limit is not None:
+            window = min(window, self.concurrency_limit())
+        if self.adaptive is not None:
+            window = min(window, self.adaptive())
+        return max(1, window)
+    
+    def retry_delay(self, result, attempt):
+        """
+        Secondi dopo cui ritentare un URL il cui tentativo numero attempt (da 1) è
+        terminato con result: backoff esponenziale o Retry-After per 429/5xx.
+        None se l'esito è definitivo o i tentativi sono finiti.
+        """
+        if attempt > self.retries:
+            return None
+        if result.get('status_code') in RETRY_STATUS_CODES:
+            retry_after = result.get('retry_after')
+            if retry_after is not None:
+                return retry_after if retry_after <= MAX_RETRY_AFTER else None
+        elif result['status'] not in RETRY_ERROR_STATUSES:
+            return None
+        return self.backoff_factor * (2 ** (attempt - 1))
+    
+    def phase_settings(self, phase):
+        """
+        (timeout, fast, get_only, richieste in volo massime) per una fase del
+        controllo in due fasi (phase None = controllo in una sola fase)
+        """
+        if phase == 1:
+            return self.fast_timeout, True, False, self.max_workers
+        if phase == 2:
+            return self.timeout, False, True, max(1, self.max_workers // SECOND_PASS_DIVISOR)
+        return self.timeout, False, False, self.max_workers
+    
+    def make_scheduler(self, url_data):
+        """Crea lo scheduler per host per le tuple (row_index, url[, metadata])"""
+        return HostScheduler(
+            url_data,
+            key=lambda data: url_host(data[1]),
+            max_per_host=self.max_per_host,
+            min_interval=self.host_min_interval,
+            lookahead=SCHEDULER_LOOKAHEAD
+        )
+    
+    def check_urls(self, url_data, on_result, should_stop=None):
+        """
+        Controlla tutte le tuple (row_index, url[, metadata]) con il motore configurato.
+        url_data può essere un generatore (es. iter_backlinks): viene letto man mano.
+        on_result viene chiamata nel thread chiamante per ogni risultato completato,
+        già arricchito con i metadati della riga; should_stop (opzionale) permette
+        di interrompere il controllo. Con self.deadline, allo scadere della durata
+        massima nessun nuovo URL parte e le righe restanti vengono consegnate come
+        SKIPPED_DEADLINE.
+        Con two_phase i risultati della prima fase (veloce) da ricontrollare (vedi
+        needs_second_pass) vengono trattenuti e consegnati dopo la seconda fase.
+        Gli esiti da ritentare (vedi retry_delay) tornano nello scheduler dopo il
+        ritardo e il risultato finale riporta la cronologia dei tentativi ('attempts').
+        Gli URL identici (dopo la normalizzazione) vengono controllati una sola volta
+        e il risultato viene copiato su tutte le righe che li contengono (finché l'URL è
+        tra gli ultimi DUPLICATE_RESULTS_LIMIT usati); con una cache
+        configurata i risultati ancora validi vengono restituiti senza richieste di rete.
+        """
+        run_deadline = time.monotonic() + self.deadline if self.deadline else None
+        waiting = {}      # url normalizzato -> righe duplicate in attesa del risultato
+        completed = OrderedDict()  # url normalizzato -> risultato già ottenuto (vedi remember)
+        first_rows = {}   # row_index controllato -> (url normalizzato, riga)
+        second_pass = {}  # row_index -> risultato della prima fase da ricontrollare
+        attempts = {}     # row_index -> tentativi già falliti (vedi attempt_entry)
+        retrying = {}     # row_index in attesa di retry -> esito dell'ultimo tentativo
+        retry_started = {}  # row_index ritentato -> inizio del primo tentativo (time.monotonic)
+        # Un retry parte solo se prima della scadenza dell'URL resta almeno questo tempo
+        retry_window = min(self.effective_timeout(self.timeout), MIN_RETRY_WINDOW)
+        phase = 1 if self.two_phase else None
+        
+        def deliver(result, data):
+            """Consegna una copia del risultato per la riga data, con i suoi metadati"""
+            row_result = dict(result)
+            row_result['row_index'] = data[0]
+            if len(data) > 2:
+                row_result.update(data[2])
+                if self.verify_links:
+                    row_result.update(verification_result(result, data))
+            on_result(row_result)
+        
+        def fan_out(result, data):
+            self.requests_saved += 1
+            deliver(result, data)
+        
+        def remember(check_key, result):
+            """Tiene il risultato per i duplicati successivi, solo per gli URL usati più di recente"""
+            completed[check_key] = duplicate_result(result)
+            if len(completed) > DUPLICATE_RESULTS_LIMIT:
+                completed.popitem(last=False)
+        
+        def unique_items():
+            for data in url_data:
+                key = normalize_url(data[1]) or str(data[1])
+                # Con la verifica dei link la stessa pagina va analizzata per ogni dominio target
+                verify_host = verification_host(data) if self.verify_links else None
+                check_key = (key, verify_host) if verify_host else key
+                if check_key in completed:
+                    completed.move_to_end(check_key)
+                    fan_out(completed[check_key], data)
+                    continue
+                if check_key in waiting:
+                    waiting[check_key].append(data)
+                    continue
+                
+                entry = self.cache.get_entry(key) if self.cache is not None else None
+                if entry is not None and verify_host and entry[0].get('verified_host') != verify_host:
+                    entry = None  # In cache c'è solo lo status: serve il contenuto della pagina
+                if entry is not None and self.cache.is_fresh(*entry):
+                    cached = dict(entry[0], cached=True, checked_at=entry[1])
+                    remember(check_key, cached)
+                    self.cache_hits += 1
+                    deliver(cached, data)
+                else:
+                    if entry is not None and conditional_headers(entry[0]):
+                        self.previous_results[key] = entry[0]
+                    waiting[check_key] = []
+                    first_rows[data[0]] = (key, check_key, data)
+                    if self.dns is not None:
+                        # Pre-risoluzione: l'host viene risolto mentre l'URL aspetta nello scheduler
+                        self.dns.prefetch(url_host(data[1]))
+                    yield data
+        
+        def handle_result(result):
+            index = result['row_index']
+            retrying.pop(index, None)
+            # La prima fase ritenta solo i siti che chiedono di rallentare indicando quando
+            # tornare (429/503 con Retry-After): gli altri errori passano alla seconda
+            throttled = (result.get('status_code') in THROTTLE_STATUS_CODES
+                         and result.get('retry_after') is not None)
+            if (phase != 1 or throttled) and not stopping():
+                history = attempts.get(index, [])
+                delay = self.retry_delay(result, len(history) + 1)
+                if delay is not None:
+                    if index not in self.retry_deadlines:
+                        # Il tempo massimo dell'URL si conta dall'inizio del primo tentativo
+                        retry_started[index] = time.monotonic() - (result['response_time'] or 0)
+                        self.retry_deadlines[index] = (self.url_deadline(self.effective_timeout(self.timeout))
+                                                       - (result['response_time'] or 0))
+                    retry_at = time.monotonic() + delay
+                    if (retry_at + retry_window <= self.retry_deadlines[index]
+                            and (run_deadline is None or retry_at < run_deadline)):
+                        # Il worker passa subito ad altri URL: questo torna in coda dopo il ritardo
+                        if not history:
+                            self.retried_urls += 1
+                        attempts[index] = history + [attempt_entry(result, round(delay, 3))]
+                        retrying[index] = result
+                        if self.adaptive is not None:
+                            self.adaptive.observe(result)
+                        data = first_rows[index][2]
+                        if result.get('status_code') in RETRY_STATUS_CODES:
+                            # 429/5xx: il sito chiede di rallentare, anche per gli altri suoi URL
+                            retry_scheduler.pause(url_host(data[1]), delay)
+                        retry_scheduler.defer(data, delay)
+                        return
+            finish(result)
+        
+        def finish(result):
+            """Esito finale dei tentativi di un URL"""
+            index = result['row_index']
+            self.retry_deadlines.pop(index, None)
+            started = retry_started.pop(index, None)
+            history = attempts.pop(index, None)
+            if history is not None:
+                result['attempts'] = history + [attempt_entry(result)]
+                # Tempo totale dell'URL: tutti i tentativi e le attese tra uno e l'altro
+                total = round(time.monotonic() - started, 3)
+                result['response_time'] = total
+                if result['status'] == 'TIMEOUT':
+                    result['error'] = f"Timeout dopo {total}s ({len(result['attempts'])} tentativi)"
+                elif result['error']:
+                    result['error'] = f"{result['error']} ({len(result['attempts'])} tentativi in {total}s)"
+                if (result.get('status_code') not in RETRY_STATUS_CODES
+                        and result['status'] not in RETRY_ERROR_STATUSES + UNCHECKED_STATUSES):
+                    self.retry_recovered += 1
+            if phase == 1 and needs_second_pass(result):
+                # Da ricontrollare nella seconda fase: per ora non viene consegnato
+                second_pass[result['row_index']] = result
+                return
+            if phase == 2 and second_pass.pop(result['row_index'], None) is not None:
+                if not needs_second_pass(result) and result['status'] not in UNCHECKED_STATUSES:
+                    self.second_pass_recovered += 1
+            settle(result)
+        
+        def settle(result, settled_phase=None):
+            """Risultato definitivo di un URL: statistiche, cache, consegna e duplicati"""
+            key, check_key, data = first_rows.pop(result['row_index'])
+            result_phase = settled_phase or phase
+            if result_phase is not None:
+                result['phase'] = result_phase
+            if self.previous_results.pop(key, None) is not None and result.get('revalidated'):
+                self.revalidated += 1
+            remember(check_key, result)
+            # Le richieste troncate dalla scadenza dell'analisi non dicono nulla su carico e host
+            truncated = run_deadline is not None and time.monotonic() >= run_deadline
+            if result['status'] not in UNCHECKED_STATUSES and not truncated:
+                if self.adaptive is not None:
+                    self.adaptive.observe(result)
+                if self.breaker is not None:
+                    self.breaker.record(url_endpoint(data[1]), result)
+            elif self.breaker is not None:
+                # Nessun esito di rete: se l'URL era la sonda dell'host un altro ne prende il posto
+                self.breaker.release_probe(url_endpoint(data[1]), data[0])
+            if self.cache is not None:
+                self.cache.put(key, result)
+            deliver(result, data)
+            for duplicate in waiting.pop(check_key):
+                fan_out(result, duplicate)
+        
+        def stopping():
+            return self.adapter.cancelled.is_set() or (should_stop is not None and should_stop())
+        
+        def drop_deferred_attempt(index):
+            """Toglie dalla cronologia il retry rimandato che non verrà fatto"""
+            attempts[index].pop()
+            if not attempts[index]:
+                del attempts[index]
+                self.retried_urls -= 1
+        
+        def admit(host, data):
+            """
+            None se l'URL va controllato, altrimenti il risultato da consegnare subito:
+            l'ultimo tentativo per un retry che non sta più nel tempo massimo dell'URL,
+            DNS_ERROR per gli host già noti come inesistenti, HOST_DOWN a circuito aperto
+            """
+            index = data[0]
+            if index in retrying and time.monotonic() + retry_window > self.retry_deadlines.get(index, 0):
+                drop_deferred_attempt(index)
+                return retrying[index]
+            url = normalize_url(data[1]) or data[1]
+            dns_error = self.dns.cached_error(host) if self.dns is not None and host else None
+            if dns_error is not None:
+                result = error_result(url, DNS_ERROR, f'DNS: {dns_error}', final_url=url)
+            elif self.breaker is None or self.breaker.allow(url_endpoint(data[1]), index):
+                return None
+            else:
+                result = error_result(url, HOST_DOWN, self.breaker.host_down_error(url_endpoint(data[1])),
+                                      final_url=url)
+            result['row_index'] = data[0]
+            return result
+        
+        def run_phase(scheduler):
+            if self.engine == 'async':
+                self._check_urls_async(scheduler, handle_result, stopping, admit, run_deadline, phase=phase)
+            else:
+                self._check_urls_threads(scheduler, handle_result, stopping, admit, run_deadline,
+                                         poll=should_stop is not None, phase=phase)
+        
+        def expired():
+            return run_deadline is not None and time.monotonic() >= run_deadline
+        
+        scheduler = retry_scheduler = self.make_scheduler(unique_items())
+        
+        try:
+            run_phase(scheduler)
+            if second_pass and not stopping() and not expired():
+                phase = 2
+                self.second_pass_checked += len(second_pass)
+                print(f"🔁 Seconda fase: {len(second_pass)} URL ricontrollati con timeout pieno, solo GET "
+                      f"({self.phase_settings(2)[3]} richieste in volo)")
+                retry_scheduler = self.make_scheduler([first_rows[index][2] for index in list(second_pass)])
+                run_phase(retry_scheduler)
+        finally:
+            if self.dns is not None:
+                self.dns.close()
+            if self.breaker is not None:
+                # Sonde in volo scartate (stop o durata massima): nessun host resta bloccato
+                self.breaker.release_probe()
+            attempts_left = dict(retrying)
+            retrying.clear()
+        
+        if stopping():
+            for index in attempts_left:
+                self.retry_deadlines.pop(index, None)
+            return
+        # Retry ancora in attesa alla scadenza dell'analisi: vale l'ultimo tentativo
+        for index, result in attempts_left.items():
+            drop_deferred_attempt(index)
+            finish(result)
+        if second_pass:
+            # Seconda fase non completata (durata massima): vale il risultato della prima
+            for index in list(second_pass):
+                settle(second_pass.pop(index), settled_phase=1)
+        if run_deadline is not None and not scheduler.done:
+            # I retry rimandati sono già stati chiusi con l'ultimo tentativo
+            remaining = (data for data in scheduler.drain() if data[0] in first_rows)
+            for count, data in enumerate(remaining):
+                if count == 0:
+                    print(f"⏱️ Durata massima dell'analisi ({self.deadline}s) raggiunta: "
+                          f"le righe restanti vengono segnate come {SKIPPED_DEADLINE}")
+                settle(dict(skipped_result(data, self.deadline), row_index=data[0]))
+    
+    def _check_urls_async(self, scheduler, handle_result, stopping, admit, run_deadline, phase=None):
+        """check_urls con il motore asincrono"""
+        from async_checker import AsyncBacklinkChecker
+        timeout, fast, get_only, max_concurrency = self.phase_settings(phase)
+        async_checker = AsyncBacklinkChecker(max_concurrency=max_concurrency, timeout=timeout,
+                                             max_per_host=self.max_per_host,
+                                             host_min_interval=self.host_min_interval,
+                                             verify_links=self.verify_links)
+        async_checker.previous_results = self.previous_results
+        if self.concurrency_limit is not None or self.adaptive is not None:
+            async_checker.concurrency_limit = self.window_size
+        async_checker.url_budget = self.url_budget
+        async_checker.run_deadline = run_deadline
+        async_checker.admit = admit
+        async_checker.dns = self.dns
+        async_checker.fast = fast
+        async_checker.get_only = get_only
+        # I retry li rimette in coda check_urls: nessuna pausa dentro le richieste
+        async_checker.retries = 0
+        async_checker.retry_deadlines = self.retry_deadlines
+        async_checker.head_support = self.head_support
+        async_checker.redirect_rules = self.redirect_rules
+        async_checker.run(scheduler, handle_result, should_stop=stopping)
+    
+    def _check_urls_threads(self, scheduler, handle_result, stopping, admit, run_deadline, poll=False,
+                            phase=None):
+        """check_urls con la finestra scorrevole di thread"""
+        check_timeout, fast, get_only, max_in_flight = self.phase_settings(phase)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        in_flight = {}  # future -> host
+        poll = poll or self.concurrency_limit is not None or self.adaptive is not None
+        try:
+            while not (scheduler.done and not in_flight):
+                if stopping():
+                    break
+                
+                # Allo scadere della durata massima non partono altri URL: quelli in volo
+                # terminano entro la stessa scadenza
+                expired = run_deadline is not None and time.monotonic() >= run_deadline
+                if expired and not in_flight:
+                    break
+                
+                # Riempi la finestra con gli host pronti, in round-robin
+                window = 0 if expired else min(self.window_size(), max_in_flight)
+                while len(in_flight) < window:
+                    item = scheduler.pop_ready()
+                    if item is None:
+                        break
+                    host, data = item
+                    blocked = admit(host, data)
+                    if blocked is not None:
+                        # Host con circuito aperto: nessuna richiesta, lo slot resta libero
+                        scheduler.release(host)
+                        handle_result(blocked)
+                        continue
+                    future = executor.submit(self.check_url_wrapper, data, timeout=check_timeout,
+                                             deadline=run_deadline, fast=fast, get_only=get_only)
+                    in_flight[future] = host
+                
+                if not in_flight:
+                    # Tutti gli host in attesa sono nell'intervallo minimo
+                    time.sleep(scheduler.wait_time() or 0.05)
+                    continue
+                
+                # Processa i risultati man mano che arrivano; con stop o limite dinamico
+                # il ciclo si risveglia comunque ogni WINDOW_POLL_INTERVAL secondi
+                timeout = scheduler.wait_time()
+                if poll:
+                    timeout = min(timeout, WINDOW_POLL_INTERVAL) if timeout is not None else WINDOW_POLL_INTERVAL
+                if run_deadline is not None and not expired:
+                    until_deadline = max(run_deadline - time.monotonic(), 0)
+                    timeout = min(timeout, until_deadline) if timeout is not None else until_deadline
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if self.adapter.cancelled.is_set():
+                    break  # Risultati di richieste interrotte: vengono scartati
+                for future in done:
+                    scheduler.release(in_flight.pop(future))
+                    handle_result(future.result())
+        finally:
+            if in_flight:
+                # Stop o interruzione: le richieste in volo vengono chiuse e i loro
+                # risultati (incompleti) scartati, le righe restano da controllare
+                self.cancel()
+                for future in in_flight:
+                    future.cancel()
+                wait(in_flight, timeout=CANCEL_GRACE)
+            executor.shutdown(wait=False)
+    
+    def cancel(self):
+        """
+        Annulla il controllo in corso (anche da un altro thread): nessun nuovo URL
+        parte, le richieste in volo vengono interrotte chiudendo i socket e
+        check_urls termina entro CANCEL_GRACE secondi con i soli risultati completati.
+        Dopo cancel() il checker non può più fare richieste.
+        """
+        self.adapter.abort()
+        if self.http2 is not None:
+            # Chiude le connessioni HTTP/2: le richieste in volo falliscono subito
+            self.http2.close()
+    
+    @property
+    def cancelled(self):
+        return self.adapter.cancelled.is_set()
+    
+    def open_report(self):
+        """
+        Apre il report CSV in scrittura incrementale. Con resume_report continua
+        un report esistente: le righe già presenti vengono saltate e contate nelle statistiche,
+        quelle SKIPPED_DEADLINE vengono tolte e ricontrollate.
+        """
+        if self.resume_report:
+            output_file = self.resume_report
+            if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+                truncate_partial_line(output_file)
+                skipped = remove_rows(output_file, lambda row: row['status'] == SKIPPED_DEADLINE)
+                if skipped:
+                    print(f"♻️  {skipped} righe {SKIPPED_DEADLINE} verranno ricontrollate")
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = f"backlink_report_{timestamp}.csv"
+        
+        self.report_writer = ReportWriter(output_file, DETAILED_REPORT_FIELDS, detailed_report_row,
+                                          append=bool(self.resume_report))
+        
+        if self.resume_report:
+            for row in read_report(output_file):
+                result = result_from_report_row(row)
+                self.completed_rows.add(result['row_index'])
+                self.stats.add(result)
+        
+        return output_file
+    
+    def record_result(self, result):
+        """Aggiunge un risultato al report e alle statistiche"""
+        with self.lock:
+            self.stats.add(result)
+            if self.report_writer is not None:
+                self.report_writer.write(result)
     
     def process_csv(self):
         """
@@ -234,105 +1332,89 @@ class BacklinkChecker:
         print("=" * 60)
         
         try:
-            # Leggi il CSV
-            df = pd.read_csv(self.csv_file_path, encoding='utf-8')
-            
-            # Trova la colonna 'Backlink'
-            backlink_column = None
-            for col in df.columns:
-                if col.strip().lower() == 'backlink':
-                    backlink_column = col
-                    break
+            # Leggi solo l'intestazione: le righe vengono lette a blocchi durante il controllo
+            columns = read_csv_columns(self.csv_file_path)
             
-            # Se non trova 'Backlink', cerca altre varianti
-            if backlink_column is None:
-                for col in df.columns:
-                    if 'backlink' in col.lower() and 'target' not in col.lower() and 'n.' not in col.lower():
-                        backlink_column = col
-                        break
-                    
+            backlink_column = find_backlink_column(columns)
             if backlink_column is None:
                 print("ERRORE: Colonna 'Backlink' non trovata nel CSV")
                 return
                 
             print(f"Trovata colonna backlink: '{backlink_column}'")
             
-            # Filtra solo le righe con backlink non vuoti
-            # Converti la colonna in stringa e rimuovi spazi
-            df[backlink_column] = df[backlink_column].astype(str).str.strip()
-            df_with_backlinks = df[
-                (df[backlink_column].notna()) & 
-                (df[backlink_column] != '') & 
-                (df[backlink_column] != 'nan') &
-                (df[backlink_column].str.startswith(('http', 'www.')))
-            ]
-            
-            total_links = len(df_with_backlinks)
+            # Conta le righe con backlink non vuoti (lettura a blocchi della sola colonna backlink)
+            total_links = count_backlinks(self.csv_file_path, backlink_column)
             print(f"Trovati {total_links} backlink da controllare")
-            print(f"🚀 Controllo parallelo con {self.max_workers} thread")
+            if self.engine == 'async':
+                print(f"🚀 Controllo asincrono con {self.max_workers} richieste in volo")
+            else:
+                print(f"🚀 Controllo parallelo con {self.max_workers} thread")
             print("=" * 60)
             
             if total_links == 0:
                 print("Nessun backlink trovato nel file CSV")
                 return
+            
+            output_file = self.open_report()
+            print(f"📝 Report in scrittura: {output_file}")
+            if self.completed_rows:
+                print(f"♻️  Ripresa: {len(self.completed_rows)} righe già presenti nel report vengono saltate")
+                total_links = max(total_links - len(self.completed_rows), 0)
                 
-            # Prepara i dati per il processing parallelo
-            url_data = [(index, str(row[backlink_column]).strip()) for index, row in df_with_backlinks.iterrows()]
+            # Le righe vengono lette a blocchi mentre i controlli sono già in corso
+            url_data = (data for data in iter_backlinks(self.csv_file_path, backlink_column)
+                        if data[0] not in self.completed_rows)
             
             # Controlla gli URL in parallelo
             completed = 0
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Invia tutti i task con timeout personalizzato
-                future_to_url = {executor.submit(self.check_url_wrapper, data, timeout=self.timeout): data for data in url_data}
-                
-                # Processa i risultati man mano che arrivano
-                for future in as_completed(future_to_url):
-                    try:
-                        result = future.result()
-                        
-                        # Aggiungi informazioni aggiuntive dalla riga CSV
-                        row = df_with_backlinks.loc[result['row_index']]
-                        result.update({
-                            'nome_azienda': row.get('Nome Azienda', ''),
-                            'sito_pubblicazione': row.get('Sito di pubblicazione', ''),
-                            'titolo': row.get('Titolo', ''),
-                            'data_pubblicazione': row.get('Data di pubblicazione', '')
-                        })
-                        
-                        with self.lock:
-                            self.results.append(result)
-                            completed += 1
-                        
-                        # Mostra progresso
-                        url = result['url']
-                        print(f"\n[{completed}/{total_links}] {url[:60]}{'...' if len(url) > 60 else ''}")
-                        
-                        # Emoji per status
-                        status_emoji = {
-                            'ONLINE': '✅',
-                            'ONLINE_WITH_REDIRECTS': '✅🔄',
-                            'CLIENT_ERROR': '❌',
-                            'SERVER_ERROR': '🔥',
-                            'TIMEOUT': '⏰',
-                            'CONNECTION_ERROR': '🔌',
-                            'REDIRECT_ERROR': '🔄❌',
-                            'INVALID': '❓',
-                            'ERROR': '❌'
-                        }.get(result['status'], '❓')
-                        
+            
+            def handle_result(result):
+                nonlocal completed
+                try:
+                    self.record_result(result)
+                    completed += 1
+                    
+                    # Mostra progresso
+                    url = result['url']
+                    print(f"\n[{completed}/{total_links}] {url[:60]}{'...' if len(url) > 60 else ''}")
+                    
+                    # Emoji per status
+                    status_emoji = {
+                        'ONLINE': '✅',
+                        'ONLINE_WITH_REDIRECTS': '✅🔄',
+                        'CLIENT_ERROR': '❌',
+                        'SERVER_ERROR': '🔥',
+                        'TIMEOUT': '⏰',
+                        'CONNECTION_ERROR': '🔌',
+                        'REDIRECT_ERROR': '🔄❌',
+                        'INVALID': '❓',
+                        'SKIPPED_DEADLINE': '⏭️',
+                        'HOST_DOWN': '⛔',
+                        'DNS_ERROR': '🌐',
+                        'ERROR': '❌'
+                    }.get(result['status'], '❓')
+                    
+                    if result['response_time'] is not None:
                         print(f"  {status_emoji} {result['status']} ({result['status_code']}) - {result['response_time']}s")
+                    else:
+                        print(f"  {status_emoji} {result['status']}")
+                    
+                    if result['has_redirects']:
+                        print(f"  🔄 {result['redirect_count']} redirect: {result['final_url'][:50]}{'...' if len(result['final_url']) > 50 else ''}")
+                    
+                    if result['error']:
+                        print(f"  ⚠️  {result['error'][:60]}{'...' if len(result['error']) > 60 else ''}")
+                    
+                    if result.get('target_found') is not None:
+                        if not result['target_found']:
+                            print(f"  🔗 Target non trovato nell'articolo ({result['target_link_count']} link al dominio)")
+                        elif result.get('anchor_match') is False:
+                            print(f"  🔗 Target presente, anchor diversa da quella prevista")
                         
-                        if result['has_redirects']:
-                            print(f"  🔄 {result['redirect_count']} redirect: {result['final_url'][:50]}{'...' if len(result['final_url']) > 50 else ''}")
-                        
-                        if result['error']:
-                            print(f"  ⚠️  {result['error'][:60]}{'...' if len(result['error']) > 60 else ''}")
-                            
-                    except Exception as e:
-                        print(f"❌ Errore nel controllo URL: {e}")
-            
-            # Ordina i risultati per row_index
-            self.results.sort(key=lambda x: x['row_index'])
+                except Exception as e:
+                    print(f"❌ Errore nel controllo URL: {e}")
+            
+            self.check_urls(url_data, handle_result)
                 
         except Exception as e:
             print(f"ERRORE durante la lettura del CSV: {str(e)}")
@@ -340,7 +1422,8 @@ class BacklinkChecker:
             
     def generate_report(self):
         """Genera un report dettagliato dei risultati"""
-        if not self.results:
+        stats = self.stats
+        if not stats.total:
             print("Nessun risultato da mostrare")
             return
             
@@ -349,11 +1432,11 @@ class BacklinkChecker:
         print("=" * 80)
         
         # Statistiche generali
-        total = len(self.results)
-        online = len([r for r in self.results if r['status'] in ['ONLINE', 'ONLINE_WITH_REDIRECTS']])
-        online_clean = len([r for r in self.results if r['status'] == 'ONLINE'])
-        online_redirects = len([r for r in self.results if r['status'] == 'ONLINE_WITH_REDIRECTS'])
-        errors = len([r for r in self.results if r['status'] not in ['ONLINE', 'ONLINE_WITH_REDIRECTS']])
+        total = stats.total
+        online = stats.online
+        online_clean = stats.status_counts.get('ONLINE', 0)
+        online_redirects = stats.status_counts.get('ONLINE_WITH_REDIRECTS', 0)
+        errors = stats.errors
         
         print(f"\n📈 STATISTICHE GENERALI:")
         print(f"  • Totale link controllati: {total}")
@@ -362,20 +1445,49 @@ class BacklinkChecker:
         print(f"    └─ 🔄 Con redirect: {online_redirects} ({online_redirects/total*100:.1f}%)")
         print(f"  • ❌ Link con problemi: {errors} ({errors/total*100:.1f}%)")
         
+        if self.requests_saved:
+            print(f"  • ♻️  Richieste risparmiate (URL duplicati): {self.requests_saved}")
+        if self.cache_hits:
+            print(f"  • 💾 Risultati dalla cache (controllati di recente): {self.cache_hits}")
+        if self.revalidated:
+            print(f"  • 📌 Pagine invariate (304, rivalidate senza download): {self.revalidated}")
+        if self.adaptive is not None:
+            print(f"  • 🎚️  Concorrenza adattiva: limite finale {self.adaptive.limit} "
+                  f"({self.adaptive.decisions} regolazioni)")
+        if stats.protocol_counts:
+            protocols = ', '.join(f"{protocol}: {count}" for protocol, count in sorted(stats.protocol_counts.items()))
+            print(f"  • 🔀 Protocolli: {protocols}")
+        if self.dns is not None and self.dns.failed:
+            print(f"  • 🌐 Host non risolvibili (DNS): {self.dns.failed} su {self.dns.resolved + self.dns.failed} "
+                  f"(URL segnati {DNS_ERROR} senza richieste)")
+        if self.head_support.head_skipped:
+            print(f"  • 🎯 Host che rifiutano HEAD: {len(self.head_support.rejecting_hosts)} "
+                  f"({self.head_support.head_skipped} URL controllati solo in GET, "
+                  f"~{self.head_support.round_trips_saved} richieste risparmiate)")
+        if self.redirect_rules.hops_skipped:
+            print(f"  • ↪️  Regole di redirect per host: {self.redirect_rules.rules_learned} "
+                  f"({self.redirect_rules.urls_rewritten} URL, {self.redirect_rules.hops_skipped} "
+                  f"redirect dedotti senza richieste)")
+        if self.retried_urls:
+            print(f"  • 🔂 URL ritentati (429/5xx, timeout, connessione): {self.retried_urls}, "
+                  f"{self.retry_recovered} riusciti a un nuovo tentativo")
+        if self.second_pass_checked:
+            print(f"  • 🔁 Seconda fase: {self.second_pass_checked} URL ricontrollati, "
+                  f"{self.second_pass_recovered} recuperati (falsi negativi della prima fase)")
+        if self.breaker is not None and self.breaker.tripped_hosts:
+            print(f"  • 🔌 Host irraggiungibili: {len(self.breaker.tripped_hosts)} "
+                  f"({self.breaker.short_circuited} URL segnati {HOST_DOWN} senza richieste)")
+        
         # Tempo medio di risposta
-        response_times = [r['response_time'] for r in self.results if r['response_time'] is not None]
-        if response_times:
-            avg_time = sum(response_times) / len(response_times)
+        avg_time = stats.average_response_time
+        if avg_time is not None:
             print(f"  • ⏱️  Tempo medio risposta: {avg_time:.2f}s")
         
         # Dettaglio per status
-        status_count = {}
-        for result in self.results:
-            status = result['status']
-            status_count[status] = status_count.get(status, 0) + 1
+        status_count = stats.status_counts
             
         print(f"\n📋 DETTAGLIO PER STATUS:")
-        status_order = ['ONLINE', 'ONLINE_WITH_REDIRECTS', 'CLIENT_ERROR', 'SERVER_ERROR', 'TIMEOUT', 'CONNECTION_ERROR', 'REDIRECT_ERROR', 'INVALID', 'ERROR']
+        status_order = ['ONLINE', 'ONLINE_WITH_REDIRECTS', 'CLIENT_ERROR', 'SERVER_ERROR', 'TIMEOUT', 'CONNECTION_ERROR', 'REDIRECT_ERROR', 'INVALID', 'DNS_ERROR', 'HOST_DOWN', 'SKIPPED_DEADLINE', 'ERROR']
         
         for status in status_order:
             if status in status_count:
@@ -390,39 +1502,47 @@ class BacklinkChecker:
                     'CONNECTION_ERROR': '🔌',
                     'REDIRECT_ERROR': '🔄❌',
                     'INVALID': '❓',
+                    'SKIPPED_DEADLINE': '⏭️',
+                    'HOST_DOWN': '⛔',
+                    'DNS_ERROR': '🌐',
                     'ERROR': '❌'
                 }.get(status, '❓')
                 print(f"  {emoji} {status}: {count} ({percentage:.1f}%)")
         
+        # Verifica del contenuto (target e anchor nell'articolo)
+        verification = stats.verification_counts
+        if verification:
+            verified = verification['verificati']
+            print(f"\n🔗 VERIFICA CONTENUTO ({verified} pagine analizzate):")
+            print(f"  • ✅ Target presente: {verified - verification.get('target_mancante', 0)}")
+            print(f"  • ❌ Target mancante: {verification.get('target_mancante', 0)}")
+            print(f"  • ✏️  Anchor diversa da quella prevista: {verification.get('anchor_diversa', 0)}")
+            print(f"  • 🔢 Più di un link al target: {verification.get('link_multipli', 0)}")
+            print(f"  • 🚫 Link nofollow: {verification.get('nofollow', 0)}")
+            print(f"  • 💰 Link sponsored: {verification.get('sponsored', 0)}")
+        
         # Analisi redirect
-        redirected = [r for r in self.results if r['has_redirects']]
-        if redirected:
-            redirect_counts = {}
-            for r in redirected:
-                count = r['redirect_count']
-                redirect_counts[count] = redirect_counts.get(count, 0) + 1
-            
-            print(f"\n🔄 ANALISI REDIRECT ({len(redirected)} link):")
-            for count in sorted(redirect_counts.keys()):
-                num_links = redirect_counts[count]
+        if stats.redirected:
+            print(f"\n🔄 ANALISI REDIRECT ({stats.redirected} link):")
+            for count in sorted(stats.redirect_counts.keys()):
+                num_links = stats.redirect_counts[count]
                 print(f"  • {count} redirect: {num_links} link")
                 
         # Link con problemi
-        problematic = [r for r in self.results if r['status'] not in ['ONLINE', 'ONLINE_WITH_REDIRECTS']]
-        if problematic:
-            print(f"\n🚨 LINK CON PROBLEMI ({len(problematic)}):")
-            for result in problematic[:8]:  # Mostra solo i primi 8
+        if errors:
+            print(f"\n🚨 LINK CON PROBLEMI ({errors}):")
+            for result in stats.problematic:  # Mostra solo i primi 8
                 print(f"  ❌ Riga {result['row_index']}: {result['url'][:55]}{'...' if len(result['url']) > 55 else ''}")
                 print(f"     🔸 {result['status']} - {result['error'][:50]}{'...' if len(result['error']) > 50 else ''}")
                 print()
                 
-            if len(problematic) > 8:
-                print(f"  ... e altri {len(problematic) - 8} link con problemi")
+            if errors > len(stats.problematic):
+                print(f"  ... e altri {errors - len(stats.problematic)} link con problemi")
                 
         # Esempi di redirect più comuni
-        if redirected:
+        if stats.redirect_examples:
             print(f"\n🔄 ESEMPI DI REDIRECT:")
-            for result in redirected[:4]:  # Mostra solo i primi 4
+            for result in stats.redirect_examples:  # Mostra solo i primi 4
                 print(f"  🔗 Riga {result['row_index']}: {result['redirect_count']} redirect")
                 print(f"     Da: {result['url'][:50]}{'...' if len(result['url']) > 50 else ''}")
                 print(f"     A:  {result['final_url'][:50]}{'...' if len(result['final_url']) > 50 else ''}")
@@ -432,69 +1552,31 @@ class BacklinkChecker:
                     
     def save_detailed_report(self):
         """
-        Salva un report dettagliato in formato CSV
+        Chiude il report CSV dettagliato (scritto man mano durante il controllo)
+        e ne mostra il contenuto
         """
-        if not self.results:
+        if self.report_writer is None or not self.stats.total:
             print("Nessun risultato da salvare")
             return
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"backlink_report_{timestamp}.csv"
         
         try:
-            with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = [
-                    'row_index', 'url', 'status', 'status_code', 'final_url', 
-                    'has_redirects', 'redirect_count', 'redirect_chain_details',
-                    'response_time', 'error', 'check_timestamp',
-                    'nome_azienda', 'sito_pubblicazione', 'titolo', 'data_pubblicazione'
-                ]
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                
-                for result in self.results:
-                    # Prepara dettagli redirect per CSV
-                    redirect_details = ""
-                    if result['redirect_chain']:
-                        redirect_parts = []
-                        for i, redirect in enumerate(result['redirect_chain']):
-                            redirect_parts.append(f"{i+1}. {redirect['from_url']} ({redirect['status_code']})")
-                        redirect_details = " | ".join(redirect_parts)
-                    
-                    # Prepara i dati per il CSV
-                    row_data = {
-                        'row_index': result['row_index'],
-                        'url': result['url'],
-                        'status': result['status'],
-                        'status_code': result['status_code'],
-                        'final_url': result['final_url'],
-                        'has_redirects': 'Sì' if result['has_redirects'] else 'No',
-                        'redirect_count': result['redirect_count'],
-                        'redirect_chain_details': redirect_details,
-                        'response_time': result['response_time'],
-                        'error': result['error'] or '',
-                        'check_timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'nome_azienda': result.get('nome_azienda', ''),
-                        'sito_pubblicazione': result.get('sito_pubblicazione', ''),
-                        'titolo': result.get('titolo', ''),
-                        'data_pubblicazione': result.get('data_pubblicazione', '')
-                    }
-                    
-                    writer.writerow(row_data)
-                    
-            print(f"\n✅ Report dettagliato salvato in: {output_file}")
+            self.report_writer.close()
+            print(f"\n✅ Report dettagliato salvato in: {self.report_writer.path}")
             
             # Statistiche del file salvato
-            total = len(self.results)
-            online = len([r for r in self.results if r['status'] in ['ONLINE', 'ONLINE_WITH_REDIRECTS']])
-            with_redirects = len([r for r in self.results if r['has_redirects']])
+            total = self.stats.total
+            online = self.stats.online
+            with_redirects = self.stats.redirected
             
             print(f"📄 Contenuto del report:")
             print(f"  • {total} link analizzati")
             print(f"  • {online} link funzionanti")
             print(f"  • {with_redirects} link con redirect")
             print(f"  • {total - online} link con problemi")
+            if self.requests_saved:
+                print(f"  • {self.requests_saved} richieste risparmiate grazie agli URL duplicati")
+            if self.cache_hits:
+                print(f"  • {self.cache_hits} risultati presi dalla cache")
             
         except Exception as e:
             print(f"❌ Errore nel salvare il report: {e}")
@@ -507,9 +1589,14 @@ class BacklinkChecker:
         print(f"Data/Ora inizio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print()
         
-        self.process_csv()
-        self.generate_report()
-        self.save_detailed_report()
+        try:
+            self.process_csv()
+            self.generate_report()
+            self.save_detailed_report()
+        finally:
+            # Anche se interrotto, il report contiene tutte le righe già controllate
+            if self.report_writer is not None:
+                self.report_writer.close()
         
         print("\n✅ Controllo completato!")
 
@@ -517,6 +1604,12 @@ def main():
     """Funzione principale"""
     import argparse
     
+    # python -m backlink_checker worker: esegue i job accodati dalla web app
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        from job_worker import main as worker_main
+        worker_main(sys.argv[2:])
+        return
+    
     parser = argparse.ArgumentParser(
         description='Backlink Checker - Verifica lo stato dei backlink in un file CSV',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -525,6 +1618,14 @@ Esempi di utilizzo:
   python backlink_checker.py file.csv
   python backlink_checker.py file.csv --workers 20
   python backlink_checker.py file.csv --workers 5 --timeout 15
+  python backlink_checker.py file.csv --engine async --workers 500
+  python backlink_checker.py file.csv --processes 4 --workers 20
+  python backlink_checker.py file.csv --adaptive --workers 50
+  python backlink_checker.py file.csv --deadline 1800 --url-budget 20
+  python backlink_checker.py file.csv --host-failures 5 --host-probe 0
+  python backlink_checker.py file.csv --http2 --workers 50
+  python backlink_checker.py file.csv --two-phase --fast-timeout 2 --timeout 15
+  python -m backlink_checker worker          (esegue i job accodati dalla web app)
 
 Il sistema controlla automaticamente:
   ✅ Link online (status 200)
@@ -537,9 +1638,57 @@ Il sistema controlla automaticamente:
     
     parser.add_argument('csv_file', help='File CSV contenente i backlink da controllare')
     parser.add_argument('--workers', '-w', type=int, default=10, 
-                       help='Numero di thread paralleli (default: 10, max: 50)')
+                       help='Numero di thread paralleli (default: 10, max: 50) '
+                            'o di richieste in volo con --engine async (max: 5000)')
     parser.add_argument('--timeout', '-t', type=int, default=8,
                        help='Timeout in secondi per ogni richiesta (default: 8)')
+    parser.add_argument('--engine', '-e', choices=ENGINES, default='threads',
+                       help='Motore di controllo: threads (ThreadPoolExecutor) o async (asyncio) (default: threads)')
+    parser.add_argument('--cache', nargs='?', const='backlink_cache.sqlite', default=None, metavar='FILE',
+                       help='Usa una cache SQLite dei risultati (default: backlink_cache.sqlite)')
+    parser.add_argument('--max-age', type=float, default=None, metavar='ORE',
+                       help='Validità in ore dei link ONLINE in cache (default: 168); '
+                            'gli errori transitori scadono dopo 1 ora')
+    parser.add_argument('--resume', metavar='REPORT', default=None,
+                       help='Riprende un controllo interrotto: aggiunge al report indicato '
+                            'solo le righe non ancora presenti')
+    parser.add_argument('--verify-links', action='store_true',
+                       help='Legge gli articoli e verifica che contengano il link al target '
+                            'con l\'anchor prevista (nofollow/sponsored, numero di link)')
+    parser.add_argument('--processes', '-p', type=int, default=1,
+                       help='Processi in cui dividere gli URL per host, ognuno con i propri '
+                            '--workers (default: 1); per piani molto grandi su macchine multi-core')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Concorrenza adattiva: --workers diventa il massimo e le richieste in volo '
+                            'si regolano su latenza ed errori osservati')
+    parser.add_argument('--url-budget', type=float, default=None, metavar='SECONDI',
+                       help='Tempo massimo per URL, retry e fallback HEAD -> GET inclusi '
+                            f'(default: {URL_BUDGET_FACTOR} volte --timeout)')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDI',
+                       help='Durata massima dell\'analisi: allo scadere le righe non controllate '
+                            f'vengono segnate {SKIPPED_DEADLINE} (riprendibili con --resume)')
+    parser.add_argument('--host-failures', type=int, default=DEFAULT_THRESHOLD, metavar='N',
+                       help='Errori di connessione o timeout consecutivi dopo cui gli URL restanti '
+                            f'di un host vengono segnati {HOST_DOWN} senza richieste '
+                            f'(default: {DEFAULT_THRESHOLD}, 0 = disattivato)')
+    parser.add_argument('--host-probe', type=float, default=DEFAULT_PROBE_AFTER, metavar='SECONDI',
+                       help='Secondi dopo cui un URL di un host irraggiungibile viene riprovato '
+                            f'come sonda (default: {DEFAULT_PROBE_AFTER:g}, 0 = mai)')
+    parser.add_argument('--http2', action='store_true',
+                       help='Usa HTTP/2 dove il sito lo supporta (una connessione per host, '
+                            'richiede httpx[http2]; solo con --engine threads)')
+    parser.add_argument('--two-phase', action='store_true',
+                       help='Controllo in due fasi: prima tutti gli URL con --fast-timeout e senza retry, '
+                            'poi solo timeout, errori di connessione e 5xx con --timeout, solo GET '
+                            f'e 1/{SECOND_PASS_DIVISOR} dei --workers')
+    parser.add_argument('--fast-timeout', type=float, default=FAST_TIMEOUT, metavar='SECONDI',
+                       help=f'Timeout della prima fase con --two-phase (default: {FAST_TIMEOUT})')
+    parser.add_argument('--no-dns-cache', action='store_true',
+                       help='Non usa la cache DNS condivisa (ogni connessione interroga il resolver di sistema)')
+    parser.add_argument('--per-host', type=int, default=4,
+                       help='Richieste in volo massime verso lo stesso host (default: 4)')
+    parser.add_argument('--host-interval', type=float, default=0.0,
+                       help='Secondi minimi tra due richieste allo stesso host (default: 0)')
     
     args = parser.parse_args()
     
@@ -548,33 +1697,129 @@ Il sistema controlla automaticamente:
         print(f"❌ Errore: File '{args.csv_file}' non trovato")
         sys.exit(1)
     
-    if args.workers < 1 or args.workers > 50:
-        print(f"❌ Errore: Il numero di workers deve essere tra 1 e 50")
+    max_workers = 5000 if args.engine == 'async' else 50
+    if args.workers < 1 or args.workers > max_workers:
+        print(f"❌ Errore: Il numero di workers deve essere tra 1 e {max_workers}")
         sys.exit(1)
         
     if args.timeout < 1 or args.timeout > 60:
         print(f"❌ Errore: Il timeout deve essere tra 1 e 60 secondi")
         sys.exit(1)
         
+    if args.resume and not os.path.exists(args.resume):
+        print(f"❌ Errore: Report da riprendere '{args.resume}' non trovato")
+        sys.exit(1)
+        
+    if args.max_age is not None and args.max_age < 0:
+        print(f"❌ Errore: --max-age non può essere negativo")
+        sys.exit(1)
+        
+    if args.processes < 1:
+        print(f"❌ Errore: --processes deve essere almeno 1")
+        sys.exit(1)
+        
+    if args.url_budget is not None and args.url_budget <= 0:
+        print(f"❌ Errore: --url-budget deve essere maggiore di 0")
+        sys.exit(1)
+        
+    if args.deadline is not None and args.deadline <= 0:
+        print(f"❌ Errore: --deadline deve essere maggiore di 0")
+        sys.exit(1)
+        
+    if args.http2:
+        if args.engine == 'async':
+            print(f"❌ Errore: --http2 è disponibile solo con --engine threads")
+            sys.exit(1)
+        try:
+            # Solo per verificare che httpx e l'extra http2 siano installati
+            import httpx
+            import h2
+        except ImportError:
+            print(f"❌ Errore: --http2 richiede httpx con HTTP/2: pip install -r requirements.txt (o 'httpx[http2]')")
+            sys.exit(1)
+        
+    if args.fast_timeout <= 0:
+        print(f"❌ Errore: --fast-timeout deve essere maggiore di 0")
+        sys.exit(1)
+        
+    if args.host_failures < 0 or args.host_probe < 0:
+        print(f"❌ Errore: --host-failures e --host-probe non possono essere negativi")
+        sys.exit(1)
+        
+    if args.per_host < 1:
+        print(f"❌ Errore: --per-host deve essere almeno 1")
+        sys.exit(1)
+        
+    if args.host_interval < 0:
+        print(f"❌ Errore: --host-interval non può essere negativo")
+        sys.exit(1)
+        
     print(f"🚀 BACKLINK CHECKER AVANZATO")
     print(f"📁 File CSV: {args.csv_file}")
     print(f"🔧 Configurazione:")
+    print(f"   • Motore: {args.engine}{' (HTTP/2 dove supportato)' if args.http2 else ''}")
     print(f"   • Thread paralleli: {args.workers}")
-    print(f"   • Timeout richieste: {args.timeout}s")
+    if args.adaptive:
+        print(f"   • Concorrenza adattiva: da {min(INITIAL_LIMIT, args.workers)} fino a {args.workers} richieste in volo")
+    if args.processes > 1:
+        print(f"   • Processi: {args.processes} (URL divisi per host, {args.workers} worker ciascuno)")
+    print(f"   • Timeout richieste: {args.timeout}s "
+          f"(massimo {args.url_budget or URL_BUDGET_FACTOR * args.timeout}s per URL, retry inclusi)")
+    if args.two_phase:
+        print(f"   • Due fasi: prima {args.fast_timeout:g}s senza retry, poi ricontrollo dei falliti "
+              f"con {args.timeout}s (solo GET)")
+    if args.deadline:
+        print(f"   • Durata massima analisi: {args.deadline}s")
+    print(f"   • Richieste per host: {args.per_host} (intervallo minimo {args.host_interval}s)")
+    if args.host_failures:
+        print(f"   • Host irraggiungibili: {HOST_DOWN} dopo {args.host_failures} errori consecutivi")
+    if args.cache:
+        print(f"   • Cache risultati: {args.cache}")
+    if args.resume:
+        print(f"   • Ripresa dal report: {args.resume}")
+    if args.verify_links:
+        print(f"   • Verifica contenuto: target e anchor negli articoli")
     print(f"⏰ Inizio controllo: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("\n" + "=" * 60)
     
+    cache = None
+    checker = None
     try:
-        checker = BacklinkChecker(args.csv_file, max_workers=args.workers)
+        if args.cache:
+            ttl = None
+            if args.max_age is not None:
+                ttl = {'ONLINE': args.max_age * HOUR, 'ONLINE_WITH_REDIRECTS': args.max_age * HOUR}
+            cache = ResultCache(args.cache, ttl=ttl)
+        
+        options = dict(max_workers=args.workers, engine=args.engine,
+                       max_per_host=args.per_host, host_min_interval=args.host_interval,
+                       cache=cache, resume_report=args.resume, verify_links=args.verify_links,
+                       adaptive=args.adaptive, url_budget=args.url_budget, deadline=args.deadline,
+                       host_failures=args.host_failures, host_probe_after=args.host_probe,
+                       dns_cache=not args.no_dns_cache, http2=args.http2,
+                       two_phase=args.two_phase, fast_timeout=args.fast_timeout)
+        if args.processes > 1:
+            from sharded_checker import ShardedBacklinkChecker
+            checker = ShardedBacklinkChecker(args.csv_file, processes=args.processes, **options)
+        else:
+            checker = BacklinkChecker(args.csv_file, **options)
         checker.timeout = args.timeout  # Salva il timeout nell'istanza
         checker.run()
         
     except KeyboardInterrupt:
         print("\n\n⚠️  Controllo interrotto dall'utente")
+        if checker is not None and checker.report_writer is not None:
+            report = checker.report_writer.path
+            print(f"📝 Report parziale salvato in: {report}")
+            processes = f" --processes {args.processes}" if args.processes > 1 else ""
+            print(f"   Per riprendere: python backlink_checker.py \"{args.csv_file}\" --resume \"{report}\"{processes}")
         sys.exit(1)
     except Exception as e:
         print(f"\n❌ Errore critico: {e}")
         sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
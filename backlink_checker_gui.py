@@ -3,7 +3,8 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
 import os
 import sys
-from backlink_checker import BacklinkChecker
+from itertools import islice
+from backlink_checker import BacklinkChecker, read_csv_columns, count_backlinks, iter_backlinks
 
 class BacklinkCheckerGUI:
     def __init__(self, root):
@@ -16,6 +17,7 @@ class BacklinkCheckerGUI:
         self.csv_file_path = tk.StringVar()
         self.workers = tk.IntVar(value=10)
         self.timeout = tk.IntVar(value=8)
+        self.verify_links = tk.BooleanVar(value=False)
         self.checker = None
         self.analysis_thread = None
         
@@ -94,6 +96,13 @@ class BacklinkCheckerGUI:
         tk.Label(timeout_frame, text="(3-30, consigliato: 8-12)", 
                 font=('Arial', 9), fg='#7f8c8d', bg='#f0f0f0').pack(side='left', padx=(10, 0))
         
+        # Verifica contenuto
+        verify_frame = tk.Frame(config_inner_frame, bg='#f0f0f0')
+        verify_frame.pack(fill='x', pady=(10, 0))
+        
+        tk.Checkbutton(verify_frame, text="🔗 Verifica target e anchor negli articoli (più lento)",
+                      variable=self.verify_links, font=('Arial', 10), bg='#f0f0f0').pack(side='left')
+        
         # Pulsanti di controllo
         control_frame = tk.Frame(main_frame, bg='#f0f0f0')
         control_frame.pack(fill='x', pady=(0, 10))
@@ -230,31 +239,33 @@ class BacklinkCheckerGUI:
             self.log_message("="*60)
             
             # Crea il checker con i parametri configurati
-            self.checker = BacklinkChecker(
+            # Variabile locale: se l'analisi viene fermata e ne parte un'altra, questo
+            # thread continua a usare il proprio checker fino alla fine
+            checker = BacklinkChecker(
                 csv_file_path=self.csv_file_path.get(),
-                max_workers=self.workers.get()
+                max_workers=self.workers.get(),
+                verify_links=self.verify_links.get()
             )
-            self.checker.timeout = self.timeout.get()
+            self.checker = checker
+            checker.timeout = self.timeout.get()
             
             # Modifica il checker per supportare callback GUI
-            original_process = self.checker.process_csv
+            original_process = checker.process_csv
             
             def gui_process_csv():
                 # Implementazione personalizzata per GUI
-                import pandas as pd
-                from concurrent.futures import ThreadPoolExecutor, as_completed
-                
                 try:
-                    df = pd.read_csv(self.checker.csv_file_path)
+                    # Solo l'intestazione: le righe vengono lette a blocchi durante il controllo
+                    columns = read_csv_columns(checker.csv_file_path)
                     
                     # Trova la colonna backlink
                     backlink_column = None
                     possible_columns = ['backlink', 'url', 'link', 'sito web', 'website', 'target']
                     
-                    self.log_message(f"🔍 Colonne disponibili ({len(df.columns)}): {list(df.columns)}")
+                    self.log_message(f"🔍 Colonne disponibili ({len(columns)}): {columns}")
                     
                     # Debug: controlla ogni colonna
-                    for col in df.columns:
+                    for col in columns:
                         col_lower = col.lower()
                         matches = [keyword for keyword in possible_columns if keyword in col_lower]
                         if matches:
@@ -273,31 +284,15 @@ class BacklinkCheckerGUI:
                     # Debug: mostra alcune righe della colonna backlink
                     self.log_message(f"🔍 Analizzando colonna '{backlink_column}'...")
                     
-                    # Converti la colonna in stringa e pulisci
-                    df[backlink_column] = df[backlink_column].astype(str).str.strip()
-                    
-                    # Conta i valori non vuoti
-                    non_empty = df[df[backlink_column].notna() & (df[backlink_column] != '') & (df[backlink_column] != 'nan')]
-                    self.log_message(f"📊 Righe con valori non vuoti: {len(non_empty)}/{len(df)}")
-                    
-                    # Conta quelli che iniziano con http o www
-                    with_protocol = non_empty[non_empty[backlink_column].str.startswith(('http', 'www.'), na=False)]
-                    self.log_message(f"🌐 Righe con URL validi: {len(with_protocol)}")
+                    # Conta gli URL validi leggendo a blocchi la sola colonna backlink
+                    total_links = count_backlinks(checker.csv_file_path, backlink_column)
+                    self.log_message(f"🌐 Righe con URL validi: {total_links}")
                     
                     # Mostra alcuni esempi
-                    if len(with_protocol) > 0:
-                        sample_urls = with_protocol[backlink_column].head(3).tolist()
+                    if total_links > 0:
+                        sample_urls = [url for _, url, _ in islice(iter_backlinks(checker.csv_file_path, backlink_column), 3)]
                         self.log_message(f"📝 Esempi URL trovati: {sample_urls}")
                     
-                    # Filtra backlink validi
-                    df_with_backlinks = df[
-                        (df[backlink_column].notna()) & 
-                        (df[backlink_column] != '') & 
-                        (df[backlink_column] != 'nan') &
-                        (df[backlink_column].str.startswith(('http', 'www.'), na=False))
-                    ]
-                    
-                    total_links = len(df_with_backlinks)
                     self.log_message(f"🔍 Trovati {total_links} backlink da controllare")
                     
                     if total_links == 0:
@@ -305,88 +300,86 @@ class BacklinkCheckerGUI:
                         self.log_message("💡 Suggerimento: Verifica che la colonna contenga URL completi (http/https)")
                         return
                     
-                    # Prepara dati per processing
-                    url_data = [(index, str(row[backlink_column]).strip()) 
-                               for index, row in df_with_backlinks.iterrows()]
+                    # Il report viene scritto man mano: un'interruzione non perde i risultati
+                    report_file = checker.open_report()
+                    self.log_message(f"📝 Report in scrittura: {report_file}")
+                    
+                    # Le righe vengono lette a blocchi mentre i controlli sono già in corso
+                    url_data = iter_backlinks(checker.csv_file_path, backlink_column)
                     
                     # Controlla URL in parallelo
                     completed = 0
-                    with ThreadPoolExecutor(max_workers=self.checker.max_workers) as executor:
-                        future_to_url = {
-                            executor.submit(self.checker.check_url_wrapper, data, timeout=self.checker.timeout): data 
-                            for data in url_data
-                        }
-                        
-                        for future in as_completed(future_to_url):
-                            try:
-                                result = future.result()
-                                
-                                # Aggiungi info dalla riga CSV
-                                row = df_with_backlinks.loc[result['row_index']]
-                                result.update({
-                                    'nome_azienda': row.get('Nome Azienda', ''),
-                                    'sito_pubblicazione': row.get('Sito di pubblicazione', ''),
-                                    'titolo': row.get('Titolo', ''),
-                                    'data_pubblicazione': row.get('Data di pubblicazione', '')
-                                })
-                                
-                                with self.checker.lock:
-                                    self.checker.results.append(result)
-                                    completed += 1
-                                
-                                # Aggiorna GUI
-                                self.update_progress(completed, total_links)
-                                
-                                # Log risultato
-                                url = result['url']
-                                status = result['status']
-                                status_code = result.get('status_code', 'N/A')
-                                response_time = result.get('response_time', 0)
-                                
-                                status_emoji = {
-                                    'ONLINE': '✅',
-                                    'ONLINE_WITH_REDIRECTS': '✅🔄',
-                                    'CLIENT_ERROR': '❌',
-                                    'SERVER_ERROR': '🔥',
-                                    'TIMEOUT': '⏰',
-                                    'CONNECTION_ERROR': '🔌',
-                                    'REDIRECT_ERROR': '🔄❌',
-                                    'INVALID': '❓',
-                                    'ERROR': '❌'
-                                }.get(status, '❓')
-                                
-                                short_url = url[:50] + '...' if len(url) > 50 else url
-                                self.log_message(f"[{completed}/{total_links}] {status_emoji} {short_url}")
-                                self.log_message(f"    {status} ({status_code}) - {response_time}s")
-                                
-                                if result.get('has_redirects'):
-                                    redirect_count = result.get('redirect_count', 0)
-                                    final_url = result.get('final_url', '')[:40]
-                                    self.log_message(f"    🔄 {redirect_count} redirect → {final_url}...")
+                    
+                    def handle_result(result):
+                        nonlocal completed
+                        try:
+                            checker.record_result(result)
+                            completed += 1
+                            
+                            # Aggiorna GUI
+                            self.update_progress(completed, total_links)
+                            
+                            # Log risultato
+                            url = result['url']
+                            status = result['status']
+                            status_code = result.get('status_code', 'N/A')
+                            response_time = result.get('response_time', 0)
+                            
+                            status_emoji = {
+                                'ONLINE': '✅',
+                                'ONLINE_WITH_REDIRECTS': '✅🔄',
+                                'CLIENT_ERROR': '❌',
+                                'SERVER_ERROR': '🔥',
+                                'TIMEOUT': '⏰',
+                                'CONNECTION_ERROR': '🔌',
+                                'REDIRECT_ERROR': '🔄❌',
+                                'INVALID': '❓',
+                                'SKIPPED_DEADLINE': '⏭️',
+                                'HOST_DOWN': '⛔',
+                                'DNS_ERROR': '🌐',
+                                'ERROR': '❌'
+                            }.get(status, '❓')
+                            
+                            short_url = url[:50] + '...' if len(url) > 50 else url
+                            self.log_message(f"[{completed}/{total_links}] {status_emoji} {short_url}")
+                            self.log_message(f"    {status} ({status_code}) - {response_time}s")
+                            
+                            if result.get('has_redirects'):
+                                redirect_count = result.get('redirect_count', 0)
+                                final_url = result.get('final_url', '')[:40]
+                                self.log_message(f"    🔄 {redirect_count} redirect → {final_url}...")
+                            
+                            if result.get('error'):
+                                error_msg = result['error'][:50]
+                                self.log_message(f"    ⚠️ {error_msg}...")
+                            
+                            if result.get('target_found') is False:
+                                self.log_message(f"    🔗 Target non trovato nell'articolo")
+                            elif result.get('anchor_match') is False:
+                                self.log_message(f"    🔗 Anchor diversa da quella prevista")
                                 
-                                if result.get('error'):
-                                    error_msg = result['error'][:50]
-                                    self.log_message(f"    ⚠️ {error_msg}...")
-                                    
-                            except Exception as e:
-                                self.log_message(f"❌ Errore nel controllo URL: {e}")
+                        except Exception as e:
+                            self.log_message(f"❌ Errore nel controllo URL: {e}")
                     
-                    # Ordina risultati
-                    self.checker.results.sort(key=lambda x: x['row_index'])
+                    checker.check_urls(url_data, handle_result)
                     
                 except Exception as e:
                     self.log_message(f"❌ ERRORE durante la lettura del CSV: {str(e)}")
                     return
             
             # Sostituisci il metodo process_csv
-            self.checker.process_csv = gui_process_csv
+            checker.process_csv = gui_process_csv
             
             # Esegui l'analisi completa
-            self.checker.run()
+            checker.run()
             
             self.log_message("\n" + "="*60)
-            self.log_message("✅ ANALISI COMPLETATA CON SUCCESSO!")
-            self.log_message("📊 Controlla i file di report generati.")
+            if checker.cancelled:
+                self.log_message("⏹️ ANALISI INTERROTTA")
+                self.log_message("📊 Il report parziale contiene i link già controllati.")
+            else:
+                self.log_message("✅ ANALISI COMPLETATA CON SUCCESSO!")
+                self.log_message("📊 Controlla i file di report generati.")
             self.log_message("="*60)
             
         except Exception as e:
@@ -394,8 +387,9 @@ class BacklinkCheckerGUI:
             messagebox.showerror("Errore", f"Errore durante l'analisi:\n{str(e)}")
             
         finally:
-            # Riabilita i pulsanti
-            self.root.after(0, self.analysis_completed)
+            # Riabilita i pulsanti (se nel frattempo non è partita un'altra analisi)
+            if self.checker is checker:
+                self.root.after(0, self.analysis_completed)
             
     def analysis_completed(self):
         """Chiamata quando l'analisi è completata"""
@@ -405,11 +399,11 @@ class BacklinkCheckerGUI:
         
     def stop_analysis(self):
         """Ferma l'analisi in corso"""
-        if self.analysis_thread and self.analysis_thread.is_alive():
-            self.log_message("\n⏹️ Interruzione analisi richiesta...")
-            # Nota: threading in Python non supporta l'interruzione forzata
-            # L'analisi si fermerà al prossimo checkpoint
-            messagebox.showinfo("Info", "L'analisi si fermerà al prossimo checkpoint.")
+        if self.checker is not None and self.analysis_thread and self.analysis_thread.is_alive():
+            self.log_message("\n⏹️ Interruzione analisi: richieste in corso annullate...")
+            # Le richieste in volo vengono chiuse: il thread termina in pochi secondi
+            # e intanto si può già avviare una nuova analisi
+            self.checker.cancel()
         
         self.analysis_completed()
 
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server HTTP locale per i benchmark del Backlink Checker
+Il comportamento di ogni URL è scritto nel path (generato da plans.py):
+
+    /b/ok/<id>            200 con una pagina HTML
+    /b/redirect-N/<id>    catena di N redirect 301 che termina su /b/ok/<id>
+    /b/client-error/<id>  404
+    /b/server-error/<id>  500 (anche ai retry)
+    /b/timeout/<id>       risponde dopo --hang secondi
+    /b/slow-body/<id>     200 con il body inviato a blocchi lenti
+    /__stats              byte inviati e richieste servite (JSON)
+
+Latenza (con jitter) e limite di richieste al secondo per host (429 con
+Retry-After) sono configurabili. Con --hosts N il server ascolta su
+127.0.0.1 ... 127.0.0.N (Linux instrada tutto 127.0.0.0/8 su loopback),
+così lo scheduler per host vede N siti distinti.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE = (
+    b'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Articolo</title></head><body>'
+    b'<nav><a href="/">Home</a></nav><article><h1>Articolo di prova</h1>'
+    + b'<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>' * 20
+    + b'<p>Link: <a href="https://www.target-benchmark.it/pagina" rel="nofollow">anchor di prova</a></p>'
+    + b'</article><footer>' + b'<p>footer</p>' * 200 + b'</footer></body></html>'
+)
+
+
+class CountingWriter:
+    """Conta i byte scritti sul socket (header e body)"""
+
+    def __init__(self, wfile, stats):
+        self.wfile = wfile
+        self.stats = stats
+
+    def write(self, data):
+        written = self.wfile.write(data)
+        with self.stats['lock']:
+            self.stats['bytes_sent'] += len(data)
+        return written
+
+    def flush(self):
+        self.wfile.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.wfile, name)
+
+
+class HostLimiter:
+    """Finestra di un secondo per host: oltre rate_limit richieste risponde 429"""
+
+    def __init__(self, rate_limit):
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.windows = {}   # host -> (inizio finestra, richieste)
+
+    def allow(self, host):
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            start, count = self.windows.get(host, (now, 0))
+            if now - start >= 1.0:
+                start, count = now, 0
+            count += 1
+            self.windows[host] = (start, count)
+        return count <= self.rate_limit
+
+
+def make_handler(config, stats, limiter):
+    class BenchmarkHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            self.wfile = CountingWriter(self.wfile, stats)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, headers=None, body=b''):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body and self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def _handle(self):
+            with stats['lock']:
+                stats['requests'] += 1
+
+            if self.path == '/__stats':
+                with stats['lock']:
+                    data = {key: value for key, value in stats.items() if key != 'lock'}
+                self._reply(200, {'Content-Type': 'application/json'}, json.dumps(data).encode())
+                return
+
+            parts = self.path.split('?')[0].strip('/').split('/')
+            if len(parts) != 3 or parts[0] != 'b':
+                self._reply(404)
+                return
+            kind, item_id = parts[1], parts[2]
+
+            if config.latency:
+                time.sleep(max(random.gauss(config.latency, config.jitter), 0) / 1000)
+
+            if not limiter.allow(self.server.server_address[0]):
+                self._reply(429, {'Retry-After': '1'})
+                return
+
+            if kind == 'ok':
+                self._reply(200, {'Content-Type': 'text/html; charset=utf-8'}, PAGE)
+            elif kind.startswith('redirect-'):
+                remaining = int(kind.split('-')[1]) - 1
+                target = f'/b/redirect-{remaining}/{item_id}' if remaining > 0 else f'/b/ok/{item_id}'
+                self._reply(301, {'Location': target})
+            elif kind == 'client-error':
+                self._reply(404)
+            elif kind == 'server-error':
+                self._reply(500)
+            elif kind == 'timeout':
+                time.sleep(config.hang)
+                self._reply(200, {'Content-Type': 'text/html; charset=utf-8'}, PAGE)
+            elif kind == 'slow-body':
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(PAGE)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    step = max(len(PAGE) // 10, 1)
+                    for start in range(0, len(PAGE), step):
+                        self.wfile.write(PAGE[start:start + step])
+                        self.wfile.flush()
+                        time.sleep(config.slow_body_delay)
+            else:
+                self._reply(404)
+
+        def do_GET(self):
+            try:
+                self._handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Il client ha chiuso la connessione (es. body non letto)
+
+        do_HEAD = do_GET
+
+    return BenchmarkHandler
+
+
+def start_servers(config):
+    """Avvia un server per ogni host e restituisce la lista dei server"""
+    stats = {'lock': threading.Lock(), 'bytes_sent': 0, 'requests': 0}
+    limiter = HostLimiter(config.rate_limit)
+    handler = make_handler(config, stats, limiter)
+
+    servers = []
+    for n in range(1, config.hosts + 1):
+        server = ThreadingHTTPServer((f'127.0.0.{n}', config.port), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Server HTTP locale per i benchmark')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--hosts', type=int, default=1, help='Host distinti (127.0.0.1 ... 127.0.0.N)')
+    parser.add_argument('--latency', type=float, default=20, help='Latenza media in millisecondi')
+    parser.add_argument('--jitter', type=float, default=5, help='Deviazione standard della latenza (ms)')
+    parser.add_argument('--rate-limit', type=int, default=0,
+                        help='Richieste al secondo per host prima di rispondere 429 (0 = nessun limite)')
+    parser.add_argument('--hang', type=float, default=30, help='Secondi di attesa per gli URL /timeout')
+    parser.add_argument('--slow-body-delay', type=float, default=0.2,
+                        help='Pausa tra i blocchi del body per gli URL /slow-body (secondi)')
+    return parser
+
+
+def main():
+    config = build_parser().parse_args()
+    start_servers(config)
+    print(f'Mock server su 127.0.0.1-{config.hosts}:{config.port}', flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Piani di pubblicazione sintetici per i benchmark
+Stesse colonne del piano reale; il backlink di ogni riga punta al mock server
+con il comportamento (ok, redirect, errori, timeout, body lento) scelto in
+base alle percentuali richieste, con seme fisso per avere piani ripetibili.
+"""
+
+import argparse
+import csv
+import random
+
+PLAN_COLUMNS = [
+    'Referente ', 'Anno', 'Mese', 'n. backlink', 'Data Scadenza contratto', 'Nome Azienda',
+    'N. Contratto', 'ID ordine Spidertool', 'Titolo', 'Keyword', 'Anchor text',
+    'Target backlink (URL)', 'generati/IN CARTELLA DRIVE', 'Sito di pubblicazione', 'Slug',
+    'check target backlink corretto', 'check anchor inserita come da indicazioni',
+    "check 1 solo link all'interno dell'articolo", 'check citazioni insensate',
+    'check Immagine coerente', 'check categoria', 'check formattazione', 'check frase con link',
+    'Ulteriori errori', 'Backlink', 'Archiviati', 'check pubblicazione', 'ok pbn',
+    'Data di pubblicazione', 'Immagine', 'TITOLO ARTICOLO', 'DATA ISO', 'URL IMMAGINE', 'LINK presenti'
+]
+
+# Comportamenti del mock server e percentuali di default
+DEFAULT_MIX = {
+    'redirect': 0.10,
+    'client-error': 0.05,
+    'server-error': 0.02,
+    'timeout': 0.0,
+    'slow-body': 0.0,
+}
+
+
+def choose_kind(rng, mix, max_redirects):
+    """Sceglie il comportamento di un URL secondo le percentuali di mix (il resto è 'ok')"""
+    roll = rng.random()
+    for kind, rate in mix.items():
+        if roll < rate:
+            if kind == 'redirect':
+                return f'redirect-{rng.randint(1, max_redirects)}'
+            return kind
+        roll -= rate
+    return 'ok'
+
+
+def write_plan(path, rows, port=8765, hosts=1, mix=None, duplicate_rate=0.0,
+               max_redirects=3, seed=42):
+    """Scrive un piano sintetico con rows righe; restituisce il conteggio per comportamento"""
+    rng = random.Random(seed)
+    mix = dict(DEFAULT_MIX, **(mix or {}))
+    counts = {}
+    urls = []
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=PLAN_COLUMNS)
+        writer.writeheader()
+        for i in range(rows):
+            if urls and rng.random() < duplicate_rate:
+                url, kind = rng.choice(urls)
+            else:
+                kind = choose_kind(rng, mix, max_redirects)
+                host = f'127.0.0.{i % hosts + 1}'
+                url = f'http://{host}:{port}/b/{kind}/{i}'
+                urls.append((url, kind))
+            counts[kind] = counts.get(kind, 0) + 1
+
+            writer.writerow({
+                'Referente ': f'Referente {i % 7}',
+                'Anno': '2025',
+                'Mese': str(i % 12 + 1),
+                'Nome Azienda': f'Azienda {i % 50}',
+                'Titolo': f'Articolo di prova {i}',
+                'Anchor text': 'anchor di prova',
+                'Target backlink (URL)': 'https://www.target-benchmark.it/pagina',
+                'Sito di pubblicazione': url.split('/')[2],
+                'Backlink': url,
+                'Data di pubblicazione': '2025-01-01',
+            })
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera un piano di pubblicazione sintetico')
+    parser.add_argument('output', help='File CSV da creare')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--hosts', type=int, default=1)
+    parser.add_argument('--duplicates', type=float, default=0.0, help='Frazione di righe con URL ripetuti')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    counts = write_plan(args.output, args.rows, port=args.port, hosts=args.hosts,
+                        duplicate_rate=args.duplicates, seed=args.seed)
+    print(f'Piano scritto in {args.output}: {counts}')
+
+
+if __name__ == '__main__':
+    main()
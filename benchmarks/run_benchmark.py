@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del Backlink Checker
+Avvia il mock server locale, genera un piano sintetico e lo controlla con
+BacklinkChecker (percorso CLI) e come job della web app eseguito dai suoi
+processi worker (percorso web),
+per ogni motore richiesto. Ogni esecuzione gira in un processo separato così
+il picco di memoria è misurato in modo indipendente.
+
+Metriche: URL/secondo, latenza p50/p95/p99 (response_time dei risultati),
+byte trasferiti (misurati dal server), picco RSS del processo (per il percorso
+web il processo della web app) e, per il percorso web, picco RSS del più grande
+dei worker che eseguono i controlli (solo Linux).
+
+Esempio:
+    python benchmarks/run_benchmark.py --rows 2000 --hosts 10 --engines threads async
+"""
+
+import argparse
+import glob
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from urllib.request import urlopen
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from plans import write_plan
+
+PATHS = ('cli', 'web')
+
+
+def percentile(values, fraction):
+    """Percentile con il metodo nearest-rank (values già ordinati)"""
+    if not values:
+        return None
+    rank = max(int(round(fraction * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def peak_rss_mb():
+    """Picco di memoria residente del processo in MB (None se non disponibile, es. Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux restituisce KB, macOS byte
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def process_peak_rss_mb(pid):
+    """
+    Picco di memoria residente in MB di un altro processo ancora attivo (VmHWM,
+    solo Linux; None altrimenti). RUSAGE_CHILDREN non basta: su Linux il picco di un
+    figlio include la memoria del padre copiata prima dell'exec.
+    """
+    try:
+        with open(f'/proc/{pid}/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_child(path, engine, plan, workers, timeout, verify_links, adaptive):
+    """Esegue un singolo controllo nella directory corrente e stampa le metriche in JSON"""
+    sys.path.insert(0, REPO_ROOT)
+    if path == 'cli':
+        from backlink_checker import BacklinkChecker
+    else:
+        import app
+        app.start_background()
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        if path == 'cli':
+            checker = BacklinkChecker(plan, max_workers=workers, engine=engine, verify_links=verify_links,
+                                      adaptive=adaptive)
+            checker.timeout = timeout
+            checker.run()
+        else:
+            # Come /start_analysis: il job viene accodato ed eseguito dai worker avviati dalla web app
+            job = app.job_queue.enqueue({
+                'filepath': plan,
+                'max_workers': workers,
+                'timeout': timeout,
+                'backlink_column': 'Backlink',
+                'engine': engine,
+                'verify_links': verify_links,
+                'adaptive': adaptive
+            }, workers)
+            while app.job_queue.get(job['job_id'])['running']:
+                time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    workers_rss = None
+    if path == 'web':
+        # I controlli girano nei worker: vale il picco del più grande
+        peaks = [process_peak_rss_mb(worker.pid) for worker in app.worker_processes]
+        peaks = [peak for peak in peaks if peak is not None]
+        workers_rss = max(peaks) if peaks else None
+
+    reports = sorted(glob.glob('backlink_report_*.csv'))
+    latencies = []
+    statuses = {}
+    rows = 0
+    if reports:
+        with open(reports[-1], newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                rows += 1
+                status = row.get('status') or row.get('Status')
+                statuses[status] = statuses.get(status, 0) + 1
+                value = row.get('response_time') or row.get('Response_Time')
+                if value:
+                    latencies.append(float(value))
+    latencies.sort()
+
+    print(json.dumps({
+        'rows': rows,
+        'elapsed': elapsed,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'peak_rss_mb': peak_rss_mb(),
+        'workers_peak_rss_mb': workers_rss,
+        'statuses': statuses,
+    }))
+
+
+def server_stats(port):
+    with urlopen(f'http://127.0.0.1:{port}/__stats', timeout=5) as response:
+        return json.loads(response.read())
+
+
+def start_mock_server(args):
+    command = [
+        sys.executable, os.path.join(BENCHMARK_DIR, 'mock_server.py'),
+        '--port', str(args.port), '--hosts', str(args.hosts),
+        '--latency', str(args.latency), '--jitter', str(args.jitter),
+        '--rate-limit', str(args.rate_limit), '--hang', str(args.hang),
+        '--slow-body-delay', str(args.slow_body_delay),
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    server.stdout.readline()  # Attende che il server sia in ascolto
+    return server
+
+
+def format_value(value, pattern):
+    return 'n/d' if value is None else pattern.format(value)
+
+
+def run_benchmarks(args):
+    results = []
+    with tempfile.TemporaryDirectory(prefix='backlink_bench_') as workdir:
+        plan = os.path.join(workdir, 'piano.csv')
+        mix = {
+            'redirect': args.redirect_rate,
+            'client-error': args.client_error_rate,
+            'server-error': args.server_error_rate,
+            'timeout': args.timeout_rate,
+            'slow-body': args.slow_body_rate,
+        }
+        counts = write_plan(plan, args.rows, port=args.port, hosts=args.hosts, mix=mix,
+                            duplicate_rate=args.duplicates, seed=args.seed)
+        print(f'📄 Piano sintetico: {args.rows} righe su {args.hosts} host {counts}')
+
+        server = start_mock_server(args)
+        try:
+            for path in args.paths:
+                for engine in args.engines:
+                    run_dir = os.path.join(workdir, f'{path}_{engine}')
+                    os.makedirs(run_dir)
+                    bytes_before = server_stats(args.port)['bytes_sent']
+
+                    command = [sys.executable, os.path.abspath(__file__), '--child', path, engine, plan,
+                               '--workers', str(args.workers), '--timeout', str(args.timeout)]
+                    if args.verify_links:
+                        command.append('--verify-links')
+                    if args.adaptive:
+                        command.append('--adaptive')
+                    output = subprocess.run(command, cwd=run_dir, capture_output=True, text=True)
+                    if output.returncode != 0:
+                        print(f'❌ {path}/{engine} fallito:\n{output.stderr}')
+                        continue
+                    # Anche i worker del percorso web scrivono su stdout: le metriche sono l'ultima riga JSON
+                    lines = [line for line in output.stdout.splitlines() if line.startswith('{"rows"')]
+                    metrics = json.loads(lines[-1])
+
+                    metrics.update({
+                        'path': path,
+                        'engine': engine,
+                        'urls_per_second': metrics['rows'] / metrics['elapsed'] if metrics['elapsed'] else 0,
+                        'bytes': server_stats(args.port)['bytes_sent'] - bytes_before,
+                    })
+                    results.append(metrics)
+                    print(f"  ✔ {path}/{engine}: {metrics['rows']} righe in {metrics['elapsed']:.1f}s")
+        finally:
+            server.terminate()
+            server.wait()
+
+    print()
+    # RSS MB: processo che ha avviato il controllo (la web app per il percorso web);
+    # RSS worker: il più grande dei worker che eseguono i controlli (solo percorso web)
+    print(f"{'percorso':<10}{'motore':<10}{'URL/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'MB inviati':>12}"
+          f"{'RSS MB':>9}{'RSS worker':>12}")
+    for m in results:
+        print(f"{m['path']:<10}{m['engine']:<10}{m['urls_per_second']:>9.1f}"
+              f"{format_value(m['p50'], '{:.3f}'):>9}{format_value(m['p95'], '{:.3f}'):>9}"
+              f"{format_value(m['p99'], '{:.3f}'):>9}{m['bytes'] / 1e6:>12.2f}"
+              f"{format_value(m['peak_rss_mb'], '{:.0f}'):>9}"
+              f"{format_value(m['workers_peak_rss_mb'], '{:.0f}'):>12}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f'\n💾 Risultati salvati in {args.output}')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Benchmark del Backlink Checker con mock server locale')
+    parser.add_argument('--rows', type=int, default=1000, help='Righe del piano sintetico')
+    parser.add_argument('--hosts', type=int, default=1,
+                        help='Host distinti 127.0.0.1 ... 127.0.0.N (più di 1 solo su Linux)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--paths', nargs='+', choices=PATHS, default=list(PATHS))
+    parser.add_argument('--engines', nargs='+', choices=('threads', 'async'), default=['threads'])
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--timeout', type=int, default=3, help='Timeout del checker (secondi)')
+    parser.add_argument('--verify-links', action='store_true', help='Attiva la verifica del contenuto')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Concorrenza adattiva (--workers diventa il massimo)')
+    parser.add_argument('--duplicates', type=float, default=0.0, help='Frazione di righe con URL ripetuti')
+    parser.add_argument('--seed', type=int, default=42)
+    # Comportamento del mock server
+    parser.add_argument('--latency', type=float, default=20, help='Latenza media del server (ms)')
+    parser.add_argument('--jitter', type=float, default=5, help='Deviazione standard della latenza (ms)')
+    parser.add_argument('--redirect-rate', type=float, default=0.10)
+    parser.add_argument('--client-error-rate', type=float, default=0.05)
+    parser.add_argument('--server-error-rate', type=float, default=0.02)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--slow-body-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=0,
+                        help='Richieste/s per host prima del 429 (0 = nessun limite)')
+    parser.add_argument('--hang', type=float, default=30, help='Attesa degli URL in timeout (secondi)')
+    parser.add_argument('--slow-body-delay', type=float, default=0.2)
+    parser.add_argument('--output', help='Salva configurazione e metriche in un file JSON')
+    return parser
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child = argparse.ArgumentParser()
+        child.add_argument('path', choices=PATHS)
+        child.add_argument('engine')
+        child.add_argument('plan')
+        child.add_argument('--workers', type=int)
+        child.add_argument('--timeout', type=int)
+        child.add_argument('--verify-links', action='store_true')
+        child.add_argument('--adaptive', action='store_true')
+        args = child.parse_args(sys.argv[2:])
+        run_child(args.path, args.engine, args.plan, args.workers, args.timeout, args.verify_links,
+                  args.adaptive)
+        return
+
+    run_benchmarks(build_parser().parse_args())
+
+
+if __name__ == '__main__':
+    main()
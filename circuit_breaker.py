@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Circuit breaker per host del Backlink Checker
+Quando un sito di pubblicazione è offline ogni suo backlink aspetterebbe
+timeout, fallback GET e retry prima di risultare in errore. Dopo `threshold`
+errori di connessione o timeout consecutivi sullo stesso host il circuito si
+apre: gli URL restanti di quell'host vengono segnati HOST_DOWN senza richieste
+e i worker tornano agli host sani.
+
+Con `probe_after` secondi, a circuito aperto un solo URL dell'host viene
+lasciato passare come sonda (half-open): se risponde il circuito si chiude,
+altrimenti resta aperto per altri `probe_after` secondi. I retry della sonda
+passano anche loro; una sonda senza esito di rete (DNS_ERROR, controllo
+interrotto) libera il posto con release_probe.
+
+Gli host sono indicati come host:porta: porte diverse sono servizi diversi.
+"""
+
+import time
+
+HOST_DOWN = 'HOST_DOWN'
+
+# Status che indicano un host irraggiungibile (e non una pagina in errore)
+HOST_FAILURE_STATUSES = ('TIMEOUT', 'CONNECTION_ERROR')
+
+DEFAULT_THRESHOLD = 3
+DEFAULT_PROBE_AFTER = 60.0
+
+
+class HostCircuitBreaker:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, probe_after=DEFAULT_PROBE_AFTER, on_change=None):
+        """
+        threshold: errori consecutivi che aprono il circuito di un host
+        probe_after: secondi dopo cui un URL fa da sonda (None o 0 = nessuna sonda)
+        on_change: funzione messaggio -> None chiamata all'apertura e alla chiusura
+        """
+        self.threshold = max(1, threshold)
+        self.probe_after = probe_after
+        self.on_change = on_change
+        self.failures = {}    # host -> errori consecutivi
+        self.opened = {}      # host con circuito aperto -> (ora di apertura o dell'ultima sonda, risultato)
+        self.probing = {}     # host con una sonda in volo -> chi la sta facendo (es. row_index)
+        self.tripped_hosts = set()
+        self.short_circuited = 0
+
+    def allow(self, host, owner=None):
+        """
+        True se si può fare una richiesta verso host: circuito chiuso o sonda,
+        fatta da owner (i nuovi tentativi dello stesso owner restano la sonda)
+        """
+        if host not in self.opened:
+            return True
+        if host in self.probing:
+            return owner is not None and self.probing[host] == owner
+        if not self.probe_after:
+            return False
+        opened_at = self.opened[host][0]
+        if time.monotonic() - opened_at < self.probe_after:
+            return False
+        self.probing[host] = owner
+        return True
+
+    def release_probe(self, host=None, owner=None):
+        """
+        Libera la sonda di host se la sta facendo owner (None = qualunque),
+        senza registrare un esito; senza host libera tutte le sonde
+        """
+        if host is None:
+            self.probing.clear()
+        elif host in self.probing and (owner is None or self.probing[host] == owner):
+            del self.probing[host]
+
+    def record(self, host, result):
+        """Registra l'esito di una richiesta di rete verso host"""
+        self.probing.pop(host, None)
+        if result.get('status') not in HOST_FAILURE_STATUSES:
+            self.failures.pop(host, None)
+            if self.opened.pop(host, None) is not None:
+                self._notify(f'🟢 Host {host} di nuovo raggiungibile: controlli ripresi')
+            return
+
+        self.failures[host] = self.failures.get(host, 0) + 1
+        if host in self.opened:
+            # Sonda (o richiesta già in volo) fallita: il circuito resta aperto
+            self.opened[host] = (time.monotonic(), self.opened[host][1])
+        elif self.failures[host] >= self.threshold:
+            self.opened[host] = (time.monotonic(), result)
+            self.tripped_hosts.add(host)
+            probe = f', nuovo tentativo tra {self.probe_after:g}s' if self.probe_after else ''
+            self._notify(f'🔌 Host {host} irraggiungibile ({self.failures[host]} errori consecutivi): '
+                         f'URL restanti segnati {HOST_DOWN}{probe}')
+
+    def host_down_error(self, host):
+        """Errore per un URL saltato perché l'host ha il circuito aperto, con la causa dell'apertura"""
+        self.short_circuited += 1
+        trigger = self.opened[host][1]
+        return (f'Host non raggiungibile dopo {self.threshold} errori consecutivi '
+                f'({trigger["status"]}: {trigger.get("error") or "n/d"})')
+
+    def _notify(self, message):
+        if self.on_change is not None:
+            self.on_change(message)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache DNS condivisa del Backlink Checker
+Ogni host distinto del piano viene risolto una sola volta, in anticipo e in
+parallelo (prefetch mentre lo scheduler legge il piano); le risposte, anche
+quelle negative (dominio inesistente), restano valide per un TTL.
+
+Le connessioni HTTP usano gli indirizzi già risolti e gli host inesistenti
+(NXDOMAIN) diventano DNS_ERROR senza occupare un worker né attendere un timeout.
+I guasti temporanei del resolver (EAI_AGAIN, risoluzione troppo lenta) non
+vengono memorizzati: sollevano TemporaryDnsError e il controllo li tratta come
+errori di connessione o timeout, con retry e seconda fase.
+"""
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+DNS_ERROR = 'DNS_ERROR'
+
+DEFAULT_TTL = 300           # Secondi di validità delle risposte positive
+DEFAULT_NEGATIVE_TTL = 60   # Secondi di validità degli host non risolvibili
+DNS_WORKERS = 32            # Risoluzioni in parallelo
+
+# Risposte definitive "l'host non esiste": solo queste vengono memorizzate come negative
+NOT_FOUND_ERRORS = tuple(getattr(socket, name) for name in ('EAI_NONAME', 'EAI_NODATA') if hasattr(socket, name))
+
+
+class TemporaryDnsError(OSError):
+    """Risoluzione non riuscita per un guasto temporaneo del resolver (l'host può esistere)"""
+
+
+class DnsLookupTimeout(TemporaryDnsError):
+    """Risoluzione ancora in corso allo scadere del tempo concesso"""
+
+
+class DnsCache:
+    def __init__(self, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, workers=DNS_WORKERS):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.entries = {}   # host -> (scadenza, [(family, indirizzo)], errore)
+        self.pending = {}   # host -> future della risoluzione in corso
+        self.executor = None
+        self.resolved = 0
+        self.failed = 0
+        self.temporary_failures = 0
+
+    def _resolve(self, host):
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            addresses = []
+            for family, _, _, _, sockaddr in infos:
+                if (family, sockaddr[0]) not in addresses:
+                    addresses.append((family, sockaddr[0]))
+            entry = (time.monotonic() + self.ttl, addresses, None)
+        except socket.gaierror as e:
+            if e.errno not in NOT_FOUND_ERRORS:
+                # Guasto temporaneo: nessuna risposta in cache, il prossimo lookup riprova
+                with self.lock:
+                    self.pending.pop(host, None)
+                    self.temporary_failures += 1
+                raise TemporaryDnsError(e.errno, e.strerror) from e
+            entry = (time.monotonic() + self.negative_ttl, [], str(e))
+        except UnicodeError as e:
+            # Nome non codificabile (IDN non valido): non esisterà mai
+            entry = (time.monotonic() + self.negative_ttl, [], str(e) or type(e).__name__)
+
+        with self.lock:
+            self.entries[host] = entry
+            self.pending.pop(host, None)
+            if entry[2] is None:
+                self.resolved += 1
+            else:
+                self.failed += 1
+        return entry
+
+    def _fresh_entry(self, host):
+        entry = self.entries.get(host)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry
+        return None
+
+    def _pending(self, host):
+        """Risoluzione in corso di host, avviata ora se non c'è (da chiamare con il lock)"""
+        future = self.pending.get(host)
+        if future is None:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dns')
+            future = self.pending[host] = self.executor.submit(self._resolve, host)
+        return future
+
+    def prefetch(self, host):
+        """Avvia in background la risoluzione di host (se non è già in cache o in corso)"""
+        if not host:
+            return
+        with self.lock:
+            if self._fresh_entry(host) is None:
+                self._pending(host)
+
+    def lookup(self, host, timeout=None):
+        """
+        Restituisce (indirizzi, errore) per host, aspettando al massimo timeout
+        secondi la risoluzione (sempre nei thread della cache, anche se non era
+        stata anticipata). Gli indirizzi sono coppie (family, ip); errore è
+        impostato solo se l'host non esiste. Solleva TemporaryDnsError
+        (DnsLookupTimeout se il tempo finisce) quando la risposta non è definitiva.
+        """
+        with self.lock:
+            entry = self._fresh_entry(host)
+            future = self._pending(host) if entry is None else None
+        if entry is not None:
+            return entry[1], entry[2]
+        try:
+            entry = future.result(timeout=None if timeout is None else max(timeout, 0))
+        except FutureTimeout:
+            # La risposta arriverà più tardi: non è un host inesistente
+            raise DnsLookupTimeout(f'Risoluzione DNS oltre {round(max(timeout, 0), 3)}s')
+        return entry[1], entry[2]
+
+    def cached_error(self, host):
+        """Errore di un host già noto come non risolvibile, senza attendere (None altrimenti)"""
+        with self.lock:
+            entry = self._fresh_entry(host)
+        return entry[2] if entry is not None else None
+
+    def close(self):
+        """Ferma i thread di risoluzione (la cache resta valida per i controlli successivi)"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Supporto HEAD per host del Backlink Checker
+Molti siti di pubblicazione (WordPress, CDN) rispondono a HEAD con 403/405/404
+mentre la GET funziona: ogni URL di quegli host costa due richieste (più i
+redirect). HeadSupport confronta l'esito di HEAD con quello della GET di
+fallback e, dopo REJECT_AFTER risposte diverse consecutive, segna l'host come
+"senza HEAD": i suoi URL vengono controllati direttamente con una GET.
+
+Le decisioni possono essere caricate e salvate nella cache persistente
+(vedi ResultCache.head_support), così valgono anche per i controlli successivi.
+"""
+
+import threading
+
+# HEAD respinti consecutivi (con una GET dall'esito diverso) prima di non usare più HEAD
+REJECT_AFTER = 2
+
+
+class HeadSupport:
+    def __init__(self, known=None, on_change=None):
+        """
+        known: dizionario host -> True/False già noto (es. dalla cache)
+        on_change: funzione (host, supportato) chiamata quando cambia la decisione su un host
+        """
+        self.lock = threading.Lock()
+        self.supported = dict(known or {})  # host -> True (HEAD affidabile) / False (solo GET)
+        self.rejections = {}                # host -> HEAD respinti consecutivi
+        self.on_change = on_change
+        self.head_skipped = 0               # Richieste HEAD non fatte
+        self.round_trips_saved = 0          # Richieste evitate (HEAD e i suoi redirect)
+
+    def use_head(self, host):
+        """False se l'host è noto per rifiutare HEAD"""
+        return self.supported.get(host) is not False
+
+    def record(self, host, head_status, get_status=None):
+        """
+        Registra l'esito di un HEAD verso host; get_status è lo status della GET
+        di fallback (solo se HEAD ha restituito un errore)
+        """
+        rejected = get_status is not None and get_status != head_status
+        with self.lock:
+            if rejected:
+                self.rejections[host] = self.rejections.get(host, 0) + 1
+                decision = False if self.rejections[host] >= REJECT_AFTER else None
+            else:
+                self.rejections.pop(host, None)
+                decision = True
+            if decision is None or self.supported.get(host) == decision:
+                return
+            self.supported[host] = decision
+        if self.on_change is not None:
+            self.on_change(host, decision)
+
+    def skipped(self, round_trips):
+        """Un URL controllato con la sola GET: round_trips richieste evitate"""
+        with self.lock:
+            self.head_skipped += 1
+            self.round_trips_saved += round_trips
+
+    @property
+    def rejecting_hosts(self):
+        return [host for host, supported in self.supported.items() if supported is False]
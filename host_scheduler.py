@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scheduler per host del Backlink Checker
+Raggruppa gli URL per host, limita le richieste in volo per ogni host
+(con intervallo minimo opzionale tra due richieste allo stesso host)
+e alterna gli host in round-robin. Gli elementi rimandati con defer()
+(es. i retry) tornano in coda solo dopo il ritardo indicato; un host messo
+in pausa con pause() (es. dopo un 429 con Retry-After) non riceve richieste
+fino alla fine della pausa.
+"""
+
+import heapq
+import itertools
+import time
+from collections import defaultdict, deque
+
+
+class HostScheduler:
+    def __init__(self, items, key, max_per_host=4, min_interval=0.0, lookahead=None):
+        """
+        items: iterabile di elementi da controllare (es. coppie (row_index, url))
+        key: funzione che restituisce l'host di un elemento
+        lookahead: massimo di elementi letti in anticipo dall'iterabile
+                   (None = legge tutto subito); permette di iniziare i controlli
+                   mentre l'input viene ancora letto, con memoria limitata
+        """
+        self.items = iter(items)
+        self.key = key
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self.lookahead = lookahead
+
+        self.queues = {}                 # host -> deque di elementi in attesa
+        self.rotation = deque()          # host con elementi in attesa, in ordine round-robin
+        self.in_flight = defaultdict(int)
+        self.last_start = {}
+        self.paused = {}                 # host -> fine della pausa (time.monotonic)
+        self.buffered = 0
+        self.exhausted = False
+        self.deferred = []               # heap di (pronto dal, progressivo, elemento)
+        self.deferred_order = itertools.count()
+        self._fill()
+
+    def _fill(self):
+        """Legge dall'iterabile finché il buffer non raggiunge il lookahead"""
+        while not self.exhausted and (self.lookahead is None or self.buffered < self.lookahead):
+            try:
+                item = next(self.items)
+            except StopIteration:
+                self.exhausted = True
+                break
+            self.add(item)
+
+    def add(self, item):
+        """Accoda un elemento (anche a scheduler già avviato, es. per i retry)"""
+        host = self.key(item)
+        queue = self.queues.get(host)
+        if queue is None:
+            queue = self.queues[host] = deque()
+            self.rotation.append(host)
+        queue.append(item)
+        self.buffered += 1
+
+    def defer(self, item, delay):
+        """Riaccoda un elemento tra delay secondi (nel frattempo vengono distribuiti gli altri)"""
+        heapq.heappush(self.deferred, (time.monotonic() + delay, next(self.deferred_order), item))
+
+    def pause(self, host, delay):
+        """Nessuna nuova richiesta verso host per delay secondi"""
+        self.paused[host] = max(self.paused.get(host, 0), time.monotonic() + delay)
+
+    def _promote(self, now):
+        """Sposta in coda gli elementi rimandati il cui ritardo è trascorso"""
+        while self.deferred and self.deferred[0][0] <= now:
+            self.add(heapq.heappop(self.deferred)[2])
+
+    def _is_ready(self, host, now):
+        if self.in_flight[host] >= self.max_per_host:
+            return False
+        paused_until = self.paused.get(host)
+        if paused_until is not None:
+            if now < paused_until:
+                return False
+            del self.paused[host]
+        last = self.last_start.get(host)
+        return last is None or now - last >= self.min_interval
+
+    def pop_ready(self):
+        """
+        Restituisce (host, elemento) per il prossimo host pronto in ordine round-robin,
+        oppure None se tutti gli host in attesa sono saturi o nell'intervallo minimo
+        """
+        self._fill()
+        now = time.monotonic()
+        self._promote(now)
+        for _ in range(len(self.rotation)):
+            host = self.rotation[0]
+            self.rotation.rotate(-1)
+            if not self._is_ready(host, now):
+                continue
+
+            queue = self.queues[host]
+            item = queue.popleft()
+            self.buffered -= 1
+            if not queue:
+                del self.queues[host]
+                self.rotation.remove(host)
+
+            self.in_flight[host] += 1
+            self.last_start[host] = now
+            return host, item
+        return None
+
+    def release(self, host):
+        """Segnala che una richiesta verso host è terminata"""
+        self.in_flight[host] -= 1
+        if self.in_flight[host] <= 0:
+            del self.in_flight[host]
+
+    def wait_time(self):
+        """
+        Secondi prima che un host bloccato solo dall'intervallo minimo o da una pausa
+        torni pronto o che un elemento rimandato torni in coda, None se non c'è nulla da attendere
+        """
+        now = time.monotonic()
+        waits = []
+        for host in self.queues:
+            if self.in_flight[host] >= self.max_per_host:
+                continue
+            ready_at = self.paused.get(host, 0)
+            if self.min_interval and host in self.last_start:
+                ready_at = max(ready_at, self.last_start[host] + self.min_interval)
+            if ready_at > now:
+                waits.append(ready_at - now)
+        if self.deferred:
+            waits.append(self.deferred[0][0] - now)
+        return max(min(waits), 0) if waits else None
+
+    def drain(self):
+        """
+        Restituisce (svuotando lo scheduler) tutti gli elementi non ancora distribuiti,
+        compresi quelli rimandati e quelli non ancora letti dall'iterabile
+        """
+        while self.deferred:
+            yield heapq.heappop(self.deferred)[2]
+        while self.queues or not self.exhausted:
+            for host in list(self.rotation):
+                yield from self.queues.pop(host)
+            self.rotation.clear()
+            self.buffered = 0
+            self._fill()
+
+    @property
+    def pending(self):
+        return self.buffered + len(self.deferred)
+
+    @property
+    def done(self):
+        """True quando non ci sono più elementi da distribuire"""
+        if not self.queues:
+            self._fill()
+        return self.exhausted and not self.queues and not self.deferred
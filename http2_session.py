@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Trasporto HTTP/2 opzionale del Backlink Checker (--http2)
+Con httpx (extra http2) tutti i controlli verso lo stesso host viaggiano
+multiplexati su una sola connessione TCP+TLS invece di aprirne una per ogni
+richiesta in volo; i siti che non negoziano HTTP/2 (ALPN) restano su HTTP/1.1.
+
+Http2Session espone la parte dell'interfaccia di requests.Session usata da
+BacklinkChecker.check_url (head/get in streaming, history dei redirect,
+eccezioni di requests), così il controllo resta identico per i due trasporti.
+Come CancellableAdapter, ogni richiesta (anche ogni redirect) non va oltre il
+tempo massimo dell'URL, le connessioni usano la DnsCache e close() chiude i
+socket aperti, così anche le richieste in volo falliscono subito.
+"""
+
+import socket
+import threading
+import weakref
+
+import httpcore
+import httpx
+import requests
+
+from dns_cache import DnsLookupTimeout, TemporaryDnsError
+
+
+def _translate(error):
+    """Eccezione di requests equivalente a un errore di httpx"""
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(error))
+    if isinstance(error, httpx.TooManyRedirects):
+        return requests.exceptions.TooManyRedirects(str(error))
+    return requests.exceptions.ConnectionError(str(error))
+
+
+class TrackedStream(httpcore.NetworkStream):
+    """Stream httpcore registrato nel backend, anche dopo l'handshake TLS"""
+
+    def __init__(self, stream, backend):
+        self.stream = stream
+        self.backend = backend
+        backend.track(self)
+
+    def read(self, max_bytes, timeout=None):
+        return self.stream.read(max_bytes, timeout)
+
+    def write(self, buffer, timeout=None):
+        self.stream.write(buffer, timeout)
+
+    def close(self):
+        self.stream.close()
+
+    def start_tls(self, ssl_context, server_hostname=None, timeout=None):
+        return TrackedStream(self.stream.start_tls(ssl_context, server_hostname, timeout), self.backend)
+
+    def get_extra_info(self, info):
+        return self.stream.get_extra_info(info)
+
+
+class TrackingBackend(httpcore.SyncBackend):
+    """
+    Backend di rete di httpcore che tiene traccia degli stream aperti (abort()
+    li chiude tutti) e, con dns (DnsCache), si connette agli indirizzi già risolti
+    """
+
+    def __init__(self, dns=None):
+        self.dns = dns
+        self.cancelled = False
+        self.streams = weakref.WeakSet()
+        self.lock = threading.Lock()
+
+    def track(self, stream):
+        with self.lock:
+            self.streams.add(stream)
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        if self.cancelled:
+            raise httpcore.ConnectError('Controllo annullato')
+        if self.dns is None:
+            return TrackedStream(super().connect_tcp(host, port, timeout, local_address, socket_options), self)
+
+        try:
+            addresses, error = self.dns.lookup(host, timeout=timeout)
+        except DnsLookupTimeout as e:
+            raise httpcore.ConnectTimeout(str(e)) from e
+        except TemporaryDnsError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        if error is not None or not addresses:
+            raise httpcore.ConnectError(f'DNS: {error}')
+        last_error = None
+        for _, address in addresses:
+            try:
+                stream = super().connect_tcp(address, port, timeout, local_address, socket_options)
+                return TrackedStream(stream, self)
+            except httpcore.ConnectError as e:
+                last_error = e
+        raise last_error
+
+    def abort(self):
+        self.cancelled = True
+        with self.lock:
+            streams = list(self.streams)
+        for stream in streams:
+            sock = stream.get_extra_info('socket')
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except (OSError, AttributeError):
+                pass
+
+
+class Http2Transport(httpx.HTTPTransport):
+    """HTTPTransport con HTTP/2 il cui pool di connessioni usa un TrackingBackend"""
+
+    def __init__(self, backend, limits, retries=0):
+        super().__init__(http2=True, verify=False, retries=retries, limits=limits)
+        # httpx non espone il backend di rete: il pool viene ricreato con gli stessi parametri
+        self._pool = httpcore.ConnectionPool(
+            ssl_context=httpx.create_ssl_context(verify=False),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=True,
+            retries=retries,
+            network_backend=backend
+        )
+
+
+class Http2Response:
+    """Risposta httpx con gli attributi di requests.Response usati dal checker"""
+
+    def __init__(self, response, history=()):
+        self._response = response
+        self.status_code = response.status_code
+        self.reason = response.reason_phrase
+        self.url = str(response.url)
+        self.headers = response.headers
+        self.protocol = response.http_version
+        self.history = [Http2Response(previous) for previous in history]
+
+    def iter_content(self, chunk_size):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.HTTPError as e:
+            raise _translate(e) from e
+
+    @property
+    def content(self):
+        try:
+            return self._response.read()
+        except httpx.HTTPError as e:
+            raise _translate(e) from e
+
+    def close(self):
+        self._response.close()
+
+
+class Http2Session:
+    def __init__(self, max_connections, headers, retries=0, remaining=None, dns=None):
+        """
+        max_connections: connessioni aperte al massimo (con HTTP/2 di solito una per host)
+        retries: nuovi tentativi sugli errori di connessione
+        remaining: funzione che restituisce i secondi rimasti all'URL del thread corrente (None = nessun limite)
+        dns: DnsCache opzionale per le connessioni
+        """
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        # Disabilita verifica SSL come la sessione requests
+        self.backend = TrackingBackend(dns)
+        transport = Http2Transport(self.backend, limits, retries=retries)
+        self.remaining = remaining
+        self.closed = False
+        # L'hook viene chiamato per ogni richiesta, compresi i redirect seguiti
+        event_hooks = {'request': [self._clip_timeout]} if remaining is not None else None
+        self.client = httpx.Client(transport=transport, headers=headers, max_redirects=30, event_hooks=event_hooks)
+
+    def _clip_timeout(self, request):
+        """Riduce i timeout della richiesta a quanto resta del tempo massimo per URL"""
+        remaining = self.remaining()
+        if remaining is None:
+            return
+        if remaining <= 0:
+            raise httpx.ConnectTimeout('Tempo massimo per URL esaurito', request=request)
+        request.extensions['timeout'] = {
+            phase: remaining if value is None else min(value, remaining)
+            for phase, value in request.extensions.get('timeout', {}).items()
+        }
+
+    def request(self, method, url, timeout, headers=None, allow_redirects=True):
+        if self.closed:
+            raise requests.exceptions.ConnectionError('Controllo annullato')
+        request = self.client.build_request(method, url, headers=headers, timeout=timeout)
+        try:
+            response = self.client.send(request, stream=True, follow_redirects=allow_redirects)
+        except httpx.HTTPError as e:
+            raise _translate(e) from e
+        return Http2Response(response, response.history)
+
+    def head(self, url, timeout, allow_redirects=True, headers=None):
+        response = self.request('HEAD', url, timeout, headers=headers, allow_redirects=allow_redirects)
+        response.close()
+        return response
+
+    def get(self, url, timeout, allow_redirects=True, stream=True, headers=None):
+        """Sempre in streaming: il body si legge con iter_content o content"""
+        return self.request('GET', url, timeout, headers=headers, allow_redirects=allow_redirects)
+
+    def close(self):
+        """Chiude i socket (le richieste in volo falliscono subito) e il client"""
+        self.closed = True
+        self.backend.abort()
+        self.client.close()
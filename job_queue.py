@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Coda dei job del Backlink Checker
+Coda locale su SQLite condivisa tra la web app (che accoda i job e legge
+progresso e log) e i processi worker (`python -m backlink_checker worker`)
+che li eseguono. Nessun broker esterno: più worker, anche su core diversi,
+si coordinano tramite le transazioni SQLite.
+
+I job in esecuzione condividono un budget di richieste in volo diviso in parti
+eque (fair_shares); un job il cui worker smette di aggiornare l'heartbeat
+viene rimesso in coda e riprende dal report parziale.
+
+I log di ogni job sono un buffer circolare: restano solo gli ultimi max_logs,
+ognuno con un numero di sequenza (seq) crescente con cui i client chiedono
+solo quelli nuovi (logs(job_id, after=seq)).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_STOPPED = 'stopped'
+JOB_ERROR = 'error'
+
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_STOPPED, JOB_ERROR)
+
+DEFAULT_QUEUE = 'backlink_jobs.sqlite'
+
+# Secondi senza heartbeat dopo cui un job in esecuzione è considerato orfano
+STALE_AFTER = 30
+
+# Log conservati al massimo per ogni job (i più vecchi vengono eliminati)
+MAX_JOB_LOGS = 1000
+
+_JSON_FIELDS = ('params', 'progress', 'statistics')
+
+
+def fair_shares(requests, budget):
+    """
+    Divide il budget tra i job (job id -> richieste in volo chieste) in modo
+    max-min fair: chi chiede meno della parte uguale la ottiene tutta, il resto
+    va diviso tra gli altri. Ogni job ha almeno una richiesta.
+    """
+    shares = {}
+    remaining = budget
+    ordered = sorted(requests.items(), key=lambda item: item[1])
+    for position, (job_id, requested) in enumerate(ordered):
+        fair = remaining // (len(ordered) - position)
+        shares[job_id] = max(1, min(requested, fair))
+        remaining -= shares[job_id]
+    return shares
+
+
+class JobQueue:
+    def __init__(self, path, max_logs=MAX_JOB_LOGS):
+        """
+        path: file SQLite della coda (creato se non esiste)
+        max_logs: log conservati per ogni job (vale per i log scritti da questa istanza)
+        """
+        self.path = path
+        self.max_logs = max_logs
+        self.lock = threading.Lock()
+        # Autocommit: le transazioni che devono essere atomiche tra processi sono esplicite
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                max_workers INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                worker TEXT,
+                heartbeat REAL,
+                stop_requested INTEGER NOT NULL DEFAULT 0,
+                report_filename TEXT,
+                progress TEXT,
+                statistics TEXT
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                message TEXT NOT NULL,
+                type TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS job_logs_job ON job_logs (job_id, id)')
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        for field in _JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job[field] else ({} if field != 'statistics' else None)
+        job['job_id'] = job.pop('id')
+        job['stop_requested'] = bool(job['stop_requested'])
+        job['filename'] = os.path.basename(job['params'].get('filepath') or '')
+        job['running'] = job['status'] in (JOB_QUEUED, JOB_RUNNING)
+        return job
+
+    def _execute(self, sql, args=()):
+        with self.lock:
+            return self.conn.execute(sql, args)
+
+    def enqueue(self, params, max_workers):
+        """Accoda un job e lo restituisce"""
+        job_id = uuid.uuid4().hex[:12]
+        self._execute(
+            'INSERT INTO jobs (id, params, max_workers, status, created_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, json.dumps(params), max(1, max_workers), JOB_QUEUED, time.time())
+        )
+        return self.get(job_id)
+
+    def claim(self, worker_id, budget):
+        """
+        Prende il job in coda più vecchio, se il budget consente un altro job in
+        esecuzione (ognuno ha almeno una richiesta in volo). None se non c'è nulla da fare.
+        """
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                running = self.conn.execute(
+                    'SELECT COUNT(*) FROM jobs WHERE status = ?', (JOB_RUNNING,)
+                ).fetchone()[0]
+                row = None
+                if running < budget:
+                    row = self.conn.execute(
+                        'SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1', (JOB_QUEUED,)
+                    ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    self.conn.execute(
+                        'UPDATE jobs SET status = ?, worker = ?, started_at = COALESCE(started_at, ?), '
+                        'heartbeat = ? WHERE id = ?',
+                        (JOB_RUNNING, worker_id, now, now, row['id'])
+                    )
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return self.get(row['id']) if row is not None else None
+
+    def heartbeat(self, job_id):
+        """Segnala che il job è vivo; restituisce True se ne è stato chiesto lo stop"""
+        self._execute('UPDATE jobs SET heartbeat = ? WHERE id = ?', (time.time(), job_id))
+        row = self._execute('SELECT stop_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['stop_requested'])
+
+    def shares(self, budget):
+        """Richieste in volo concesse ora a ogni job in esecuzione"""
+        rows = self._execute('SELECT id, max_workers FROM jobs WHERE status = ?', (JOB_RUNNING,)).fetchall()
+        return fair_shares({row['id']: row['max_workers'] for row in rows}, budget)
+
+    def update(self, job_id, **fields):
+        """Aggiorna i campi del job (progress e statistics vengono salvati in JSON)"""
+        for field in _JSON_FIELDS:
+            if field in fields:
+                fields[field] = json.dumps(fields[field])
+        assignments = ', '.join(f'{field} = ?' for field in fields)
+        self._execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def finish(self, job_id, status):
+        self._execute(
+            'UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?',
+            (status, time.time(), job_id, JOB_RUNNING)
+        )
+
+    def request_stop(self, job_id):
+        """Chiede lo stop di un job; quelli ancora in coda terminano subito"""
+        self._execute('UPDATE jobs SET stop_requested = 1 WHERE id = ?', (job_id,))
+        self._execute(
+            'UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?',
+            (JOB_STOPPED, time.time(), job_id, JOB_QUEUED)
+        )
+        return self.get(job_id)
+
+    def requeue_stale(self):
+        """
+        Rimette in coda i job il cui worker non aggiorna più l'heartbeat (processo
+        terminato): riprendono dal report parziale già scritto
+        """
+        limit = time.time() - STALE_AFTER
+        rows = self._execute(
+            'SELECT * FROM jobs WHERE status = ? AND heartbeat < ?', (JOB_RUNNING, limit)
+        ).fetchall()
+        requeued = []
+        for row in rows:
+            job = self._job(row)
+            params = job['params']
+            if job['report_filename'] and os.path.exists(job['report_filename']):
+                params['resume_report'] = job['report_filename']
+            cursor = self._execute(
+                'UPDATE jobs SET status = ?, params = ?, worker = NULL WHERE id = ? AND status = ? AND heartbeat < ?',
+                (JOB_QUEUED, json.dumps(params), job['job_id'], JOB_RUNNING, limit)
+            )
+            if cursor.rowcount:
+                self.add_log(job['job_id'], '♻️ Worker non più attivo: job rimesso in coda', 'warning')
+                requeued.append(job['job_id'])
+        return requeued
+
+    def add_log(self, job_id, message, log_type='info'):
+        entry = {'message': message, 'type': log_type, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT INTO job_logs (job_id, message, type, timestamp) VALUES (?, ?, ?, ?)',
+                (job_id, message, log_type, entry['timestamp'])
+            )
+            entry['seq'] = cursor.lastrowid
+            # Buffer circolare: oltre max_logs vengono eliminati i log più vecchi del job
+            self.conn.execute(
+                'DELETE FROM job_logs WHERE job_id = ? AND id <= ('
+                'SELECT id FROM job_logs WHERE job_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                (job_id, job_id, self.max_logs)
+            )
+        return entry
+
+    def logs(self, job_id, after=0):
+        """Log conservati del job con seq maggiore di after, dal più vecchio"""
+        rows = self._execute(
+            'SELECT id AS seq, message, type, timestamp FROM job_logs WHERE job_id = ? AND id > ? ORDER BY id',
+            (job_id, after)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def logs_since(self, after_id):
+        """Log di tutti i job con id maggiore di after_id (per inoltrarli ai client)"""
+        rows = self._execute(
+            'SELECT id, job_id, message, type, timestamp FROM job_logs WHERE id > ? ORDER BY id', (after_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def last_log_id(self):
+        return self._execute('SELECT COALESCE(MAX(id), 0) FROM job_logs').fetchone()[0]
+
+    def clear_logs(self, job_id):
+        self._execute('DELETE FROM job_logs WHERE job_id = ?', (job_id,))
+
+    def get(self, job_id):
+        return self._job(self._execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+    def latest(self):
+        return self._job(self._execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT 1').fetchone())
+
+    def list(self, limit=50):
+        """Job più recenti, dal più vecchio al più nuovo"""
+        rows = self._execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+        return [self._job(row) for row in reversed(rows)]
+
+    def prune(self, max_finished=50):
+        """Elimina (con i log) i job terminati più vecchi oltre max_finished"""
+        rows = self._execute(
+            f'SELECT id FROM jobs WHERE status IN ({",".join("?" * len(FINISHED_STATUSES))}) '
+            'ORDER BY created_at DESC LIMIT -1 OFFSET ?', (*FINISHED_STATUSES, max_finished)
+        ).fetchall()
+        for row in rows:
+            self._execute('DELETE FROM job_logs WHERE job_id = ?', (row['id'],))
+            self._execute('DELETE FROM jobs WHERE id = ?', (row['id'],))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Worker dei job del Backlink Checker
+Prende i job dalla coda SQLite (job_queue.py), esegue i controlli e scrive
+report, log, progresso e statistiche dove la web app li legge. Più worker
+(anche su core o macchine con la stessa cartella) possono servire la stessa
+coda; il budget di richieste in volo resta condiviso tra tutti i job.
+
+Avvio:
+    python -m backlink_checker worker
+    python -m backlink_checker worker --queue backlink_jobs.sqlite --max-jobs 4
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from backlink_checker import (
+    BacklinkChecker, FAST_TIMEOUT, attempt_details, read_csv_columns, count_backlinks, iter_backlinks
+)
+from report_writer import ReportWriter, read_report
+from job_queue import JobQueue, DEFAULT_QUEUE, MAX_JOB_LOGS, JOB_RUNNING, JOB_COMPLETED, JOB_STOPPED, JOB_ERROR
+
+# Ogni quanto i job in esecuzione aggiornano heartbeat, richiesta di stop e parte di budget
+HEARTBEAT_INTERVAL = 1.0
+# Intervallo minimo tra due salvataggi del progresso di un job
+PROGRESS_INTERVAL = 0.5
+
+# Colonne del report web (Row_Index permette di riprendere un'analisi interrotta)
+WEB_REPORT_FIELDS = [
+    'Row_Index', 'URL', 'Status', 'Response_Time', 'Status_Code', 'Final_URL', 'Error',
+    'Nome_Azienda', 'Referente', 'Target_Backlink',
+    'Target_Presente', 'Anchor_Corretta', 'Link_Al_Target', 'Nofollow', 'Sponsored', 'Protocollo', 'Fase', 'Tentativi'
+]
+
+
+def _yes_no(value):
+    return '' if value is None else ('Sì' if value else 'No')
+
+
+def web_report_row(result):
+    """Riga del report web (i metadati della riga sono già nel risultato)"""
+    return {
+        'Row_Index': result['row_index'],
+        'URL': result['url'],
+        'Status': result['status'],
+        'Response_Time': result.get('response_time', ''),
+        'Status_Code': result.get('status_code', ''),
+        'Final_URL': result.get('final_url', ''),
+        'Error': result.get('error', ''),
+        'Nome_Azienda': result.get('nome_azienda', ''),
+        'Referente': result.get('referente', ''),
+        'Target_Backlink': result.get('target_backlink', ''),
+        'Target_Presente': _yes_no(result.get('target_found')),
+        'Anchor_Corretta': _yes_no(result.get('anchor_match')),
+        'Link_Al_Target': result.get('target_link_count', ''),
+        'Nofollow': _yes_no(result.get('rel_nofollow')),
+        'Sponsored': _yes_no(result.get('rel_sponsored')),
+        'Protocollo': result.get('protocol') or '',
+        'Fase': result.get('phase') or '',
+        'Tentativi': attempt_details(result)
+    }
+
+
+class JobContext:
+    """Job in esecuzione in questo worker: log, progresso e report finiscono nella coda"""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.id = job['job_id']
+        self.params = job['params']
+        self.status = JOB_RUNNING
+        self.stop_requested = job['stop_requested']
+        self.share = 1              # Richieste in volo concesse ora (aggiornate dal worker)
+        self.report_filename = job['report_filename']
+        self._progress_saved = 0.0
+
+    def log(self, message, log_type='info'):
+        self.queue.add_log(self.id, message, log_type)
+
+    def set_progress(self, completed, total, current_url, status, counts=None):
+        """
+        Salva il progresso (al massimo ogni PROGRESS_INTERVAL secondi, sempre l'ultimo)
+        counts: URL controllati finora per status
+        """
+        now = time.monotonic()
+        if completed < total and now - self._progress_saved < PROGRESS_INTERVAL:
+            return
+        self._progress_saved = now
+        self.queue.update(self.id, progress={
+            'completed': completed,
+            'total': total,
+            'percentage': round(completed / total * 100, 1) if total else 100.0,
+            'current_url': current_url,
+            'status': status,
+            'counts': dict(counts or {})
+        })
+
+    def set_report(self, report_filename):
+        self.report_filename = report_filename
+        self.queue.update(self.id, report_filename=report_filename)
+
+    def complete(self, statistics):
+        self.queue.update(self.id, statistics=statistics)
+
+
+def run_backlink_analysis(job, filepath, max_workers, timeout, backlink_column, engine='threads',
+                          max_per_host=4, host_interval=0.0, resume_report=None, verify_links=False,
+                          adaptive=False, two_phase=False):
+    report = None
+    try:
+        print(f"[DEBUG] Starting analysis with filepath: {filepath}")
+        print(f"[DEBUG] max_workers: {max_workers}, timeout: {timeout}, column: {backlink_column}, engine: {engine}")
+
+        job.log('🚀 Avvio analisi backlink...', 'info')
+        job.log(f'📁 File: {os.path.basename(filepath)}', 'info')
+        job.log(f'⚙️ Motore: {engine}', 'info')
+        job.log(f'🚀 Thread paralleli: {max_workers}', 'info')
+        job.log(f'⏱️ Timeout: {timeout}s', 'info')
+        job.log(f'🌐 Richieste per host: {max_per_host} (intervallo minimo {host_interval}s)', 'info')
+        if verify_links:
+            job.log('🔗 Verifica contenuto attiva: target e anchor negli articoli', 'info')
+        if adaptive:
+            job.log(f'🎚️ Concorrenza adattiva: richieste in volo regolate su latenza ed errori (massimo {max_workers})', 'info')
+        if two_phase:
+            job.log(f'🔁 Due fasi: prima {FAST_TIMEOUT}s senza retry, poi ricontrollo dei falliti con {timeout}s (solo GET)', 'info')
+
+        # Leggi solo l'intestazione: le righe vengono lette a blocchi durante l'analisi
+        print(f"[DEBUG] Reading CSV header: {filepath}")
+        columns = read_csv_columns(filepath)
+        print(f"[DEBUG] Available columns: {columns}")
+
+        if not backlink_column or backlink_column not in columns:
+            print(f"[DEBUG] Invalid backlink column: {backlink_column}")
+            job.log('❌ Colonna backlink non valida', 'error')
+            job.status = JOB_ERROR
+            return
+
+        job.log(f'✅ Colonna backlink: {backlink_column}', 'success')
+
+        # Conta i backlink validi (lettura a blocchi della sola colonna backlink)
+        total_links = count_backlinks(filepath, backlink_column)
+        job.log(f'🔍 Trovati {total_links} backlink da controllare', 'info')
+
+        if total_links == 0:
+            job.log('❌ Nessun backlink valido trovato!', 'error')
+            job.status = JOB_ERROR
+            return
+
+        # Crea il checker
+        print(f"[DEBUG] Creating BacklinkChecker with {max_workers} workers")
+        try:
+            checker = BacklinkChecker(filepath, max_workers, engine=engine,
+                                      max_per_host=max_per_host, host_min_interval=host_interval,
+                                      verify_links=verify_links, adaptive=adaptive, two_phase=two_phase)
+            checker.timeout = timeout
+            if checker.adaptive is not None:
+                checker.adaptive.on_decision = job.log
+            if checker.breaker is not None:
+                checker.breaker.on_change = lambda message: job.log(message, 'warning')
+            # Richieste in volo limitate alla parte di budget condiviso assegnata al job
+            checker.concurrency_limit = lambda: job.share
+            print(f"[DEBUG] BacklinkChecker created successfully")
+        except Exception as e:
+            print(f"[DEBUG] Error creating BacklinkChecker: {str(e)}")
+            job.log(f'❌ Errore nella creazione del checker: {str(e)}', 'error')
+            job.status = JOB_ERROR
+            return
+
+        # Il report viene scritto man mano: se l'analisi si interrompe resta tutto ciò che è stato controllato
+        if resume_report:
+            report_filename = resume_report
+        else:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            report_filename = f'backlink_report_{timestamp}_{job.id}.csv'
+        report = ReportWriter(report_filename, WEB_REPORT_FIELDS, web_report_row, append=bool(resume_report))
+        job.set_report(report_filename)
+
+        # In ripresa le righe già nel report vengono saltate e contate nelle statistiche
+        completed_rows = set()
+        status_counts = {}
+        if resume_report:
+            for row in read_report(report_filename):
+                completed_rows.add(int(row['Row_Index']))
+                status_counts[row['Status']] = status_counts.get(row['Status'], 0) + 1
+            job.log(f'♻️ Ripresa di {report_filename}: {len(completed_rows)} righe già controllate', 'info')
+            total_links = max(total_links - len(completed_rows), 0)
+
+        # Le righe vengono lette a blocchi mentre i controlli sono già in corso
+        url_data = (data for data in iter_backlinks(filepath, backlink_column)
+                    if data[0] not in completed_rows)
+
+        completed = 0
+
+        def handle_result(result):
+            nonlocal completed
+            try:
+                report.write(result)
+                status_counts[result['status']] = status_counts.get(result['status'], 0) + 1
+
+                completed += 1
+                progress = (completed / total_links) * 100
+
+                if completed % 10 == 0:  # Log every 10th completion
+                    print(f"Completed {completed}/{total_links} URLs")
+                job.set_progress(completed, total_links, result['url'], result['status'], status_counts)
+
+                if completed % 10 == 0 or completed == total_links:
+                    job.log(f'📊 Progresso: {completed}/{total_links} ({progress:.1f}%)', 'info')
+
+            except Exception as e:
+                print(f"[DEBUG] Error processing URL: {str(e)}")
+                job.log(f'❌ Errore nell\'analisi: {str(e)}', 'error')
+
+        def should_stop():
+            return job.stop_requested
+
+        # Finestra continua: appena un URL termina ne parte un altro, senza attese tra blocchi.
+        # Il tetto di risorse è max_workers, ridotto dalla parte di budget del job e
+        # (su Railway) dalla concorrenza adattiva
+        print(f"Starting URL analysis, Railway environment: {bool(os.environ.get('RAILWAY_ENVIRONMENT'))}")
+        checker.check_urls(url_data, handle_result, should_stop=should_stop)
+
+        if job.stop_requested:
+            print(f"[DEBUG] Analysis stopped by user")
+            job.log('⏹️ Analisi interrotta dall\'utente', 'warning')
+
+        report.close()
+
+        if job.stop_requested:
+            if report.rows_written or completed_rows:
+                job.log(f'📝 Report parziale salvato: {report_filename} (riprendibile)', 'warning')
+        elif report.rows_written or completed_rows:
+            # Statistiche finali
+            if checker.adaptive is not None:
+                job.log(f'🎚️ Concorrenza adattiva: limite finale {checker.adaptive.limit} '
+                        f'({checker.adaptive.decisions} regolazioni)', 'info')
+            if checker.head_support.head_skipped:
+                job.log(f'🎯 Host che rifiutano HEAD: {len(checker.head_support.rejecting_hosts)} '
+                        f'(~{checker.head_support.round_trips_saved} richieste risparmiate)', 'info')
+            if checker.redirect_rules.hops_skipped:
+                job.log(f'↪️ Regole di redirect per host: {checker.redirect_rules.rules_learned} '
+                        f'({checker.redirect_rules.hops_skipped} redirect dedotti senza richieste)', 'info')
+            if checker.retried_urls:
+                job.log(f'🔂 URL ritentati: {checker.retried_urls}, '
+                        f'{checker.retry_recovered} riusciti a un nuovo tentativo', 'info')
+            if checker.second_pass_checked:
+                job.log(f'🔁 Seconda fase: {checker.second_pass_checked} URL ricontrollati, '
+                        f'{checker.second_pass_recovered} recuperati', 'info')
+            if checker.dns is not None and checker.dns.failed:
+                job.log(f'🌐 Host non risolvibili (DNS): {checker.dns.failed}', 'warning')
+            if checker.breaker is not None and checker.breaker.tripped_hosts:
+                job.log(f'🔌 Host irraggiungibili: {len(checker.breaker.tripped_hosts)} '
+                        f'({checker.breaker.short_circuited} URL segnati senza richieste)', 'warning')
+            if checker.requests_saved:
+                status_counts['richieste_risparmiate'] = checker.requests_saved
+                job.log(f'♻️ Richieste risparmiate grazie agli URL duplicati: {checker.requests_saved}', 'info')
+
+            job.complete(status_counts)
+
+            job.log(f'✅ Analisi completata! Report salvato: {report_filename}', 'success')
+
+    except Exception as e:
+        job.log(f'❌ Errore critico: {str(e)}', 'error')
+        job.status = JOB_ERROR
+
+    finally:
+        if report is not None:
+            report.close()
+
+
+class JobWorker:
+    def __init__(self, queue, worker_budget, max_jobs=4, poll_interval=1.0, parent_pid=None):
+        """
+        queue: JobQueue condivisa con la web app e gli altri worker
+        worker_budget: richieste in volo totali condivise da tutti i job (stesso valore per tutti i worker)
+        max_jobs: job eseguiti contemporaneamente da questo processo
+        parent_pid: se indicato, il worker termina quando quel processo (la web app) non c'è più
+        """
+        self.queue = queue
+        self.worker_budget = worker_budget
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.parent_pid = parent_pid
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.active = {}    # job id -> JobContext
+        self.lock = threading.Lock()
+        self.stopping = False
+
+    def _parent_alive(self):
+        return self.parent_pid is None or os.getppid() == self.parent_pid
+
+    def _heartbeat(self):
+        """Tiene vivi i job in esecuzione e aggiorna stop richiesti e parti di budget"""
+        while not self.stopping:
+            with self.lock:
+                contexts = list(self.active.values())
+            try:
+                if contexts:
+                    shares = self.queue.shares(self.worker_budget)
+                    for context in contexts:
+                        context.stop_requested = self.queue.heartbeat(context.id)
+                        context.share = shares.get(context.id, 1)
+            except sqlite3.Error as e:
+                print(f"⚠️ Heartbeat non riuscito: {e}")
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    def _run_job(self, context):
+        try:
+            run_backlink_analysis(context, **context.params)
+            final_status = JOB_STOPPED if context.stop_requested else JOB_COMPLETED
+        except Exception as e:
+            context.log(f'❌ Errore critico: {str(e)}', 'error')
+            final_status = JOB_ERROR
+        if context.status == JOB_ERROR:
+            final_status = JOB_ERROR
+
+        self.queue.finish(context.id, final_status)
+        with self.lock:
+            del self.active[context.id]
+        self.queue.prune()
+
+    def run(self):
+        """Ciclo del worker: prende i job in coda finché il processo è attivo"""
+        print(f"👷 Worker {self.worker_id} in ascolto su {self.queue.path} "
+              f"(budget {self.worker_budget}, job contemporanei {self.max_jobs})")
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+        try:
+            while self._parent_alive():
+                # I job rimasti orfani (worker terminato) ripartono dal report parziale
+                self.queue.requeue_stale()
+
+                with self.lock:
+                    has_capacity = len(self.active) < self.max_jobs
+                job = self.queue.claim(self.worker_id, self.worker_budget) if has_capacity else None
+                if job is None:
+                    time.sleep(self.poll_interval)
+                    continue
+
+                print(f"▶️ Job {job['job_id']}: {job['filename']}")
+                context = JobContext(self.queue, job)
+                context.share = self.queue.shares(self.worker_budget).get(context.id, 1)
+                with self.lock:
+                    self.active[context.id] = context
+                threading.Thread(target=self._run_job, args=(context,), daemon=True).start()
+        finally:
+            self.stopping = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m backlink_checker worker',
+        description='Worker dei job della web app: esegue le analisi accodate in una coda SQLite locale'
+    )
+    parser.add_argument('--queue', default=os.environ.get('JOB_QUEUE_DB', DEFAULT_QUEUE),
+                        help=f'File SQLite della coda (default: $JOB_QUEUE_DB o {DEFAULT_QUEUE})')
+    parser.add_argument('--budget', type=int, default=int(os.environ.get('WORKER_BUDGET', 50)),
+                        help='Richieste in volo totali condivise dai job (default: $WORKER_BUDGET o 50)')
+    parser.add_argument('--max-jobs', type=int, default=4,
+                        help='Job eseguiti contemporaneamente da questo worker (default: 4)')
+    parser.add_argument('--max-logs', type=int, default=int(os.environ.get('JOB_LOG_LIMIT', MAX_JOB_LOGS)),
+                        help=f'Log conservati per ogni job (default: $JOB_LOG_LIMIT o {MAX_JOB_LOGS})')
+    parser.add_argument('--parent-pid', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.budget < 1 or args.max_jobs < 1 or args.max_logs < 1:
+        parser.error('--budget, --max-jobs e --max-logs devono essere almeno 1')
+
+    queue = JobQueue(args.queue, max_logs=args.max_logs)
+    try:
+        JobWorker(queue, args.budget, max_jobs=args.max_jobs, parent_pid=args.parent_pid).run()
+    except KeyboardInterrupt:
+        print("\n⚠️  Worker interrotto: i job in corso verranno ripresi da un altro worker")
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verifica del contenuto dei backlink
+Legge la pagina dell'articolo a blocchi con un tokenizer HTML in streaming
+(html.parser, nessun DOM) e raccoglie i link <a href> verso il dominio del
+target. La lettura si ferma alla fine dell'articolo (</article> o </body>)
+o dopo MAX_SCAN_BYTES, così anche i piani grandi restano veloci.
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+# Byte massimi letti per pagina: oltre, l'articolo è considerato già analizzato
+MAX_SCAN_BYTES = 2 * 1024 * 1024
+SCAN_CHUNK_SIZE = 16 * 1024
+# Link distinti (href, rel, testo) verso il target conservati per pagina: il conteggio
+# resta esatto e, se i link distinti sono di più, la verifica risulta incompleta
+MAX_TARGET_LINKS = 20
+
+_SPACES = re.compile(r'\s+')
+
+
+def link_host(url):
+    """Host di un URL senza 'www.', stringa vuota se non valido"""
+    try:
+        host = (urlparse(url).hostname or '').lower()
+    except ValueError:
+        return ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def _comparable_url(url):
+    """Forma confrontabile di un URL: senza schema, 'www.', frammento e slash finale"""
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return url.strip().lower()
+    path = parsed.path.rstrip('/')
+    query = f'?{parsed.query}' if parsed.query else ''
+    return f'{link_host(url)}{path}{query}'
+
+
+def _clean_text(text):
+    return _SPACES.sub(' ', text).strip()
+
+
+def is_html(content_type):
+    """True se il Content-Type indica una pagina HTML (assente = da provare)"""
+    if not content_type:
+        return True
+    return 'html' in content_type.lower()
+
+
+def charset_of(content_type, default='utf-8'):
+    """Charset dichiarato nel Content-Type"""
+    match = re.search(r'charset=["\']?([\w-]+)', content_type or '', re.IGNORECASE)
+    if match:
+        try:
+            codecs.lookup(match.group(1))
+            return match.group(1)
+        except LookupError:
+            pass
+    return default
+
+
+class LinkScanner(HTMLParser):
+    def __init__(self, page_url, target_host, encoding='utf-8'):
+        """
+        page_url: URL finale della pagina (per risolvere gli href relativi)
+        target_host: dominio del target di cui cercare i link
+        """
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.target_host = link_host(f'//{target_host}')
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+        # Link distinti verso il target (primi MAX_TARGET_LINKS) e conteggio: in tutta la pagina e nell'articolo
+        self.page_links, self.page_link_count = [], 0
+        self.article_links, self.article_link_count = [], 0
+        self.page_truncated = self.article_truncated = False
+        self.bytes_read = 0
+        self.done = False
+        self._current = None    # link verso il target aperto (<a> senza </a>)
+        self._article_depth = 0
+        self._article_seen = False
+
+    def feed_bytes(self, chunk):
+        """Analizza un blocco di byte; restituisce True quando la lettura può fermarsi"""
+        self.bytes_read += len(chunk)
+        self.feed(self.decoder.decode(chunk))
+        if self.bytes_read >= MAX_SCAN_BYTES:
+            self.done = True
+        return self.done
+
+    @property
+    def links(self):
+        """Link verso il target: solo quelli nell'articolo se la pagina ha un <article>"""
+        return self.article_links if self._article_seen else self.page_links
+
+    @property
+    def link_count(self):
+        return self.article_link_count if self._article_seen else self.page_link_count
+
+    @property
+    def links_truncated(self):
+        """True se alcuni link distinti verso il target non sono stati conservati"""
+        return self.article_truncated if self._article_seen else self.page_truncated
+
+    def finish(self):
+        """Chiude l'analisi (fine del body o lettura interrotta)"""
+        if not self.done:
+            self.feed(self.decoder.decode(b'', final=True))
+        self._close_link()
+        self.done = True
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'article':
+            self._article_depth += 1
+            self._article_seen = True
+        elif tag == 'a':
+            self._close_link()
+            attrs = dict(attrs)
+            href = (attrs.get('href') or '').strip()
+            if not href:
+                return
+            href = urljoin(self.page_url, href)
+            if link_host(href) == self.target_host:
+                rel = (attrs.get('rel') or '').lower().split()
+                self._current = {'href': href, 'rel': rel, 'text': []}
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current['text'].append(data)
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag == 'a':
+            self._close_link()
+        elif tag == 'article' and self._article_depth:
+            self._close_link()
+            self._article_depth -= 1
+            if not self._article_depth:
+                # Articolo analizzato: il resto della pagina (sidebar, footer) non conta
+                self.done = True
+        elif tag in ('body', 'html'):
+            self._close_link()
+            self.done = True
+
+    def _close_link(self):
+        link = self._current
+        if link is None:
+            return
+        self._current = None
+        found = {
+            'href': link['href'],
+            'rel': ' '.join(link['rel']),
+            'text': _clean_text(''.join(link['text']))
+        }
+        self.page_link_count += 1
+        self.page_truncated = _keep_link(self.page_links, found) or self.page_truncated
+        if self._article_depth:
+            self.article_link_count += 1
+            self.article_truncated = _keep_link(self.article_links, found) or self.article_truncated
+
+
+def _keep_link(links, found):
+    """Aggiunge found ai link se non è un doppione; True se è stato scartato per il limite"""
+    if found in links:
+        return False
+    if len(links) >= MAX_TARGET_LINKS:
+        return True
+    links.append(found)
+    return False
+
+
+def match_target_links(links, link_count, target_url, anchor_text='', truncated=False):
+    """
+    Confronta i link trovati nella pagina con il target e l'anchor attesi.
+    Restituisce i campi di verifica da aggiungere al risultato; con truncated
+    (link non tutti conservati) un target o un anchor non trovati restano None.
+    """
+    target = _comparable_url(target_url)
+    anchor = _clean_text(anchor_text or '').casefold()
+
+    matching = [link for link in links if _comparable_url(link['href']) == target]
+    rels = set()
+    for link in matching or links:
+        rels.update(link['rel'].split())
+
+    anchor_match = any(link['text'].casefold() == anchor for link in matching) if anchor else None
+    return {
+        'target_found': True if matching else (None if truncated else False),
+        'anchor_match': None if truncated and anchor_match is False else anchor_match,
+        'target_link_count': link_count,
+        'rel_nofollow': 'nofollow' in rels,
+        'rel_sponsored': 'sponsored' in rels,
+    }
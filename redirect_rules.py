@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regole di redirect per host del Backlink Checker
+Molti siti reindirizzano tutti gli URL allo stesso modo (http -> https, www ->
+dominio nudo, slash finale): ogni controllo paga la stessa richiesta in più
+per arrivare alla pagina. RedirectRules osserva i redirect durante il
+controllo e, dopo RULE_AFTER redirect uguali da uno stesso schema+host, li
+applica prima di fare la richiesta. I passaggi saltati restano nella catena
+dei redirect, segnati come dedotti.
+
+Un URL dell'host che non viene reindirizzato (o che lo è in modo diverso)
+annulla la regola.
+"""
+
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+# Redirect uguali osservati prima di applicare la regola
+RULE_AFTER = 3
+# Passaggi dedotti al massimo per URL (es. http://www. -> https://www. -> https://)
+MAX_INFERRED_HOPS = 5
+
+
+def _slash_candidate(path):
+    """Path a cui un sito aggiunge di solito lo slash finale (/articolo, non /pagina.html né /)"""
+    return bool(path) and not path.endswith('/') and '.' not in path.rsplit('/', 1)[-1]
+
+
+class RedirectRules:
+    def __init__(self, learn_after=RULE_AFTER):
+        self.learn_after = learn_after
+        self.lock = threading.Lock()
+        # (schema, host) -> [schema, host di destinazione, slash (None = ignoto), status, reason, osservazioni]
+        self.rules = {}
+        self.rules_learned = 0     # Regole diventate attive
+        self.urls_rewritten = 0    # URL controllati partendo dalla destinazione della regola
+        self.hops_skipped = 0      # Redirect dedotti senza richiesta
+
+    def _observe(self, url, target, status_code=None, reason=None):
+        """Un URL visitato: reindirizzato a target (None se non è stato reindirizzato)"""
+        source = urlsplit(url)
+        key = (source.scheme, source.netloc.lower())
+        rule = self.rules.get(key)
+        slash_candidate = _slash_candidate(source.path)
+
+        if target is None:
+            # Nessun redirect: smentisce la regola (lo slash solo sui path a cui si applica)
+            if rule is not None and ((rule[0], rule[1]) != key or (rule[2] and slash_candidate)):
+                del self.rules[key]
+            return
+
+        target = urlsplit(target)
+        slash = target.path == source.path + '/'
+        rewrite = (target.scheme, target.netloc.lower())
+        if target.query != source.query or not (slash or target.path == source.path) or \
+                (rewrite == key and not slash):
+            # Redirect verso un'altra pagina: non è una regola dell'host
+            self.rules.pop(key, None)
+            return
+
+        slash = slash if slash_candidate else None
+        if slash is None and rewrite == key:
+            # Solo lo slash, su un path a cui la regola non si applica: niente da imparare
+            return
+        if rule is None or (rule[0], rule[1]) != rewrite or (
+                slash is not None and rule[2] is not None and rule[2] != slash):
+            rule = self.rules[key] = [rewrite[0], rewrite[1], slash, status_code, reason, 0]
+        elif rule[2] is None:
+            rule[2] = slash
+        rule[3], rule[4] = status_code, reason
+        rule[5] += 1
+        if rule[5] == self.learn_after:
+            self.rules_learned += 1
+
+    def observe(self, hops, final_url):
+        """
+        Registra la catena di redirect di un controllo: hops è una lista di
+        (url, status, reason) nell'ordine, final_url l'URL arrivato a destinazione
+        (None se la catena si è interrotta su un redirect)
+        """
+        urls = [hop[0] for hop in hops] + [final_url]
+        with self.lock:
+            for (url, status_code, reason), target in zip(hops, urls[1:]):
+                if target is not None:
+                    self._observe(url, target, status_code, reason)
+            if final_url is not None:
+                self._observe(final_url, None)
+
+    def rewrite(self, url):
+        """
+        Applica le regole attive a url: restituisce l'URL da richiedere e i
+        redirect dedotti (nel formato di redirect_chain), lista vuota se nessuna regola vale
+        """
+        inferred = []
+        seen = {url}
+        with self.lock:
+            while len(inferred) < MAX_INFERRED_HOPS:
+                parts = urlsplit(url)
+                rule = self.rules.get((parts.scheme, parts.netloc.lower()))
+                if rule is None or rule[5] < self.learn_after:
+                    break
+                path = parts.path + '/' if rule[2] and _slash_candidate(parts.path) else parts.path
+                target = urlunsplit((rule[0], rule[1], path, parts.query, ''))
+                if target in seen:
+                    break
+                inferred.append({'from_url': url, 'status_code': rule[3], 'reason': rule[4], 'inferred': True})
+                seen.add(target)
+                url = target
+            if inferred:
+                self.urls_rewritten += 1
+                self.hops_skipped += len(inferred)
+        return url, inferred
+
+    @property
+    def active_rules(self):
+        with self.lock:
+            return sum(1 for rule in self.rules.values() if rule[5] >= self.learn_after)
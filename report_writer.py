@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scrittura incrementale dei report del Backlink Checker
+Ogni risultato viene aggiunto al CSV (con flush) appena è pronto: se il processo
+si interrompe, il report contiene tutto ciò che è stato controllato e può essere
+ripreso saltando le righe già presenti. Le statistiche finali vengono accumulate
+man mano, senza tenere in memoria tutti i risultati.
+"""
+
+import csv
+import os
+
+ONLINE_STATUSES = ('ONLINE', 'ONLINE_WITH_REDIRECTS')
+
+
+def truncate_partial_line(path):
+    """Elimina un'eventuale ultima riga scritta a metà (es. processo terminato durante la scrittura)"""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+
+        # Cerca l'ultimo a capo all'indietro, a blocchi
+        position = size
+        while position > 0:
+            step = min(64 * 1024, position)
+            position -= step
+            f.seek(position)
+            newline = f.read(step).rfind(b'\n')
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+
+def read_report(path):
+    """Legge le righe di un report esistente (dizionari colonna -> valore)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+def remove_rows(path, predicate):
+    """Riscrive il report senza le righe per cui predicate(riga) è vera; restituisce quante ne ha tolte"""
+    if not any(predicate(row) for row in read_report(path)):
+        return 0
+
+    removed = 0
+    temp_path = path + '.tmp'
+    with open(path, newline='', encoding='utf-8') as source, \
+            open(temp_path, 'w', newline='', encoding='utf-8') as target:
+        reader = csv.DictReader(source)
+        writer = csv.DictWriter(target, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        for row in reader:
+            if predicate(row):
+                removed += 1
+            else:
+                writer.writerow(row)
+    os.replace(temp_path, path)
+    return removed
+
+
+class ReportWriter:
+    def __init__(self, path, fieldnames, row_builder, append=False):
+        """
+        path: file CSV del report
+        fieldnames: colonne del report
+        row_builder: funzione risultato -> dizionario colonna -> valore
+        append: continua un report esistente invece di sovrascriverlo
+        """
+        self.path = path
+        self.row_builder = row_builder
+        self.rows_written = 0
+
+        resume = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if resume:
+            truncate_partial_line(path)
+
+        self.file = open(path, 'a' if resume else 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames, extrasaction='ignore')
+        if not resume:
+            self.writer.writeheader()
+            self.file.flush()
+
+    def write(self, result):
+        self.writer.writerow(self.row_builder(result))
+        self.file.flush()
+        self.rows_written += 1
+
+    def write_row(self, row):
+        """Scrive una riga già nel formato del report (es. copiata da un altro report)"""
+        self.writer.writerow(row)
+        self.file.flush()
+        self.rows_written += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class RunStats:
+    """Statistiche di un controllo accumulate risultato per risultato"""
+
+    def __init__(self, max_problematic=8, max_redirect_examples=4):
+        self.max_problematic = max_problematic
+        self.max_redirect_examples = max_redirect_examples
+
+        self.total = 0
+        self.status_counts = {}
+        self.redirect_counts = {}      # numero di redirect -> link
+        self.redirected = 0
+        self.response_time_sum = 0.0
+        self.response_time_count = 0
+        self.problematic = []          # primi esempi di link con problemi
+        self.redirect_examples = []    # primi esempi di link con redirect
+        self.verification_counts = {}  # esito verifica contenuto -> link
+        self.protocol_counts = {}      # protocollo (HTTP/1.1, HTTP/2) -> link
+
+    def add(self, result):
+        self.total += 1
+        status = result['status']
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+        if result.get('response_time') is not None:
+            self.response_time_sum += result['response_time']
+            self.response_time_count += 1
+
+        if result.get('protocol'):
+            self.protocol_counts[result['protocol']] = self.protocol_counts.get(result['protocol'], 0) + 1
+
+        if result.get('has_redirects'):
+            self.redirected += 1
+            count = result['redirect_count']
+            self.redirect_counts[count] = self.redirect_counts.get(count, 0) + 1
+            if len(self.redirect_examples) < self.max_redirect_examples:
+                self.redirect_examples.append(result)
+
+        if status not in ONLINE_STATUSES and len(self.problematic) < self.max_problematic:
+            self.problematic.append(result)
+
+        if result.get('target_found') is not None:
+            self._count_verification('verificati')
+            if not result['target_found']:
+                self._count_verification('target_mancante')
+            if result.get('anchor_match') is False:
+                self._count_verification('anchor_diversa')
+            if (result.get('target_link_count') or 0) > 1:
+                self._count_verification('link_multipli')
+            if result.get('rel_nofollow'):
+                self._count_verification('nofollow')
+            if result.get('rel_sponsored'):
+                self._count_verification('sponsored')
+
+    def _count_verification(self, outcome):
+        self.verification_counts[outcome] = self.verification_counts.get(outcome, 0) + 1
+
+    @property
+    def online(self):
+        return sum(self.status_counts.get(status, 0) for status in ONLINE_STATUSES)
+
+    @property
+    def errors(self):
+        return self.total - self.online
+
+    @property
+    def average_response_time(self):
+        if not self.response_time_count:
+            return None
+        return self.response_time_sum / self.response_time_count
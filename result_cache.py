@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache persistente dei risultati del Backlink Checker
+Salva in SQLite l'ultimo risultato di check_url per ogni URL normalizzato,
+con una durata di validità (TTL) diversa per ogni classe di status, e per
+ogni host se risponde correttamente a HEAD (vedi head_support.py)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Validità dei risultati in secondi: lunga per i link online, breve per gli errori transitori
+DEFAULT_TTL = {
+    'ONLINE': 7 * DAY,
+    'ONLINE_WITH_REDIRECTS': 7 * DAY,
+    'CLIENT_ERROR': DAY,
+    'REDIRECT_ERROR': DAY,
+    'SERVER_ERROR': HOUR,
+    'TIMEOUT': HOUR,
+    'CONNECTION_ERROR': HOUR,
+    'UNKNOWN_ERROR': HOUR,
+    'ERROR': HOUR,
+}
+
+# Validità delle informazioni sul supporto HEAD di un host
+HEAD_SUPPORT_TTL = 30 * DAY
+
+# Campi di check_url salvati in cache (senza row_index e metadati della riga)
+CACHED_FIELDS = (
+    'url', 'status', 'status_code', 'redirect_chain', 'final_url', 'error',
+    'response_time', 'redirect_count', 'has_redirects', 'etag', 'last_modified',
+    'verified_host', 'target_links', 'target_link_count', 'target_links_truncated', 'protocol'
+)
+
+
+class ResultCache:
+    def __init__(self, path, ttl=None):
+        """
+        path: file SQLite (creato se non esiste)
+        ttl: dizionario status -> secondi, sovrascrive i valori di DEFAULT_TTL
+        """
+        self.path = path
+        self.ttl = dict(DEFAULT_TTL)
+        if ttl:
+            self.ttl.update(ttl)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL + synchronous NORMAL: un commit per risultato senza fsync ogni volta
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                url TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                checked_at REAL NOT NULL,
+                result TEXT NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                head_supported INTEGER NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def get_entry(self, url):
+        """Restituisce (risultato, checked_at) anche se scaduto, None se assente"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT result, checked_at FROM results WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def is_fresh(self, result, checked_at, now=None):
+        now = time.time() if now is None else now
+        return now - checked_at < self.ttl.get(result['status'], 0)
+
+    def get(self, url):
+        """Restituisce il risultato in cache se ancora valido, altrimenti None"""
+        entry = self.get_entry(url)
+        if entry is None:
+            return None
+
+        result, checked_at = entry
+        if not self.is_fresh(result, checked_at):
+            return None
+
+        result['cached'] = True
+        result['checked_at'] = checked_at
+        return result
+
+    def put(self, url, result):
+        """Salva il risultato di check_url (gli status senza TTL non vengono salvati)"""
+        if not self.ttl.get(result['status']):
+            return
+
+        data = {field: result.get(field) for field in CACHED_FIELDS}
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO results (url, status, checked_at, result) VALUES (?, ?, ?, ?)',
+                (url, result['status'], time.time(), json.dumps(data))
+            )
+            self.conn.commit()
+
+    def head_support(self, now=None):
+        """Dizionario host -> True/False del supporto HEAD ancora valido"""
+        now = time.time() if now is None else now
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT host, head_supported FROM hosts WHERE checked_at > ?', (now - HEAD_SUPPORT_TTL,)
+            ).fetchall()
+        return {host: bool(supported) for host, supported in rows}
+
+    def put_head_support(self, host, supported):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO hosts (host, head_supported, checked_at) VALUES (?, ?, ?)',
+                (host, int(supported), time.time())
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controllo multi-processo del Backlink Checker (--processes N)
+Per piani molto grandi un solo processo è limitato dal GIL (gestione dei
+risultati, stampa, pool di urllib3). Gli URL vengono divisi per host tra N
+processi, ognuno con la propria sessione e il proprio pool di worker: i limiti
+per host restano esatti e gli URL duplicati finiscono nello stesso processo.
+
+Ogni processo scrive il proprio report parziale accanto al report finale
+(report.shardN.csv); al termine (anche se interrotto) i report vengono uniti
+nel report finale in ordine di row_index, a blocchi ordinati di MERGE_RUN_SIZE
+righe fusi in streaming. Se il processo principale viene ucciso i report
+parziali restano: --resume li unisce al report prima di ripartire.
+"""
+
+import csv
+import glob
+import heapq
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import zlib
+from queue import Empty, Full
+
+from backlink_checker import (
+    BacklinkChecker, DETAILED_REPORT_FIELDS, SKIPPED_DEADLINE, detailed_report_row, result_from_report_row,
+    read_csv_columns, find_backlink_column, count_backlinks, iter_backlinks, url_host
+)
+from report_writer import ReportWriter, read_report, truncate_partial_line
+from result_cache import ResultCache
+
+# Righe inviate a un processo per volta e blocchi in attesa per processo
+SHARD_BATCH_SIZE = 500
+SHARD_QUEUE_SIZE = 20
+# Ogni quanti secondi viene mostrato il progresso complessivo
+PROGRESS_INTERVAL = 2.0
+# Righe ordinate in memoria per volta durante l'unione dei report degli shard
+MERGE_RUN_SIZE = 5000
+
+
+def shard_of(url, processes):
+    """Processo a cui spetta un URL: stabile tra esecuzioni e uguale per tutto l'host"""
+    return zlib.crc32(url_host(url).encode('utf-8')) % processes
+
+
+def _shard_items(inbox, parent):
+    while os.getppid() == parent:
+        try:
+            batch = inbox.get(timeout=PROGRESS_INTERVAL)
+        except Empty:
+            continue
+        if batch is None:
+            return
+        yield from batch
+
+
+def _sort_report_key(row):
+    return int(row['row_index'])
+
+
+def shard_report_paths(output_file, processes):
+    """Report parziali dei processi, accanto al report finale"""
+    root, ext = os.path.splitext(output_file)
+    return [f'{root}.shard{shard}{ext}' for shard in range(processes)]
+
+
+def leftover_shard_reports(output_file):
+    """Report parziali rimasti da un controllo interrotto prima dell'unione"""
+    root, ext = os.path.splitext(output_file)
+    return sorted(glob.glob(f'{glob.escape(root)}.shard*{ext}'))
+
+
+def _write_run(rows, run_path):
+    """Scrive un blocco di righe ordinato per row_index"""
+    rows.sort(key=_sort_report_key)
+    with open(run_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=DETAILED_REPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    return run_path
+
+
+def _sorted_runs(path, run_dir, run_size=MERGE_RUN_SIZE):
+    """
+    Divide un report (in ordine di completamento) in blocchi di al massimo
+    run_size righe ordinati per row_index, scritti in run_dir; restituisce i file
+    """
+    name = os.path.basename(path)
+    runs = []
+    rows = []
+    for row in read_report(path):
+        rows.append(row)
+        if len(rows) >= run_size:
+            runs.append(_write_run(rows, os.path.join(run_dir, f'{name}.{len(runs)}')))
+            rows = []
+    if rows:
+        runs.append(_write_run(rows, os.path.join(run_dir, f'{name}.{len(runs)}')))
+    return runs
+
+
+def run_shard(shard, inbox, report_path, options, completed, summaries, parent):
+    """Processo di uno shard: controlla le righe ricevute e le scrive nel proprio report"""
+    # Ctrl+C arriva a tutto il gruppo: l'interruzione la gestisce il processo principale
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    cache = None
+    if options['cache_path']:
+        cache = ResultCache(options['cache_path'], ttl=options['cache_ttl'])
+    checker = BacklinkChecker(options['csv_file'], max_workers=options['max_workers'],
+                              engine=options['engine'], max_per_host=options['max_per_host'],
+                              host_min_interval=options['host_min_interval'], cache=cache,
+                              verify_links=options['verify_links'], adaptive=options['adaptive'],
+                              url_budget=options['url_budget'], deadline=options['deadline'],
+                              host_failures=options['host_failures'], host_probe_after=options['host_probe_after'],
+                              dns_cache=options['dns_cache'], http2=options['http2'],
+                              two_phase=options['two_phase'], fast_timeout=options['fast_timeout'])
+    checker.timeout = options['timeout']
+    writer = ReportWriter(report_path, DETAILED_REPORT_FIELDS, detailed_report_row)
+
+    def handle_result(result):
+        writer.write(result)
+        with completed.get_lock():
+            completed.value += 1
+
+    def parent_gone():
+        # Processo principale ucciso: nessuno unirà i risultati, lo shard si ferma
+        return os.getppid() != parent
+
+    try:
+        checker.check_urls(_shard_items(inbox, parent), handle_result, should_stop=parent_gone)
+    finally:
+        writer.close()
+        if cache is not None:
+            cache.close()
+    adaptive = (checker.adaptive.limit, checker.adaptive.decisions) if checker.adaptive is not None else None
+    breaker = (checker.breaker.tripped_hosts, checker.breaker.short_circuited) if checker.breaker is not None else None
+    second_pass = (checker.second_pass_checked, checker.second_pass_recovered)
+    retries = (checker.retried_urls, checker.retry_recovered)
+    head = (checker.head_support.rejecting_hosts, checker.head_support.head_skipped,
+            checker.head_support.round_trips_saved)
+    redirects = (checker.redirect_rules.rules_learned, checker.redirect_rules.urls_rewritten,
+                 checker.redirect_rules.hops_skipped)
+    summaries.put((shard, checker.requests_saved, checker.cache_hits, checker.revalidated, adaptive, breaker,
+                   second_pass, retries, head, redirects))
+
+
+class ShardedBacklinkChecker(BacklinkChecker):
+    def __init__(self, csv_file_path, processes=2, **kwargs):
+        """
+        processes: processi in cui dividere gli URL (per host)
+        Gli altri parametri sono quelli di BacklinkChecker e valgono per ogni processo
+        (es. max_workers thread o richieste in volo per processo)
+        """
+        super().__init__(csv_file_path, **kwargs)
+        self.processes = processes
+
+    def _shard_options(self):
+        return {
+            'csv_file': self.csv_file_path,
+            'max_workers': self.max_workers,
+            'engine': self.engine,
+            'max_per_host': self.max_per_host,
+            'host_min_interval': self.host_min_interval,
+            'verify_links': self.verify_links,
+            'adaptive': self.adaptive is not None,
+            'url_budget': self.url_budget,
+            'deadline': self.deadline,
+            'host_failures': self.breaker.threshold if self.breaker is not None else 0,
+            'host_probe_after': self.breaker.probe_after if self.breaker is not None else None,
+            'dns_cache': self.dns is not None,
+            'http2': self.http2 is not None,
+            'two_phase': self.two_phase,
+            'fast_timeout': self.fast_timeout,
+            'timeout': self.timeout,
+            'cache_path': self.cache.path if self.cache is not None else None,
+            'cache_ttl': self.cache.ttl if self.cache is not None else None,
+        }
+
+    def _feed_shards(self, backlink_column, inboxes, workers):
+        """Legge il piano a blocchi e invia ogni riga al processo del suo host"""
+        batches = [[] for _ in inboxes]
+        for data in iter_backlinks(self.csv_file_path, backlink_column):
+            if data[0] in self.completed_rows:
+                continue
+            shard = shard_of(data[1], self.processes)
+            batches[shard].append(data)
+            if len(batches[shard]) >= SHARD_BATCH_SIZE:
+                self._put(inboxes[shard], batches[shard], workers[shard])
+                batches[shard] = []
+        for shard, inbox in enumerate(inboxes):
+            if batches[shard]:
+                self._put(inbox, batches[shard], workers[shard])
+            self._put(inbox, None, workers[shard])
+
+    def _put(self, inbox, batch, worker):
+        """Come inbox.put, ma senza bloccarsi se il processo dello shard è terminato"""
+        while worker.is_alive():
+            try:
+                inbox.put(batch, timeout=1)
+                return
+            except Full:
+                continue
+
+    def _collect_summaries(self, summaries, workers, completed, total_links):
+        """
+        Legge un riepilogo per shard mostrando il progresso; quelli dei processi
+        terminati con errore (senza riepilogo) mancano
+        """
+        received = []
+        while len(received) < len(workers):
+            try:
+                received.append(summaries.get(timeout=PROGRESS_INTERVAL))
+                continue
+            except Empty:
+                pass
+            if not any(worker.is_alive() for worker in workers):
+                # Tutti terminati: i riepiloghi scritti sono già nella coda
+                try:
+                    while len(received) < len(workers):
+                        received.append(summaries.get(timeout=PROGRESS_INTERVAL))
+                except Empty:
+                    pass
+                break
+            print(f"[{completed.value}/{total_links}] URL controllati su {self.processes} processi")
+        return received
+
+    def _merge_shards(self, shard_reports, recovering=False):
+        """
+        Unisce i report degli shard nel report finale, in ordine di row_index,
+        e li elimina; le righe già nel report (unione interrotta) vengono saltate.
+        recovering: report rimasti da un controllo interrotto (--resume), le righe
+        SKIPPED_DEADLINE vengono ricontrollate. Restituisce le righe aggiunte.
+        """
+        reports = [path for path in shard_reports if os.path.exists(path)]
+        if not reports:
+            return 0
+        merged = 0
+        run_dir = tempfile.mkdtemp(prefix='backlink_merge_',
+                                   dir=os.path.dirname(os.path.abspath(self.report_writer.path)))
+        try:
+            runs = []
+            for path in reports:
+                # Un processo interrotto può aver lasciato l'ultima riga a metà
+                truncate_partial_line(path)
+                runs.extend(_sorted_runs(path, run_dir))
+
+            readers = [read_report(path) for path in runs]
+            for row in heapq.merge(*readers, key=_sort_report_key):
+                row_index = _sort_report_key(row)
+                if row_index in self.completed_rows or (recovering and row['status'] == SKIPPED_DEADLINE):
+                    continue
+                if recovering:
+                    self.completed_rows.add(row_index)
+                with self.lock:
+                    self.stats.add(result_from_report_row(row))
+                    self.report_writer.write_row(row)
+                merged += 1
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        # I report parziali servono a --resume finché l'unione non è completa
+        for path in reports:
+            os.remove(path)
+        return merged
+
+    def open_report(self):
+        """Come BacklinkChecker.open_report; con --resume unisce anche i report parziali rimasti"""
+        output_file = super().open_report()
+        leftovers = leftover_shard_reports(output_file) if self.resume_report else []
+        if leftovers:
+            recovered = self._merge_shards(leftovers, recovering=True)
+            print(f"♻️  {recovered} righe recuperate dai report parziali di {len(leftovers)} processi")
+        return output_file
+
+    def process_csv(self):
+        """
+        Divide le righe del piano per host tra i processi e unisce i loro report
+        """
+        print(f"Inizio controllo backlink dal file: {self.csv_file_path}")
+        print("=" * 60)
+
+        columns = read_csv_columns(self.csv_file_path)
+        backlink_column = find_backlink_column(columns)
+        if backlink_column is None:
+            print("ERRORE: Colonna 'Backlink' non trovata nel CSV")
+            return
+
+        print(f"Trovata colonna backlink: '{backlink_column}'")
+        total_links = count_backlinks(self.csv_file_path, backlink_column)
+        print(f"Trovati {total_links} backlink da controllare")
+        print(f"🚀 Controllo su {self.processes} processi, {self.max_workers} "
+              f"{'richieste in volo' if self.engine == 'async' else 'thread'} per processo")
+        print("=" * 60)
+
+        if total_links == 0:
+            print("Nessun backlink trovato nel file CSV")
+            return
+
+        output_file = self.open_report()
+        print(f"📝 Report finale: {output_file} (scritto al termine, ordinato per riga; "
+              f"report parziali dei processi accanto)")
+        if self.completed_rows:
+            print(f"♻️  Ripresa: {len(self.completed_rows)} righe già presenti nel report vengono saltate")
+            total_links = max(total_links - len(self.completed_rows), 0)
+
+        shard_reports = shard_report_paths(output_file, self.processes)
+        completed = multiprocessing.Value('i', 0)
+        summaries = multiprocessing.Queue()
+        inboxes = [multiprocessing.Queue(SHARD_QUEUE_SIZE) for _ in range(self.processes)]
+        workers = [
+            multiprocessing.Process(target=run_shard, daemon=True, args=(
+                shard, inboxes[shard], shard_reports[shard], self._shard_options(), completed, summaries,
+                os.getpid()
+            ))
+            for shard in range(self.processes)
+        ]
+
+        try:
+            for worker in workers:
+                worker.start()
+
+            feeder = threading.Thread(target=self._feed_shards, args=(backlink_column, inboxes, workers),
+                                      daemon=True)
+            feeder.start()
+
+            # Il riepilogo di ogni shard va letto prima del join: un processo non termina
+            # finché i dati che ha messo nella coda non sono stati letti
+            shard_summaries = self._collect_summaries(summaries, workers, completed, total_links)
+
+            for shard, worker in enumerate(workers):
+                worker.join()
+                if worker.exitcode != 0:
+                    print(f"⚠️  Il processo {shard} è terminato con errore (codice {worker.exitcode}): "
+                          f"le righe mancanti si possono riprendere con --resume")
+            # Con la concorrenza adattiva il limite finale è la somma di quelli dei processi
+            adaptive_limits = []
+            for (_, requests_saved, cache_hits, revalidated, adaptive, breaker,
+                 second_pass, retries, head, redirects) in shard_summaries:
+                self.requests_saved += requests_saved
+                self.second_pass_checked += second_pass[0]
+                self.second_pass_recovered += second_pass[1]
+                self.retried_urls += retries[0]
+                self.retry_recovered += retries[1]
+                self.head_support.supported.update((host, False) for host in head[0])
+                self.head_support.head_skipped += head[1]
+                self.head_support.round_trips_saved += head[2]
+                self.redirect_rules.rules_learned += redirects[0]
+                self.redirect_rules.urls_rewritten += redirects[1]
+                self.redirect_rules.hops_skipped += redirects[2]
+                self.cache_hits += cache_hits
+                self.revalidated += revalidated
+                if adaptive is not None:
+                    adaptive_limits.append(adaptive)
+                if breaker is not None and self.breaker is not None:
+                    self.breaker.tripped_hosts.update(breaker[0])
+                    self.breaker.short_circuited += breaker[1]
+            if self.adaptive is not None and adaptive_limits:
+                self.adaptive.limit = sum(limit for limit, _ in adaptive_limits)
+                self.adaptive.decisions = sum(decisions for _, decisions in adaptive_limits)
+        finally:
+            # Anche se interrotto, il report finale contiene tutte le righe già controllate dagli shard
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+            self._merge_shards(shard_reports)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controllo in due fasi con un sito che chiede di rallentare
+Un server locale risponde 429 con Retry-After: 1 alle prime due richieste di
+ogni URL e poi 200: il link deve risultare ONLINE anche con two_phase.
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backlink_checker import BacklinkChecker
+
+THROTTLED_REQUESTS = 2
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests[self.path] = self.server.requests.get(self.path, 0) + 1
+            count = self.server.requests[self.path]
+        if count <= THROTTLED_REQUESTS:
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET
+
+
+class TwoPhaseThrottleTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def check(self, engine, two_phase):
+        url = f'http://127.0.0.1:{self.server.server_address[1]}/articolo-{engine}-{two_phase}'
+        checker = BacklinkChecker('piano.csv', max_workers=2, engine=engine, two_phase=two_phase,
+                                  fast_timeout=2)
+        checker.timeout = 4
+        results = []
+        checker.check_urls([(0, url)], results.append)
+        self.assertEqual(len(results), 1)
+        return results[0]
+
+    def test_throttled_url_is_retried_in_both_modes(self):
+        for engine in ('threads', 'async'):
+            for two_phase in (False, True):
+                with self.subTest(engine=engine, two_phase=two_phase):
+                    result = self.check(engine, two_phase)
+                    self.assertEqual(result['status'], 'ONLINE')
+                    self.assertEqual(result['status_code'], 200)
+                    self.assertEqual(len(result['attempts']), THROTTLED_REQUESTS + 1)
+                    if two_phase:
+                        self.assertEqual(result['phase'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()